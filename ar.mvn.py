@@ -26,13 +26,35 @@
 import sys, os, errno, re
 import click
 import itertools
+import collections
+import bisect
+import importlib
+import json
+import hashlib
+import cPickle
 import signal
-from lxml import etree
-import rfc3987
-import platform
+import select
+import StringIO
+import traceback
+from io import BytesIO
 
-from inspect import getmembers
-from pprint import pprint
+class LazyModule(object):
+	"""Imports a module on first attribute access; keeps startup free of modules a command does not use"""
+	def __init__(self, name):
+		self.__name = name
+		self.__module = None
+	
+	def __getattr__(self, attr):
+		if self.__module is None:
+			self.__module = importlib.import_module(self.__name)
+		return getattr(self.__module, attr)
+
+etree = LazyModule('lxml.etree')
+rfc3987 = LazyModule('rfc3987')
+platform = LazyModule('platform')
+sqlite3 = LazyModule('sqlite3')
+multiprocessing = LazyModule('multiprocessing')
+socket = LazyModule('socket')
 
 signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
@@ -40,39 +62,74 @@ class Config(object):
 	def __init__(self, verbose=False):
 		self.verbose = verbose
 		self.pom_file = None
+		self.cache = True
+		self.jobs = 1
+		self.output_format = 'text'
+	
+	def get_graph_format(self, graph_format):
+		"""Records requested with --format take over the text rendering chosen per command"""
+		if self.output_format in Pom.RecordWriter.FORMATS:
+			return self.output_format
+		return graph_format
 
 class Pom(object):
 	def __init__(self):
 		self.__module_cache = Pom.ModuleCache()
-		self.__properties = Pom.Properties.create_root()
-		
-		self.__global_settings = Pom.Settings.create('${env.M2_HOME}/conf/settings.xml', self.__properties)
-		self.__user_settings = Pom.Settings.create('${user.home}/.m2/settings.xml', self.__properties)
-		self.user_settings.merge(self.__global_settings)
-		
-		default_storage = Pom.ArtifactStorage.create_default(self.user_settings.local_repository)
-		self.__storage = Pom.ArtifactStorage(default_storage)
-		for profile in self.user_settings.active_profiles:
-			self.storage.add(profile.repositories, self.user_settings.mirrors)
+		self.__parse_cache = Pom.ParseCache()
+		self.__bom_store = Pom.BomStore()
+		# environment and settings are loaded on first use
+		self.__properties = None
+		self.__global_settings = None
+		self.__user_settings = None
+		self.__storage = None
+	
+	def _load_settings(self):
+		global_settings = Pom.Settings.create('${env.M2_HOME}/conf/settings.xml', self.properties)
+		user_settings = Pom.Settings.create('${user.home}/.m2/settings.xml', self.properties)
+		user_settings.merge(global_settings)
+		
+		default_storage = Pom.ArtifactStorage.create_default(user_settings.local_repository)
+		storage = Pom.ArtifactStorage(default_storage)
+		for profile in user_settings.active_profiles:
+			storage.add(profile.repositories, user_settings.mirrors)
+		self.__global_settings = global_settings
+		self.__user_settings = user_settings
+		self.__storage = storage
 	
 	@property
 	def properties(self):
+		if self.__properties is None:
+			self.__properties = Pom.Properties.create_root()
 		return self.__properties
 	
 	@property
 	def module_cache(self):
 		return self.__module_cache
 	
+	@property
+	def parse_cache(self):
+		return self.__parse_cache
+	
+	@property
+	def bom_store(self):
+		return self.__bom_store
+	
 	@property
 	def global_settings(self):
+		if self.__global_settings is None:
+			self._load_settings()
 		return self.__global_settings
 	
 	@property
 	def user_settings(self):
+		if self.__user_settings is None:
+			self._load_settings()
 		return self.__user_settings
 	
 	@property
 	def storage(self):
+		if self.__storage is None:
+			self._load_settings()
 		return self.__storage
 	
 	class Settings(object):
@@ -141,9 +198,7 @@ class Pom(object):
 			io = Pom.IO(file_path)
 			if not os.path.isfile(io.file_path):
 				return
-			parser = etree.XMLParser(recover=True)
-			xtree = etree.parse(io.file_path, parser)
-			xroot = xtree.getroot()
+			xroot = Pom.XmlNode.iterparse(io.file_path)
 			if xroot is None:
 				return
 			
@@ -494,6 +549,219 @@ class Pom(object):
 		def __repr__(self):
 			return '{0}({1})'.format(self.__class__.__name__, str(self))
 	
+	class RepositoryIndex(object):
+		"""
+		sqlite index of a local repository: version directories, their _remote.repositories origins and the
+		latest/release tags of maven-metadata*.xml. Directories whose signature (mtime of the directory and of
+		its metadata files) is unchanged are not listed again on rescan.
+		"""
+		VERSION = 1
+		SNAPSHOT = '-SNAPSHOT'
+		
+		def __init__(self, repository_path, index_path):
+			self.__repository_path = os.path.abspath(os.path.expanduser(repository_path))
+			self.__index_path = index_path
+			self.__db = None
+		
+		@property
+		def repository_path(self):
+			return self.__repository_path
+		
+		@property
+		def index_path(self):
+			return self.__index_path
+		
+		@classmethod
+		def create(cls, repository_path, cache_dir = None):
+			if cache_dir is None:
+				cache_dir = Pom.ParseCache.get_default_cache_dir()
+			repository_path = os.path.abspath(os.path.expanduser(repository_path))
+			index_path = os.path.join(cache_dir, 'repository-{0}.sqlite'.format(hashlib.sha1(repository_path).hexdigest()))
+			return cls(repository_path, index_path)
+		
+		@property
+		def db(self):
+			if self.__db is None:
+				index_dir = os.path.dirname(self.__index_path)
+				if len(index_dir) > 0 and not os.path.isdir(index_dir):
+					os.makedirs(index_dir)
+				db = sqlite3.connect(self.__index_path)
+				db.text_factory = str
+				if db.execute('PRAGMA user_version').fetchone()[0] != self.VERSION:
+					db.executescript('''
+						DROP TABLE IF EXISTS dirs;
+						DROP TABLE IF EXISTS versions;
+						DROP TABLE IF EXISTS metadata;
+						CREATE TABLE dirs (path TEXT PRIMARY KEY, signature TEXT, subdirs TEXT);
+						CREATE TABLE versions (path TEXT PRIMARY KEY, group_id TEXT, artifact_id TEXT, version TEXT, repositories TEXT);
+						CREATE INDEX versions_ga ON versions (group_id, artifact_id);
+						CREATE TABLE metadata (path TEXT, name TEXT, group_id TEXT, artifact_id TEXT, latest TEXT, release TEXT, PRIMARY KEY (path, name));
+						CREATE INDEX metadata_ga ON metadata (group_id, artifact_id);
+						PRAGMA user_version = %d;
+					''' % self.VERSION)
+				self.__db = db
+			return self.__db
+		
+		def close(self):
+			if self.__db is not None:
+				self.__db.close()
+				self.__db = None
+		
+		def scan(self, path = ''):
+			"""Incrementally (re)scans the repository, or the subtree at the relative path, returns the number of directories listed"""
+			db = self.db
+			listed = 0
+			known = dict((row[0], row[1:]) for row in db.execute('SELECT path, signature, subdirs FROM dirs'))
+			metadata = collections.defaultdict(list)
+			for path, name in db.execute('SELECT path, name FROM metadata'):
+				metadata[path].append(name)
+			with db:
+				stack = [path]
+				while stack:
+					path = stack.pop()
+					row = known.get(path)
+					signature = self._get_signature(path, metadata.get(path, []) if row is not None else None)
+					if signature is None:
+						self._remove(path)
+						continue
+					if row is not None and row[0] == signature:
+						subdirs = row[1].split('/') if len(row[1]) > 0 else []
+					else:
+						signature = self._get_signature(path)
+						subdirs = self._index_dir(path)
+						listed += 1
+						if row is not None:
+							for subdir in set(row[1].split('/')) - set(subdirs):
+								if len(subdir) > 0:
+									self._remove(self._join(path, subdir))
+						db.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)', (path, signature, '/'.join(subdirs)))
+					stack.extend(self._join(path, subdir) for subdir in subdirs)
+			return listed
+		
+		def _join(self, path, name):
+			return name if len(path) == 0 else path + '/' + name
+		
+		def _get_signature(self, path, names = None):
+			abs_path = os.path.join(self.__repository_path, path)
+			try:
+				mtimes = [os.stat(abs_path).st_mtime]
+			except OSError:
+				return None
+			if names is None:
+				names = self._get_metadata_names(path)
+			for name in sorted(names):
+				try:
+					mtimes.append(os.stat(os.path.join(abs_path, name)).st_mtime)
+				except OSError:
+					mtimes.append(None)
+			return repr(mtimes)
+		
+		def _get_metadata_names(self, path):
+			try:
+				names = os.listdir(os.path.join(self.__repository_path, path))
+			except OSError:
+				return []
+			return [name for name in names if self._is_metadata(name)]
+		
+		def _is_metadata(self, name):
+			return name.startswith('maven-metadata') and name.endswith('.xml')
+		
+		def _remove(self, path):
+			prefix = path + '/'
+			for table in ('dirs', 'versions', 'metadata'):
+				if len(path) == 0:
+					self.db.execute('DELETE FROM {0}'.format(table))
+				else:
+					self.db.execute('DELETE FROM {0} WHERE path = ? OR substr(path, 1, ?) = ?'.format(table), (path, len(prefix), prefix))
+		
+		def _index_dir(self, path):
+			db = self.db
+			abs_path = os.path.join(self.__repository_path, path)
+			db.execute('DELETE FROM versions WHERE path = ?', (path,))
+			db.execute('DELETE FROM metadata WHERE path = ?', (path,))
+			subdirs = []
+			files = []
+			for name in os.listdir(abs_path):
+				if name.startswith('.'):
+					continue
+				if os.path.isdir(os.path.join(abs_path, name)):
+					subdirs.append(name)
+				else:
+					files.append(name)
+			parts = path.split('/')
+			if len(parts) >= 3 and len(files) > 0:
+				artifact_id, version = parts[-2], parts[-1]
+				prefix = artifact_id + '-'
+				if version.endswith(self.SNAPSHOT):
+					prefix += version[:-len(self.SNAPSHOT)]
+				else:
+					prefix += version
+				if any(name.startswith(prefix) and not name.endswith('.lastUpdated') for name in files):
+					repositories = self._get_repositories(os.path.join(abs_path, '_remote.repositories'))
+					db.execute('INSERT INTO versions VALUES (?, ?, ?, ?, ?)', (path, '.'.join(parts[:-2]), artifact_id, version, repositories))
+			for name in files:
+				if self._is_metadata(name):
+					self._index_metadata(path, name)
+			return subdirs
+		
+		def _get_repositories(self, file_path):
+			repositories = set()
+			if os.path.isfile(file_path):
+				with open(file_path, 'r') as fp:
+					for line in fp:
+						line = line.strip()
+						if len(line) == 0 or line.startswith('#') or not '>' in line:
+							continue
+						repositories.add(line.split('>', 1)[1].rstrip('='))
+			return ','.join(sorted(r if len(r) > 0 else 'local' for r in repositories))
+		
+		def _index_metadata(self, path, name):
+			try:
+				xroot = Pom.Xml.parse(os.path.join(self.__repository_path, path, name))
+			except (IOError, etree.XMLSyntaxError):
+				return
+			if xroot is None:
+				return
+			parts = path.split('/')
+			group_id = Pom.Xml.get_group_id(xroot) or '.'.join(parts[:-1])
+			artifact_id = Pom.Xml.get_artifact_id(xroot) or parts[-1]
+			xversioning = Pom.Xml.get_node(xroot, 'versioning')
+			if xversioning is None:
+				return
+			latest = Pom.Xml.get_child_node_value(xversioning, 'latest', None)
+			release = Pom.Xml.get_child_node_value(xversioning, 'release', None)
+			self.db.execute('INSERT INTO metadata VALUES (?, ?, ?, ?, ?, ?)', (path, name, group_id, artifact_id, latest, release))
+		
+		def get_versions(self, group_id, artifact_id):
+			"""Returns the locally available versions in ascending order"""
+			rows = self.db.execute('SELECT version FROM versions WHERE group_id = ? AND artifact_id = ?', (group_id, artifact_id))
+			return sorted((row[0] for row in rows), key=lambda v: Pom.ArtifactVersion.of(v).key)
+		
+		def get_repositories(self, group_id, artifact_id, version):
+			row = self.db.execute('SELECT repositories FROM versions WHERE group_id = ? AND artifact_id = ? AND version = ?', 
+			                      (group_id, artifact_id, version)).fetchone()
+			return row[0].split(',') if row is not None and len(row[0]) > 0 else []
+		
+		def _get_tagged(self, group_id, artifact_id, column, versions):
+			rows = self.db.execute('SELECT {0} FROM metadata WHERE group_id = ? AND artifact_id = ?'.format(column), (group_id, artifact_id))
+			candidates = [row[0] for row in rows if row[0] is not None] + versions
+			if len(candidates) == 0:
+				return None
+			return max(candidates, key=lambda v: Pom.ArtifactVersion.of(v).key)
+		
+		def resolve(self, group_id, artifact_id, spec):
+			"""Resolves LATEST, RELEASE, a version or a version range, returns None if nothing matches"""
+			versions = self.get_versions(group_id, artifact_id)
+			if spec == 'LATEST':
+				return self._get_tagged(group_id, artifact_id, 'latest', versions)
+			if spec == 'RELEASE':
+				return self._get_tagged(group_id, artifact_id, 'release', [v for v in versions if not v.endswith(self.SNAPSHOT)])
+			vr = Pom.VersionRange.create_from_version_spec(spec)
+			if vr.recommended_version is not None:
+				version = str(vr.recommended_version)
+				return version if version in versions else None
+			return vr.best(versions)
+	
 	class RepositoryPolicy(object):
 		def __init__(self):
 			self.__enabled = True
@@ -561,38 +829,242 @@ class Pom(object):
 			return '{0}({1})'.format(self.__class__.__name__, str(self))
 	
 	class ModuleCache(object):
+		"""Loaded modules by (file path, inheritance context)
+		
+		Modules loaded under a module (or as a root) share one context. Modules loaded under a
+		profile are keyed by the profile fingerprint: the properties it changes against its owner
+		module and the owner's parents. Profiles changing the same properties share one module, and
+		so do profiles changing nothing, apart from the module loaded under the owner itself.
+		"""
 		def __init__(self):
 			self.__modules = {}
+			self.__contexts = {}
+		
+		@staticmethod
+		def get_context(parent):
+			if parent is not None and parent.node_type == Pom.Profile.TYPE:
+				return (Pom.Profile.TYPE, parent.fingerprint)
+			return (Pom.Module.TYPE, None)
 		
 		def add(self, module_filepath, module):
-			if not module_filepath in self.__modules:
-				self.__modules[module_filepath] = []
-			self.__modules[module_filepath].append(module)
+			context = Pom.ModuleCache.get_context(module.parent)
+			modules = self.__modules.setdefault(module_filepath, {})
+			if context not in modules:
+				modules[context] = module
+				self.__contexts[id(module)] = (module_filepath, context)
+		
+		@property
+		def file_paths(self):
+			return self.__modules.keys()
+		
+		def items(self):
+			"""(file path, module) of every cached module"""
+			return [(module_filepath, module) for module_filepath, modules in self.__modules.iteritems() for module in modules.values()]
+		
+		def get_file_path(self, module):
+			entry = self.__contexts.get(id(module))
+			return entry[0] if entry is not None else None
+		
+		def remove(self, module):
+			entry = self.__contexts.pop(id(module), None)
+			if entry is None:
+				return
+			module_filepath, context = entry
+			modules = self.__modules[module_filepath]
+			del modules[context]
+			if len(modules) == 0:
+				del self.__modules[module_filepath]
+		
+		def invalidate(self, module_filepaths):
+			stale = []
+			for module_filepath in module_filepaths:
+				for module in self.__modules.pop(module_filepath, {}).values():
+					del self.__contexts[id(module)]
+					stale.append((module_filepath, module))
+			return stale
+		
+		def clear(self):
+			self.__modules.clear()
+			self.__contexts.clear()
 		
 		def get(self, module_filepath, parent):
-			if not module_filepath in self.__modules:
+			modules = self.__modules.get(module_filepath)
+			if modules is None:
 				return None
-			for module in self.__modules[module_filepath]:
-				if self._match(module, parent):
-					return module
-			return None
+			return modules.get(Pom.ModuleCache.get_context(parent))
+	
+	class ParseCache(object):
+		"""Persistent cache of parsed pom files, one pickled entry per file under cache_dir
 		
-		def _match(self, module, parent):
-			if module.parent == parent:
-				return True
-			if module.parent is None or module.parent.node_type == Pom.Module.TYPE:
-				if parent is None or parent.node_type == Pom.Module.TYPE:
-					return True
-				elif parent.node_type == Pom.Profile.TYPE:
-					se = Pom.ProfileSideEffect.create(parent,module)
-					return not se.is_empty
-			elif module.parent.node_type == Pom.Profile.TYPE:
-				if parent is None or parent.node_type == Pom.Module.TYPE:
-					se = Pom.ProfileSideEffect.create(module.parent, parent)
-					return not se.is_empty
-				elif parent.node_type == Pom.Profile.TYPE:
-					return Pom.ProfileSideEffect.are_same(module.parent, parent, module)
-			return False
+		An entry is the pruned Pom.XmlNode snapshot of the file, not the extracted module model: the model
+		also depends on the parent chain, the settings, the environment and the active profiles, so it is
+		rebuilt from the snapshot on every run while the XML parsing is skipped for unchanged files.
+		Named entries (store_entry/load_entry) hold derived data stamped by their callers. Disabled when
+		cache_dir is None, which is the default outside the command line (see --cache/--no-cache).
+		"""
+		VERSION = 1
+		
+		def __init__(self, cache_dir = None):
+			self.__cache_dir = cache_dir
+			self.__preloaded = {}
+		
+		@property
+		def cache_dir(self):
+			return self.__cache_dir
+		
+		@property
+		def enabled(self):
+			return self.__cache_dir is not None
+		
+		def set_cache_dir(self, cache_dir):
+			self.__cache_dir = cache_dir
+		
+		@staticmethod
+		def get_default_cache_dir():
+			cache_home = os.environ.get('XDG_CACHE_HOME', '')
+			if len(cache_home) == 0:
+				cache_home = os.path.join(Pom.Env.get_user_home(), '.cache')
+			return os.path.join(cache_home, 'ar.mvn')
+		
+		def _get_entry_path(self, file_path):
+			return os.path.join(self.cache_dir, hashlib.sha1(file_path).hexdigest() + '.pickle')
+		
+		def _read_entry(self, entry_path):
+			try:
+				with open(entry_path, 'rb') as fp:
+					entry = cPickle.load(fp)
+			except (IOError, OSError, EOFError):
+				return None
+			except Exception:
+				# corrupted or incompatible entry
+				return None
+			if not isinstance(entry, dict) or entry.get('version') != self.VERSION:
+				return None
+			return entry
+		
+		def _write_entry(self, entry_path, entry):
+			tmp_path = '{0}.{1}.tmp'.format(entry_path, os.getpid())
+			try:
+				if not os.path.isdir(self.cache_dir):
+					os.makedirs(self.cache_dir)
+				with open(tmp_path, 'wb') as fp:
+					cPickle.dump(entry, fp, cPickle.HIGHEST_PROTOCOL)
+				os.rename(tmp_path, entry_path)
+			except (IOError, OSError):
+				if os.path.isfile(tmp_path):
+					os.remove(tmp_path)
+		
+		def preload(self, file_path, xroot):
+			self.__preloaded[file_path] = xroot
+		
+		def discard(self, file_paths):
+			for file_path in file_paths:
+				self.__preloaded.pop(file_path, None)
+		
+		def clear_preloaded(self):
+			self.__preloaded.clear()
+		
+		def load(self, file_path):
+			if file_path in self.__preloaded:
+				return self.__preloaded[file_path]
+			if not self.enabled:
+				return Pom.XmlNode.iterparse(file_path)
+			entry_path = self._get_entry_path(file_path)
+			entry = self._read_entry(entry_path)
+			st = os.stat(file_path)
+			if entry is not None and entry['file_path'] == file_path:
+				if entry['mtime'] == st.st_mtime and entry['size'] == st.st_size:
+					return Pom.XmlNode.load(entry['xroot'])
+			with open(file_path, 'rb') as fp:
+				data = fp.read()
+			digest = hashlib.sha1(data).hexdigest()
+			if entry is not None and entry['file_path'] == file_path and entry['digest'] == digest:
+				xroot = Pom.XmlNode.load(entry['xroot'])
+			else:
+				xroot = Pom.XmlNode.iterparse(BytesIO(data))
+			entry = {'version': self.VERSION, 'file_path': file_path, 'mtime': st.st_mtime,
+			         'size': st.st_size, 'digest': digest, 'xroot': Pom.XmlNode.dump(xroot)}
+			self._write_entry(entry_path, entry)
+			return xroot
+		
+		def load_entry(self, name):
+			"""Entry stored under a name instead of a file path, None if missing or disabled"""
+			if not self.enabled:
+				return None
+			entry = self._read_entry(self._get_entry_path(name))
+			if entry is None or entry.get('name') != name:
+				return None
+			return entry
+		
+		def store_entry(self, name, entry):
+			if not self.enabled:
+				return
+			self._write_entry(self._get_entry_path(name), dict(entry, version=self.VERSION, name=name))
+		
+		def load_snapshot(self, file_path):
+			xroot = self.load(file_path)
+			if xroot is not None and not isinstance(xroot, Pom.XmlNode):
+				xroot = Pom.XmlNode.create(xroot)
+			return xroot
+	
+	class ReactorLoader(object):
+		"""Parses the poms of a reactor in a process pool ahead of Pom.Module.load
+		
+		Only the XML parsing runs in the workers: the parsed trees are preloaded into the parse cache
+		and the models (properties, inheritance, dependencies) are still built serially by the load.
+		"""
+		def __init__(self, jobs = 1):
+			self.__jobs = max(1, jobs)
+		
+		@property
+		def jobs(self):
+			return self.__jobs
+		
+		@staticmethod
+		def discover(file_path):
+			pom_io = Pom.IO(file_path)
+			try:
+				xroot = pom.parse_cache.load_snapshot(pom_io.file_path)
+			except Exception:
+				# leave reporting to the serial pass
+				return (pom_io.file_path, None, [])
+			if xroot is None:
+				return (pom_io.file_path, None, [])
+			file_paths = []
+			if Pom.Xml.get_node(xroot, 'parent') is not None:
+				parent_path = Pom.Module.get_parent_path(xroot, pom_io)
+				if parent_path is not None:
+					file_paths.append(parent_path)
+			xnodes = [xroot] + list(Pom.Xml.get_profiles(xroot))
+			for xnode in xnodes:
+				for xmodule in Pom.Xml.get_modules(xnode):
+					module_name = Pom.Xml.get_node_value(xmodule, '')
+					if len(module_name) == 0:
+						continue
+					file_paths.append(Pom.Modules.get_pom_file(pom_io, module_name))
+			return (pom_io.file_path, Pom.XmlNode.dump(xroot), file_paths)
+		
+		def preload(self, file_path):
+			seen = set()
+			pending = [Pom.IO(file_path).file_path]
+			pool = multiprocessing.Pool(self.jobs)
+			try:
+				while pending:
+					seen.update(pending)
+					discovered = []
+					for loaded_path, xdata, file_paths in pool.imap_unordered(_discover_pom, pending):
+						if xdata is not None:
+							pom.parse_cache.preload(loaded_path, Pom.XmlNode.load(xdata))
+						for child_path in file_paths:
+							child_path = Pom.IO(child_path).file_path
+							if child_path in seen or not os.path.isfile(child_path):
+								continue
+							seen.add(child_path)
+							discovered.append(child_path)
+					pending = discovered
+			finally:
+				pool.close()
+				pool.join()
 	
 	class BuildGraphConf(object):
 		def __init__(self, modules = None, profiles = None, level = 0):
@@ -606,8 +1078,8 @@ class Pom(object):
 			self.do_filter = False
 			
 			self.show_weight = False
-			self.output = False
 			self.output_type = 'graph'
+			self.output_format = 'text'
 			self.output_tree = True
 			self.matched_modules = set()
 			self.show_implicit = False
@@ -623,8 +1095,8 @@ class Pom(object):
 			conf.do_filter = self.do_filter
 			conf.parent_matched = self.parent_matched
 			conf.show_weight = self.show_weight
-			conf.output = self.output
 			conf.output_type = self.output_type
+			conf.output_format = self.output_format
 			conf.output_tree = self.output_tree
 			conf.matched_modules = self.matched_modules
 			conf.show_implicit =  self.show_implicit
@@ -658,73 +1130,31 @@ class Pom(object):
 			return text
 		
 		@staticmethod
-		def show(conf = None):
+		def show(conf = None, out = None):
 			if conf is None:
 				conf = Pom.BuildGraphConf()
-			Pom.BuildGraph._build(conf)
-			conf.output = True
 			if conf.output_type == 'modules':
-				Pom.BuildGraph._show_modules(conf)
+				if conf.show_implicit and conf.do_match():
+					# implicit marks come from the matches of the full graph
+					for record in Pom.BuildGraph._walk(conf):
+						pass
+				records = Pom.BuildGraph._walk_modules(conf)
 			else:
-				Pom.BuildGraph._build(conf)
+				records = Pom.BuildGraph._walk(conf)
+				if conf.show_implicit and conf.do_match():
+					# a module matched further down marks the lines printed before it
+					records = list(records)
+			Pom.BuildGraphRenderer.create(conf, out).render(records)
 		
 		@staticmethod
-		def _output_module(conf, module, display_name):
-			text = ''
-			do_match = conf.do_match()
-			matched = conf.parent_matched if do_match else False
-			if conf.show_prefix:
-				if do_match:
-					match_sign = '*' if matched else ' '
-					if not matched and conf.show_implicit:
-						implicit_match = display_name in conf.matched_modules
-						if implicit_match:
-							match_sign = '.'
-					text += '[ mod %s ]' % (match_sign)
-				else:
-					text += '[ module]'
-			padding = Pom.BuildGraph.get_padding(conf.level)
-			if conf.output_tree:
-				text += ' %s' % (padding)
-			else:
-				if conf.show_prefix:
-					text += ' '
-			text += display_name
-			if conf.show_weight:
-				text += Pom.BuildGraph.get_weight_text(conf, module, matched)
-			print text
-		
-		@staticmethod
-		def _output_profile(conf, profile, display_name):
-			text = ''
-			do_match = conf.do_match()
-			matched = conf.match_path.is_profile_active(profile) if do_match else False
-			if do_match:
-				match_sign = '*' if matched else ' '
-				text += '[prof %s ]' % (match_sign)
-			else:
-				text += '[profile]'
-			padding = Pom.BuildGraph.get_padding(conf.level)
-			text += ' %s%s' % (padding, display_name)
-			if profile.activation is not None:
-				subtext = []
-				activation = profile.activation
-				if activation.by_default:
-					subtext.append('+active')
-				if activation.property_name is not None:
-					if activation.property_value is None:
-						subtext.append('%s' % activation.property_name)
-					else:
-						subtext.append('%s=%s' % (activation.property_name, activation.property_value))
-				if len(subtext) > 0:
-					text += ' (' + ','.join(subtext) + ')'
-			if conf.show_weight:
-				text += Pom.BuildGraph.get_weight_text(conf, profile, matched)
-			print text
-		
+		def walk(conf = None):
+			"""Pom.BuildGraphRecords of the modules and profiles of the graph, depth first, as show-graph prints them"""
+			if conf is None:
+				conf = Pom.BuildGraphConf()
+			return Pom.BuildGraph._walk(conf)
 		
 		@staticmethod
-		def _show_modules(conf, parent = None):
+		def _walk_modules(conf, parent = None, parent_record = None):
 			modules = Pom.Modules()
 			if conf.modules is not None:
 				for module_name, module in conf.modules.items():
@@ -741,11 +1171,14 @@ class Pom(object):
 					module_display_name = module.artifact.moduleId
 				else:
 					module_display_name = module_name
-				Pom.BuildGraph._output_module(conf, module, module_display_name)
-				Pom.BuildGraph._show_modules(conf.fork(module.modules, module.profiles, conf.level + 1), module.artifact)
+				matched = conf.parent_matched if conf.do_match() else False
+				record = Pom.BuildGraphRecord(Pom.Module.TYPE, module, module_display_name, conf.level, matched, parent_record)
+				yield record
+				for r in Pom.BuildGraph._walk_modules(conf.fork(module.modules, module.profiles, conf.level + 1), module.artifact, record):
+					yield r
 		
 		@staticmethod
-		def _build(conf):
+		def _walk(conf, parent_record = None):
 			do_match = conf.do_match()
 			if conf.modules is not None: 
 				for module_name in sorted(conf.modules):
@@ -757,24 +1190,252 @@ class Pom(object):
 					matched = conf.parent_matched if do_match else False
 					if matched:
 						conf.matched_modules.add(module_display_name)
-					if conf.output:
-						Pom.BuildGraph._output_module(conf, module, module_display_name)
+					record = Pom.BuildGraphRecord(Pom.Module.TYPE, module, module_display_name, conf.level, matched, parent_record)
+					yield record
 					if module is not None:
-						Pom.BuildGraph._build(conf.fork(module.modules, module.profiles, conf.level + 1))
+						for r in Pom.BuildGraph._walk(conf.fork(module.modules, module.profiles, conf.level + 1), record):
+							yield r
 			if conf.profiles is not None:
 				for profile_name in sorted(conf.profiles):
 					profile = conf.profiles[profile_name]
 					matched = conf.match_path.is_profile_active(profile) if do_match else False
 					if do_match and not matched and conf.do_filter:
 						continue
-					if conf.output:
-						Pom.BuildGraph._output_profile(conf, profile, profile_name)
+					record = Pom.BuildGraphRecord(Pom.Profile.TYPE, profile, profile_name, conf.level, matched, parent_record)
+					yield record
 					if profile is not None:
 						sconf = conf.fork(profile.modules, None, conf.level + 1)
 						sconf.parent_matched = matched
-						Pom.BuildGraph._build(sconf)
+						for r in Pom.BuildGraph._walk(sconf, record):
+							yield r
+	
+	class BuildGraphRecord(object):
+		__slots__ = ('node_type', 'node', 'name', 'level', 'matched', 'parent', 'index')
+		
+		def __init__(self, node_type, node, name, level, matched, parent = None):
+			self.node_type = node_type
+			self.node = node
+			self.name = name
+			self.level = level
+			self.matched = matched
+			self.parent = parent
+			self.index = None
+	
+	class BuildGraphRenderer(object):
+		FORMATS = ('text', 'dot')
+		BUFFER_LINES = 1024
+		
+		def __init__(self, conf, out = None):
+			self.conf = conf
+			self.out = out if out is not None else sys.stdout
+		
+		@staticmethod
+		def create(conf, out = None):
+			renderers = {
+				'text': Pom.TextGraphRenderer,
+				'json': Pom.JsonGraphRenderer,
+				'ndjson': Pom.JsonGraphRenderer,
+				'dot': Pom.DotGraphRenderer,
+			}
+			if conf.output_format not in renderers:
+				raise ValueError('unknown output format: "%s"' % conf.output_format)
+			return renderers[conf.output_format](conf, out)
+		
+		def render(self, records):
+			lines = []
+			for line in self.get_lines(records):
+				lines.append(line)
+				if len(lines) >= self.BUFFER_LINES:
+					self._write(lines)
+					lines = []
+			self._write(lines)
+			self.out.flush()
+		
+		def _write(self, lines):
+			if len(lines) > 0:
+				self.out.write('\n'.join(lines) + '\n')
+		
+		def _raise(self, method):
+			raise NotImplementedError("{0}.{1}".format(self.__class__.__name__, method))
+		
+		def get_lines(self, records):
+			self._raise('get_lines()')
+		
+		def is_implicit(self, record):
+			conf = self.conf
+			return (record.node_type == Pom.Module.TYPE and not record.matched and conf.show_implicit
+			        and conf.do_match() and record.name in conf.matched_modules)
+		
+		def get_activation(self, profile):
+			activation = profile.activation if profile is not None else None
+			if activation is None:
+				return []
+			subtext = []
+			if activation.by_default:
+				subtext.append('+active')
+			if activation.property_name is not None:
+				if activation.property_value is None:
+					subtext.append('%s' % activation.property_name)
+				else:
+					subtext.append('%s=%s' % (activation.property_name, activation.property_value))
+			return subtext
+	
+	class TextGraphRenderer(BuildGraphRenderer):
+		def get_lines(self, records):
+			for record in records:
+				if record.node_type == Pom.Profile.TYPE:
+					yield self._get_profile_line(record)
+				else:
+					yield self._get_module_line(record)
+		
+		def _get_module_line(self, record):
+			conf = self.conf
+			text = ''
+			if conf.show_prefix:
+				if conf.do_match():
+					match_sign = '*' if record.matched else ' '
+					if self.is_implicit(record):
+						match_sign = '.'
+					text += '[ mod %s ]' % (match_sign)
+				else:
+					text += '[ module]'
+			padding = Pom.BuildGraph.get_padding(record.level)
+			if conf.output_tree:
+				text += ' %s' % (padding)
+			else:
+				if conf.show_prefix:
+					text += ' '
+			text += record.name
+			if conf.show_weight:
+				text += Pom.BuildGraph.get_weight_text(conf, record.node, record.matched)
+			return text
+		
+		def _get_profile_line(self, record):
+			conf = self.conf
+			text = ''
+			if conf.do_match():
+				match_sign = '*' if record.matched else ' '
+				text += '[prof %s ]' % (match_sign)
+			else:
+				text += '[profile]'
+			padding = Pom.BuildGraph.get_padding(record.level)
+			text += ' %s%s' % (padding, record.name)
+			subtext = self.get_activation(record.node)
+			if len(subtext) > 0:
+				text += ' (' + ','.join(subtext) + ')'
+			if conf.show_weight:
+				text += Pom.BuildGraph.get_weight_text(conf, record.node, record.matched)
+			return text
+	
+	class JsonGraphRenderer(BuildGraphRenderer):
+		def render(self, records):
+			writer = Pom.RecordWriter(self.conf.output_format, self.out)
+			for index, record in enumerate(records):
+				record.index = index
+				writer.write(self.get_object(record))
+			writer.close()
+		
+		def get_object(self, record):
+			conf = self.conf
+			o = {}
+			o['id'] = record.index
+			o['parent'] = record.parent.index if record.parent is not None else None
+			o['type'] = record.node_type
+			o['name'] = record.name
+			o['level'] = record.level
+			if record.node_type == Pom.Module.TYPE and record.node is not None:
+				artifact = record.node.artifact
+				o['groupId'] = artifact.groupId
+				o['artifactId'] = artifact.artifactId
+				o['version'] = artifact.version
+			if conf.do_match():
+				o['matched'] = record.matched
+				if self.is_implicit(record):
+					o['implicit'] = True
+			if record.node_type == Pom.Profile.TYPE:
+				o['activation'] = self.get_activation(record.node)
+			if conf.show_weight and record.node is not None:
+				o['weight'] = record.node.get_weight()
+				if conf.do_match() and record.matched:
+					o['match_weight'] = record.node.get_weight(conf.match_path)
+			return o
+	
+	class DotGraphRenderer(BuildGraphRenderer):
+		def get_lines(self, records):
+			yield 'digraph build {'
+			for index, record in enumerate(records):
+				record.index = index
+				attributes = ['label=%s' % self._quote(self._get_label(record))]
+				attributes.append('shape=box' if record.node_type == Pom.Module.TYPE else 'shape=ellipse')
+				if self.conf.do_match():
+					if record.matched:
+						attributes.append('style=bold')
+					elif self.is_implicit(record):
+						attributes.append('style=dashed')
+				yield '\tn%d [%s];' % (index, ', '.join(attributes))
+				if record.parent is not None:
+					yield '\tn%d -> n%d;' % (record.parent.index, index)
+			yield '}'
+		
+		def _get_label(self, record):
+			label = record.name
+			subtext = self.get_activation(record.node) if record.node_type == Pom.Profile.TYPE else []
+			if len(subtext) > 0:
+				label += ' (' + ','.join(subtext) + ')'
+			if self.conf.show_weight and record.node is not None:
+				label += '\\n%.4f' % record.node.get_weight()
+			return label
+		
+		def _quote(self, text):
+			return '"%s"' % text.replace('"', '\\"')
+	
+	class RecordWriter(object):
+		"""Streams JSON records, one per line, either bare (ndjson) or as the elements of a JSON array"""
+		FORMATS = ('json', 'ndjson')
+		
+		def __init__(self, output_format, out = None):
+			if output_format not in Pom.RecordWriter.FORMATS:
+				raise ValueError('unknown output format: "%s"' % output_format)
+			self.output_format = output_format
+			self.out = out if out is not None else sys.stdout
+			self.__pending = None
+			self.__count = 0
+		
+		def write(self, record):
+			line = json.dumps(record, sort_keys=True)
+			if self.output_format == 'ndjson':
+				self.out.write(line + '\n')
+			else:
+				if self.__count == 0:
+					self.out.write('[\n')
+				else:
+					self.out.write(self.__pending + ',\n')
+				self.__pending = line
+			self.__count += 1
+		
+		def close(self):
+			if self.output_format == 'json':
+				if self.__count == 0:
+					self.out.write('[\n')
+				else:
+					self.out.write(self.__pending + '\n')
+				self.out.write(']\n')
+			self.out.flush()
 	
 	class Xml(object):
+		_paths = {}
+		
+		@staticmethod
+		def parse(file_path):
+			parser = etree.XMLParser(recover=True)
+			xtree = etree.parse(file_path, parser)
+			return xtree.getroot()
+		
+		@staticmethod
+		def parse_string(data):
+			parser = etree.XMLParser(recover=True)
+			return etree.fromstring(data, parser)
+		
 		@staticmethod
 		def get_group_id(xnode):
 			return Pom.Xml.get_child_node_value(xnode, 'groupId', '')
@@ -839,14 +1500,16 @@ class Pom(object):
 			if xnode is None:
 				return []
 			if parent_name is not None and len(parent_name) > 0:
-				xparent = xnode.find("{*}" + parent_name)
+				xparent = Pom.Xml.get_node(xnode, parent_name)
 			else:
 				xparent = xnode
 			if xparent is not None:
 				if children_name is None or len(children_name) == 0:
 					return xparent.iterchildren()
+				elif type(xparent) is Pom.XmlNode:
+					return iter(xparent._get_index().get(children_name, ()))
 				else:
-					return xparent.iterchildren("{*}" + children_name)
+					return xparent.iterchildren(Pom.Xml.get_path(children_name))
 			else:
 				return []
 		
@@ -859,9 +1522,19 @@ class Pom(object):
 				parent = parent.getparent()
 			return parent
 		
+		@staticmethod
+		def get_path(child_name):
+			"""Namespace wildcard path for lxml lookups, built once per name"""
+			path = Pom.Xml._paths.get(child_name)
+			if path is None:
+				path = Pom.Xml._paths[child_name] = '{*}' + child_name
+			return path
+		
 		@staticmethod
 		def get_node(xnode, child_name):
-			return xnode.find('{*}' + child_name)
+			if type(xnode) is Pom.XmlNode:
+				return xnode.get(child_name)
+			return xnode.find(Pom.Xml.get_path(child_name))
 		
 		@staticmethod
 		def get_node_value(xnode, default_value = None):
@@ -875,14 +1548,162 @@ class Pom(object):
 		
 		@staticmethod
 		def get_child_node_value(xnode, child_name, default_value = None):
+			if type(xnode) is Pom.XmlNode:
+				return xnode.get_value(child_name, default_value)
 			xnode = Pom.Xml.get_node(xnode, child_name)
 			return Pom.Xml.get_node_value(xnode, default_value)
 		
 		@staticmethod
 		def get_clean_tag(xnode):
 			if xnode is None: return ''
+			if type(xnode) is Pom.XmlNode:
+				return xnode.tag # already clean
 			return re.sub('^({[^{]*})?[ \t]*(.*)$', '\\2', xnode.tag.strip())
 	
+	class XmlNode(object):
+		__slots__ = ('tag', 'text', 'children', '_index', '_values')
+		
+		PROJECT_NODES = frozenset(['parent', 'groupId', 'artifactId', 'version', 'packaging', 'properties', 'modules', 
+		                           'profiles', 'repositories', 'pluginRepositories', 'dependencies', 'dependencyManagement', 
+		                           'build', 'id', 'activation'])
+		BUILD_NODES = frozenset(['directory', 'outputDirectory', 'testOutputDirectory', 'sourceDirectory', 
+		                         'scriptSourceDirectory', 'testSourceDirectory', 'resources', 'testResources'])
+		SETTINGS_NODES = frozenset(['localRepository', 'mirrors', 'profiles', 'activeProfiles'])
+		PRUNED = {'project': PROJECT_NODES, 'profile': PROJECT_NODES, 'build': BUILD_NODES, 'settings': SETTINGS_NODES}
+		
+		def __init__(self, tag, text = None):
+			self.tag = tag
+			self.text = text
+			self.children = []
+			self._index = None
+			self._values = None
+		
+		def _get_index(self):
+			# children and stripped child values by tag, built in one pass on first lookup; trees are not
+			# modified once built
+			index = self._index
+			if index is None:
+				index = self._index = {}
+				values = self._values = {}
+				for child in self.children:
+					tag = child.tag
+					if tag in index:
+						index[tag].append(child)
+					else:
+						index[tag] = [child]
+						if child.text is not None:
+							value = child.text.strip()
+							if len(value) > 0:
+								values[tag] = value
+			return index
+		
+		def get_value(self, tag, default_value = None):
+			if self._values is None:
+				self._get_index()
+			return self._values.get(tag, default_value)
+		
+		def get(self, tag):
+			children = self._get_index().get(tag)
+			return children[0] if children is not None else None
+		
+		def find(self, path):
+			return self.get(Pom.XmlNode._get_tag(path))
+		
+		def iterchildren(self, tag = None):
+			if tag is None:
+				return iter(self.children)
+			return iter(self._get_index().get(Pom.XmlNode._get_tag(tag), ()))
+		
+		def __iter__(self):
+			return iter(self.children)
+		
+		def __len__(self):
+			return len(self.children)
+		
+		@staticmethod
+		def _get_tag(path):
+			if path.startswith('{'):
+				return path[path.find('}') + 1:]
+			return path
+		
+		@classmethod
+		def create(cls, xelement):
+			if xelement is None:
+				return None
+			tag = Pom.Xml.get_clean_tag(xelement)
+			node = cls(tag, xelement.text)
+			names = cls.PRUNED.get(tag)
+			for xchild in xelement:
+				if not isinstance(xchild.tag, basestring):
+					continue
+				if names is not None and Pom.Xml.get_clean_tag(xchild) not in names:
+					continue
+				node.children.append(cls.create(xchild))
+			return node
+		
+		@classmethod
+		def iterparse(cls, source):
+			"""
+			Streams source (file path or file object) into a pruned tree without building the whole document:
+			elements outside the PRUNED whitelists are never materialized and every element is cleared once
+			its end tag has been seen.
+			"""
+			root = None
+			stack = []
+			skip = 0
+			events = etree.iterparse(source, events=('start', 'end'), recover=True, remove_comments=True, remove_pis=True)
+			try:
+				for event, xelement in events:
+					if skip > 0:
+						# inside a pruned subtree
+						if event == 'start':
+							skip += 1
+						else:
+							skip -= 1
+							xelement.clear()
+						continue
+					if event == 'start':
+						tag = xelement.tag
+						tag = tag[tag.find('}') + 1:]
+						if root is None:
+							node = root = cls(tag)
+						else:
+							parent = stack[-1]
+							names = cls.PRUNED.get(parent.tag)
+							if names is not None and tag not in names:
+								skip = 1
+								continue
+							node = cls(tag)
+							parent.children.append(node)
+						stack.append(node)
+					else:
+						stack.pop().text = xelement.text
+						xelement.clear()
+						while xelement.getprevious() is not None:
+							del xelement.getparent()[0]
+			except etree.XMLSyntaxError:
+				if root is None:
+					return None
+			return root
+		
+		@staticmethod
+		def dump(node):
+			if node is None:
+				return None
+			return (node.tag, node.text, tuple(Pom.XmlNode.dump(child) for child in node.children))
+		
+		@classmethod
+		def load(cls, data):
+			if data is None:
+				return None
+			tag, text, children = data
+			node = cls(tag, text)
+			node.children = [cls.load(child) for child in children]
+			return node
+		
+		def __repr__(self):
+			return "{0}('{1}')".format(self.__class__.__name__, self.tag)
+	
 	class IO(object):
 		def __init__(self, file_path):
 			file_path = os.path.expanduser(file_path)
@@ -904,26 +1725,88 @@ class Pom(object):
 			return "{0}('{1}')".format(self.__class__.__name__, self.file_path)
 	
 	class Properties(dict):
+		REFERENCE = re.compile('\\${([^}]*)}')
+		_revisions = itertools.count(1)
+		TOKENS_CACHE_SIZE = 16384
+		_tokens = None
+		
 		def __init__(self, *args, **kwargs):
 			dict.__init__(self, *args, **kwargs)
 			self.__parent = None
 			self.__internal = set()
+			self.__revision = next(Pom.Properties._revisions)
+			self.__resolved = {}
+			self.__resolved_revision = None
 		
 		@property
 		def parent(self):
 			return self.__parent
 		
+		def set_parent(self, parent):
+			self.__parent = parent
+			self._changed()
+		
 		@property
 		def internal(self):
 			return self.__internal
 		
+		@property
+		def revision(self):
+			revision = self.__revision
+			parent = self.__parent
+			while parent is not None:
+				revision = max(revision, parent.__revision)
+				parent = parent.__parent
+			return revision
+		
+		def _changed(self):
+			self.__revision = next(Pom.Properties._revisions)
+		
+		def __setitem__(self, key, value):
+			dict.__setitem__(self, key, value)
+			self._changed()
+		
+		def __delitem__(self, key):
+			dict.__delitem__(self, key)
+			self._changed()
+		
+		def update(self, *args, **kwargs):
+			dict.update(self, *args, **kwargs)
+			self._changed()
+		
+		def setdefault(self, key, value = None):
+			if key not in self:
+				self._changed()
+			return dict.setdefault(self, key, value)
+		
+		def pop(self, *args):
+			self._changed()
+			return dict.pop(self, *args)
+		
+		def popitem(self):
+			self._changed()
+			return dict.popitem(self)
+		
+		def clear(self):
+			dict.clear(self)
+			self._changed()
+		
+		@staticmethod
+		def _tokenize(value):
+			# literal and reference segments alternate: literal, key, literal, ..., literal
+			cache = Pom.Properties._tokens
+			if cache is None:
+				cache = Pom.Properties._tokens = Pom.LruCache(Pom.Properties.TOKENS_CACHE_SIZE)
+			tokens = cache.get(value)
+			if tokens is None:
+				tokens = tuple(Pom.Properties.REFERENCE.split(value))
+				cache.put(value, tokens)
+			return tokens
+		
 		def _get_item_keys(self, value, ignore_list = None):
-			keys = set(re.findall('\${([^}]*)}', value))
+			keys = set(self._tokenize(value)[1::2])
 			if ignore_list is not None:
-				for key in list(keys):
-					if key in ignore_list:
-						keys.remove(key)
-			#keys.remove('')
+				keys.difference_update(ignore_list)
 			return keys
 			
 		def expand_required(self, value = None, ignore_list = None):
@@ -942,56 +1825,92 @@ class Pom(object):
 			return self.expand_item(None, value)
 		
 		def expand_item(self, key=None, value=None):
-			self._expand_cache = {}
-			value = self._expand_item(key, value)
-			self._expand_cache = {}
-			return value
+			return self._expand_item(key, value)
 		
-		def _get_value(self, key, cache = None):
-			if cache is not None:
-				value = cache.get(key, self.get(key))
-			else:
-				value = self.get(key)
+		def _get_value(self, key):
+			value = self.get(key)
 			if value is not None:
 				return value
 			if self.parent is not None:
-				return self.parent._get_value(key, cache)
+				return self.parent._get_value(key)
 			else:
 				return None
 		
+		def _get_resolved(self):
+			revision = self.revision
+			if self.__resolved_revision != revision:
+				self.__resolved = {}
+				self.__resolved_revision = revision
+			return self.__resolved
+		
+		def _resolve(self, key, value):
+			# Iterative depth-first expansion of the reference graph. A reference
+			# closing a cycle, or to an undefined key, is left as is. Results not
+			# involved in a cycle are memoized until this object or its parent
+			# chain changes.
+			resolved = self._get_resolved()
+			tokens = self._tokenize(value)
+			if len(tokens) == 1:
+				return value
+			depth_max = sys.maxint
+			frames = [[key, tokens, 0, [], depth_max]]
+			path = {}
+			if key is not None:
+				path[key] = 0
+			while True:
+				frame = frames[-1]
+				item_key, tokens, idx, parts, low = frame
+				if idx < len(tokens):
+					frame[2] = idx + 1
+					token = tokens[idx]
+					if idx % 2 == 0:
+						parts.append(token)
+						continue
+					if token in path:
+						parts.append('${' + token + '}')
+						frame[4] = min(low, path[token])
+						continue
+					if token in resolved:
+						parts.append(resolved[token])
+						continue
+					token_value = self._get_value(token)
+					if token_value is None:
+						resolved[token] = '${' + token + '}'
+						parts.append(resolved[token])
+						continue
+					token_tokens = self._tokenize(token_value)
+					if len(token_tokens) == 1:
+						resolved[token] = token_value
+						parts.append(token_value)
+						continue
+					path[token] = len(frames)
+					frames.append([token, token_tokens, 0, [], depth_max])
+					continue
+				frames.pop()
+				item_value = ''.join(parts)
+				depth = len(frames)
+				if item_key is not None:
+					del path[item_key]
+					if low == depth_max:
+						resolved[item_key] = item_value
+				if depth == 0:
+					return item_value
+				parent_frame = frames[-1]
+				parent_frame[3].append(item_value)
+				parent_frame[4] = min(parent_frame[4], low)
+		
 		def _expand_item(self, key=None, value=None):
 			if key is None and value is None: 
 				return '' 
-			stack = []
-			stack.append(key)
-			irreplaceable = set()
-			while True:
-				item_key = stack.pop()
-				item_value = value if item_key is None else self._get_value(item_key, self._expand_cache)
-				if item_value is not None:
-					if self.expand_required(item_value):
-						replace_keys = self._get_item_keys(item_value)
-						for replace_key in list(replace_keys):
-							if replace_key in stack:
-								replace_keys.remove(replace_key)
-								irreplaceable.add(replace_key)
-								continue
-							replace_value = self._get_value(replace_key, self._expand_cache)
-							if replace_value is None:
-								replace_keys.remove(replace_key)
-								irreplaceable.add(replace_key)
-							elif not self.expand_required(replace_value, irreplaceable):
-								replace_keys.remove(replace_key)
-								item_value = item_value.replace('${' + replace_key + '}', replace_value)
-						if len(replace_keys) > 0:
-							stack.append(item_key)
-							for replace_key in replace_keys:
-								stack.append(replace_key)
-				if item_key is not None:
-					self._expand_cache[item_key] = item_value
-				if len(stack) == 0:
-					break
-			return next((item for item in [item_value, key, value] if item is not None), '')
+			if key is None:
+				return self._resolve(None, value)
+			item_value = self._get_value(key)
+			if item_value is None:
+				return key
+			resolved = self._get_resolved()
+			if key in resolved:
+				return resolved[key]
+			return self._resolve(key, item_value)
 		
 		def _expand_self(self):
 			if not self.expand_required():
@@ -999,14 +1918,16 @@ class Pom(object):
 			for k, v in self.items():
 				if v is None: 
 					self[k] = ''
-					continue
+			expanded = {}
+			for k, v in self.items():
 				if self.expand_required(v):
-					self[k] = self._expand_item(k) 
+					expanded[k] = self._expand_item(k)
+			if len(expanded) > 0:
+				self.update(expanded)
 		
 		def _add_build_properties(self, pom_io, xroot):
 			if pom_io is None:
 				return
-			self._expand_cache = {}
 			# initial
 			self['basedir'] = pom_io.dir_path
 			self['project.basedir'] = self['basedir']
@@ -1047,10 +1968,8 @@ class Pom(object):
 						value = Pom.Xml.get_child_node_value(xsubnode, 'directory', '')
 						if len(value) > 0: 
 							self['project.build.{0}.{1}.directory'.format(tag, subtag)] = self._expand_item(value)
-			self._expand_cache = {}
 		
 		def _add_project_properties(self, xroot):
-			self._expand_cache = {}
 			# SuperPOM (artifact)
 			parent_tag = Pom.Xml.get_clean_tag(xroot)
 			if parent_tag == 'project':
@@ -1064,10 +1983,8 @@ class Pom(object):
 					self.internal.add('project.version')
 				self['project.finalName'] = self._expand_item('${project.artifactId}-${project.version}')
 				self.internal.add('project.finalName')
-			self._expand_cache = {}
 		
 		def _add_session_properties(self, pom_io):
-			self._expand_cache = {}
 			key = 'session.executionRootDirectory'
 			value = None
 			if self.parent is not None:
@@ -1111,7 +2028,7 @@ class Pom(object):
 		@classmethod
 		def create(cls, xroot, parent_properties=None, pom_io=None):
 			properties = cls()
-			properties.__parent = parent_properties
+			properties.set_parent(parent_properties)
 			properties._add_build_properties(pom_io, xroot)
 			properties._add_project_properties(xroot)
 			properties._add_session_properties(pom_io)
@@ -1122,9 +2039,7 @@ class Pom(object):
 				key = Pom.Xml.get_clean_tag(xproperty)
 				value = Pom.Xml.get_node_value(xproperty, '') 
 				properties[key] = value
-			properties._expand_cache = {}
 			properties._expand_self()
-			properties._expand_cache = {}
 			return properties
 	
 	class ArtifactOrigin(object):
@@ -1139,7 +2054,136 @@ class Pom(object):
 			else:
 				return value
 	
+	class PersistentMap(object):
+		"""Immutable map sharing the entries of the map it is derived from
+		
+		A derived map keeps only the entries it adds or replaces and looks the others up in its base,
+		so the maps derived from one base share it instead of copying it. Items come in base order,
+		replaced entries keeping their place, followed by the added ones.
+		"""
+		__slots__ = ('__base', '__items', '__order', '__size', '__depth')
+		MAX_DEPTH = 16
+		
+		def __init__(self, base = None, items = ()):
+			items = list(items)
+			self.__base = base
+			self.__items = dict(items)
+			self.__order = tuple(k for k, _ in items)
+			self.__size = len(self.__items)
+			self.__depth = 0
+			if base is not None:
+				self.__size += sum(1 for k in self.__items if k not in base)
+				self.__depth = base.__depth + 1
+		
+		@property
+		def base(self):
+			return self.__base
+		
+		def assoc(self, items):
+			"""Map with the given (key, value) pairs set, self when none of them changes anything"""
+			missing = object()
+			changes = []
+			for k, v in items:
+				# equal values are kept too, so the maps derived from one base share them
+				value = self.get(k, missing)
+				if value is missing or value != v:
+					changes.append((k, v))
+			if len(changes) == 0:
+				return self
+			if self.__depth >= Pom.PersistentMap.MAX_DEPTH:
+				# bounds lookups at the price of sharing
+				return Pom.PersistentMap(None, self.items() + changes)
+			return Pom.PersistentMap(self, changes)
+		
+		def get(self, key, default = None):
+			node = self
+			while node is not None:
+				if key in node.__items:
+					return node.__items[key]
+				node = node.__base
+			return default
+		
+		def __getitem__(self, key):
+			missing = object()
+			value = self.get(key, missing)
+			if value is missing:
+				raise KeyError(key)
+			return value
+		
+		def __contains__(self, key):
+			node = self
+			while node is not None:
+				if key in node.__items:
+					return True
+				node = node.__base
+			return False
+		
+		def __len__(self):
+			return self.__size
+		
+		def __iter__(self):
+			return iter(self.keys())
+		
+		def keys(self):
+			layers = []
+			node = self
+			while node is not None:
+				layers.append(node.__order)
+				node = node.__base
+			keys = []
+			seen = set()
+			for order in reversed(layers):
+				for key in order:
+					if key not in seen:
+						seen.add(key)
+						keys.append(key)
+			return keys
+		
+		def values(self):
+			return [self[key] for key in self.keys()]
+		
+		def items(self):
+			return [(key, self[key]) for key in self.keys()]
+	
+	class LruCache(object):
+		def __init__(self, max_size):
+			self.__max_size = max_size
+			self.__items = collections.OrderedDict()
+		
+		@property
+		def max_size(self):
+			return self.__max_size
+		
+		def get(self, key, default_value = None):
+			items = self.__items
+			if key not in items:
+				return default_value
+			value = items.pop(key)
+			items[key] = value
+			return value
+		
+		def put(self, key, value):
+			items = self.__items
+			if key in items:
+				del items[key]
+			elif len(items) >= self.__max_size:
+				items.popitem(False)
+			items[key] = value
+		
+		def clear(self):
+			self.__items.clear()
+		
+		def __contains__(self, key):
+			return key in self.__items
+		
+		def __len__(self):
+			return len(self.__items)
+	
 	class ArtifactVersion(object):
+		__slots__ = ('__major', '__minor', '__incremental', '__build_number', '__qualifier', '__comparer')
+		CACHE_SIZE = 16384
+		_cache = None
+		
 		def __init__(self, version):
 			self.__major = None
 			self.__minor = None
@@ -1173,11 +2217,30 @@ class Pom(object):
 		def comparer(self):
 			return self.__comparer
 		
+		@property
+		def key(self):
+			return self.__comparer.key
+		
 		def compare_to(self, other):
+			if other is self:
+				return 0
 			if isinstance(other, self.__class__):
 				return self.__comparer.compare_to(other.comparer)
 			else:
-				return self.compare_to(Pom.ArtifactVersion(str(other)))
+				return self.compare_to(Pom.ArtifactVersion.of(str(other)))
+		
+		@staticmethod
+		def of(version):
+			if isinstance(version, Pom.ArtifactVersion):
+				return version
+			cache = Pom.ArtifactVersion._cache
+			if cache is None:
+				cache = Pom.ArtifactVersion._cache = Pom.LruCache(Pom.ArtifactVersion.CACHE_SIZE)
+			o = cache.get(version)
+			if o is None:
+				o = Pom.ArtifactVersion(version)
+				cache.put(version, o)
+			return o
 		
 		def _get_int(self, value):
 			int_value = int(value)
@@ -1252,6 +2315,8 @@ class Pom(object):
 			return 11 + hash(self.__comparer)
 	
 	class VersionComparer(object):
+		__slots__ = ('__value', '__items', '__canonical', '__key')
+		
 		def __init__(self, version):
 			self._parse(version)
 		
@@ -1267,6 +2332,14 @@ class Pom(object):
 		def items(self):
 			return self.__items
 		
+		@property
+		def key(self):
+			"""
+			Sort key for sorted() and bisect, compared in C: cmp(a.key, b.key) == a.compare_to(b) wherever the
+			pairwise order is transitive. compare_to() stays the reference for comparison and equality.
+			"""
+			return self.__key
+		
 		def compare_to(self, other):
 			return isinstance(other, self.__class__) and self.items.compare_to(other.items)
 		
@@ -1317,6 +2390,7 @@ class Pom(object):
 				lizt = stack.pop()
 				lizt._normalize()
 			self.__canonical = str(self.items)
+			self.__key = self.items.sequence_key
 		
 		def _parse_item(self, is_digit, value):
 			if is_digit:
@@ -1337,6 +2411,47 @@ class Pom(object):
 			return hash(self.canonical)
 		
 		
+		class PaddedAbove(tuple):
+			"""Key of an item that, with the items after it, compares above missing items"""
+			__slots__ = ()
+		
+		
+		class PaddedBelow(tuple):
+			"""Key of an item that, with the items after it, compares below missing items"""
+			__slots__ = ()
+		
+		
+		class KeyEnd(object):
+			"""
+			Ends every sequence key. Against an item key in the same place it answers like compare_to()
+			against padding: tuples do not compare with it, so Python falls back to these methods.
+			"""
+			__slots__ = ()
+			
+			def __lt__(self, other):
+				return isinstance(other, Pom.VersionComparer.PaddedAbove)
+			
+			def __gt__(self, other):
+				return isinstance(other, Pom.VersionComparer.PaddedBelow)
+			
+			def __le__(self, other):
+				return self is other or self.__lt__(other)
+			
+			def __ge__(self, other):
+				return self is other or self.__gt__(other)
+			
+			def __eq__(self, other):
+				return self is other
+			
+			def __ne__(self, other):
+				return self is not other
+			
+			def __hash__(self):
+				return 0
+		
+		END = KeyEnd()
+		
+		
 		class Item(object):
 			def __init__(self, value=None):
 				self.__value = value
@@ -1352,6 +2467,10 @@ class Pom(object):
 			def is_null(self):
 				self._raise('is_null')
 			
+			@property
+			def sort_key(self):
+				self._raise('sort_key')
+			
 			def compare_to(self, value):
 				self._raise('compare_to()')
 			
@@ -1368,6 +2487,10 @@ class Pom(object):
 			def is_null(self):
 				return self.value == 0
 			
+			@property
+			def sort_key(self):
+				return (2, self.value) # 1-sp < 1-1 < 1.1
+			
 			def compare_to(self, item):
 				if item is None:
 					return 0 if self.is_null else 1 # 1.0 == 1, 1.1 > 1
@@ -1404,6 +2527,10 @@ class Pom(object):
 			def is_null(self):
 				return cmp(self._cmp_qualifier(self.value), self.RELEASE_VERSION_INDEX) == 0
 			
+			@property
+			def sort_key(self):
+				return (0, self._cmp_qualifier(self.value))
+			
 			def _cmp_qualifier(self, qualifier):
 				idx = self.QUALIFIERS.index(qualifier) if qualifier in self.QUALIFIERS else None
 				if idx is None:
@@ -1439,6 +2566,29 @@ class Pom(object):
 			def is_null(self):
 				return len(self) == 0
 			
+			@property
+			def sort_key(self):
+				return (1, self.sequence_key)
+			
+			@property
+			def sequence_key(self):
+				"""
+				Items are keyed by (type, value), so two present items compare as in compare_to(). The key of
+				each item is tagged with the result of comparing it and the items after it against padding,
+				which is what the KeyEnd of a shorter list looks at. Trailing items equal to padding are dropped.
+				"""
+				key = [Pom.VersionComparer.END]
+				sign = 0
+				for idx in xrange(len(self) - 1, -1, -1):
+					item = self[idx]
+					sign = item.compare_to(None) or sign
+					if sign > 0:
+						key.append(Pom.VersionComparer.PaddedAbove(item.sort_key))
+					elif sign < 0:
+						key.append(Pom.VersionComparer.PaddedBelow(item.sort_key))
+				key.reverse()
+				return tuple(key)
+			
 			def compare_to(self, item):
 				if item is None:
 					if len(self) == 0:
@@ -1522,12 +2672,34 @@ class Pom(object):
 		
 		def contains_version(self, version):
 			if not isinstance(version, Pom.ArtifactVersion):
-				version = Pom.ArtifactVersion(version)
+				version = Pom.ArtifactVersion.of(version)
 			for restriction in self.__restrictions:
 				if restriction.contains_version(version):
 					return True
 			return False
 		
+		def filter(self, versions):
+			"""
+			Returns the versions (strings or ArtifactVersion) contained in this range, in ascending order. The
+			sort keys narrow the candidates down; contains_version() has the last word on each of them.
+			"""
+			candidates = sorted((Pom.ArtifactVersion.of(version).key, version) for version in versions)
+			keys = [key for key, version in candidates]
+			slices = sorted(restriction.get_slice(keys) for restriction in self.__restrictions)
+			result = []
+			end = 0
+			for lo, hi in slices:
+				lo = max(lo, end)
+				if lo < hi:
+					result.extend(version for key, version in candidates[lo:hi] if self.contains_version(version))
+					end = hi
+			return result
+		
+		def best(self, versions):
+			"""Returns the highest version contained in this range or None"""
+			matches = self.filter(versions)
+			return matches[-1] if len(matches) > 0 else None
+		
 		def restrict(self, other):
 			r1 = self.__restrictions
 			r2 = other.restrictions
@@ -1625,7 +2797,7 @@ class Pom(object):
 		
 		@staticmethod
 		def create_from_version(version):
-			return Pom.VersionRange(ArtifactVersion(version), [])
+			return Pom.VersionRange(Pom.ArtifactVersion.of(version), [])
 		
 		@staticmethod
 		def create_from_version_spec(spec):
@@ -1660,7 +2832,7 @@ class Pom(object):
 				if len(restrictions) > 0:
 					raise Pom.VersionException('Only fully-qualified sets allowed in multiple set scenario: ' + spec)
 				else:
-					version = Pom.ArtifactVersion(process)
+					version = Pom.ArtifactVersion.of(process)
 					restrictions.append(Pom.VersionRestriction.allow_everything())
 			return Pom.VersionRange(version, restrictions)
 		
@@ -1674,15 +2846,15 @@ class Pom(object):
 			if idx < 0:
 				if not lower_inclusive or not upper_inclusive:
 					raise Pom.VersionException('Single version must be surrounded by []: ' + spec)
-				version = Pom.ArtifactVersion(process)
+				version = Pom.ArtifactVersion.of(process)
 				return Pom.VersionRestriction(version, lower_inclusive, version, upper_inclusive)
 			else:
 				lower_bound = process[0:idx].strip()
 				upper_bound = process[idx+1:].strip()
 				if lower_bound == upper_bound:
 					raise Pom.VersionException('Range cannot have identical boundries: ' + spec)
-				lower_version = Pom.ArtifactVersion(lower_bound) if len(lower_bound) > 0 else None
-				upper_version = Pom.ArtifactVersion(upper_bound) if len(upper_bound) > 0 else None
+				lower_version = Pom.ArtifactVersion.of(lower_bound) if len(lower_bound) > 0 else None
+				upper_version = Pom.ArtifactVersion.of(upper_bound) if len(upper_bound) > 0 else None
 				if upper_version is not None and lower_version is not None and upper_version.compare_to(lower_version) < 0:
 					raise Pom.VersionException('Ranges defies version ordering: ' + spec)
 				return Pom.VersionRestriction(lower_version, lower_inclusive, upper_version, upper_inclusive)
@@ -1762,6 +2934,22 @@ class Pom(object):
 					return False
 			return True
 		
+		def get_slice(self, keys):
+			"""Returns (lo, hi) such that keys[lo:hi] are the sorted version keys within this restriction"""
+			lo = 0
+			hi = len(keys)
+			if self.__lower_bound is not None:
+				if self.__lower_inclusive:
+					lo = bisect.bisect_left(keys, self.__lower_bound.key)
+				else:
+					lo = bisect.bisect_right(keys, self.__lower_bound.key)
+			if self.__upper_bound is not None:
+				if self.__upper_inclusive:
+					hi = bisect.bisect_right(keys, self.__upper_bound.key)
+				else:
+					hi = bisect.bisect_left(keys, self.__upper_bound.key)
+			return lo, max(lo, hi)
+		
 		def __eq__(self, other):
 			if not isinstance(other, self.__class__):
 				return False
@@ -1820,6 +3008,8 @@ class Pom(object):
 			self.__classifier = classifier
 			self.__version = version
 			self.__moduleId = self.get_module_id()
+			self.__fullId = self.get_module_id(True)
+			self.__hash = hash(self.__fullId)
 		
 		@property
 		def origin(self):
@@ -1862,8 +3052,7 @@ class Pom(object):
 				return {'artifactId': clean(p[0])}
 			if 3 < l > 5:
 				return {}
-			if l >= 3:
-				parts = {'groupId': clean(p[0]), 'artifactId': clean(p[1])}
+			parts = {'groupId': clean(p[0]), 'artifactId': clean(p[1])}
 			if l == 3:
 				parts['version'] = clean(p[2])
 			elif l == 4:
@@ -1902,16 +3091,16 @@ class Pom(object):
 			return moduleId
 		
 		def __eq__(self, other):
-			return self.get_module_id() == other.get_module_id()
+			return self.__moduleId == other.moduleId
 		
 		def __ne__(self, other):
 			return not self.__eq__(other)
 		
 		def __hash__(self):
-			return hash(self.get_module_id(True))
+			return self.__hash
 		
 		def __str__(self):
-			return self.get_module_id(True)
+			return self.__fullId
 		
 		def __repr__(self):
 			return "Pom.Artifact(%s)" % str(self)
@@ -1921,7 +3110,7 @@ class Pom(object):
 			origin = Pom.ArtifactOrigin.ensure(origin)
 			
 			properties = module.properties if module else Pom.Properties()
-			managed_dependencies = module.all_managed_dependencies if module else Pom.Dependencies()
+			managed_dependencies = module.all_managed_dependencies if module else Pom.ManagedDependencies(Pom.Dependencies())
 			
 			parent = None
 			parent_tag = Pom.Xml.get_clean_tag(xroot)
@@ -1941,22 +3130,14 @@ class Pom(object):
 					raise Exception("groupId and version not defined for artifact (%s)" % (artifactId))
 				if origin != Pom.ArtifactOrigin.DEPENDENCY:
 					raise Exception("groupId not defined for artifact (%s::%s)" % (artifactId, version))
-				found = None
-				mx_version = version or parent.version
-				for dependency in managed_dependencies.values():
-					if dependency.artifact.match(artifactId=artifactId, version=mx_version):
-						found = dependency
+				found = managed_dependencies.find(artifactId=artifactId, version=version or parent.version)
 				if found is None:
 					raise Exception("groupId not defined for dependency (%s::%s)" % (artifactId, version))
 				groupId = found.artifact.groupId
 			if len(version) == 0 and (parent is None or len(parent.version) == 0):
 				if origin != Pom.ArtifactOrigin.DEPENDENCY:
 					raise Exception("version not defined for artifact (%s:%s)" % (groupId, artifactId))
-				found = None
-				mx_groupId = groupId or parent.groupId
-				for dependency in managed_dependencies.values():
-					if dependency.artifact.match(groupId=mx_groupId, artifactId=artifactId):
-						found = dependency
+				found = managed_dependencies.find(groupId=groupId or parent.groupId, artifactId=artifactId)
 				if found is None:
 					raise Exception("version not defined for dependency (%s:%s)" % (groupId, artifactId))
 				version = found.artifact.version
@@ -1971,114 +3152,912 @@ class Pom(object):
 			classifier = expand(Pom.Xml.get_classifier(xroot))
 			return Pom.Artifact(origin, parent, groupId, artifactId, packaging, classifier, version)
 	
-	class Dependencies(dict):
-		def __init__(self, *args, **kwargs):
-			dict.__init__(self, *args, **kwargs)
-			self.__is_managed = set()
-			self.__managed = {}
+	class Dependencies(dict):
+		_revisions = itertools.count(1)
+		
+		def __init__(self, *args, **kwargs):
+			dict.__init__(self, *args, **kwargs)
+			self.__managed = {}
+			self.__managed_by_name = {}
+			self.__managed_by_key = {}
+			self.__managed_positions = {}
+			self.__managed_revision = next(Pom.Dependencies._revisions)
+			self.__imports = []
+			self.__imported = []
+			self.__imported_managed = None
+			self.__declared = []
+			self.__is_declared = set()
+		
+		@property
+		def managed(self):
+			return self.__managed
+		
+		@property
+		def managed_revision(self):
+			return self.__managed_revision
+		
+		@property
+		def imports(self):
+			"""Imported BOMs (scope import), in declaration order"""
+			return self.__imports
+		
+		@property
+		def imported(self):
+			"""Pom.Dependencies of the imported BOMs, shared with every module importing them"""
+			return self.__imported
+		
+		@property
+		def imported_managed(self):
+			# the first BOM managing an artifact wins, as in maven
+			if self.__imported_managed is None:
+				imported_managed = {}
+				for imported in reversed(self.__imported):
+					imported_managed.update(imported.managed)
+				self.__imported_managed = imported_managed
+			return self.__imported_managed
+		
+		@property
+		def declared(self):
+			"""Dependencies (not only managed ones) in declaration order"""
+			return [self[artifact] for artifact in self.__declared]
+		
+		def add(self, dependency):
+			if dependency is None or not isinstance(dependency, Pom.Dependency):
+				return
+			if dependency.artifact not in self.__is_declared:
+				self.__is_declared.add(dependency.artifact)
+				self.__declared.append(dependency.artifact)
+			self[dependency.artifact] = dependency
+			if dependency.artifact in self.__managed:
+				replaced = self.__managed[dependency.artifact]
+				self.__managed[dependency.artifact] = dependency
+				self._index_managed(dependency, replaced)
+				self.__managed_revision = next(Pom.Dependencies._revisions)
+		
+		def add_managed(self, dependency):
+			if dependency is None or not isinstance(dependency, Pom.Dependency):
+				return
+			self[dependency.artifact] = dependency
+			replaced = self.__managed.get(dependency.artifact)
+			self.__managed[dependency.artifact] = dependency
+			self._index_managed(dependency, replaced)
+			self.__managed_revision = next(Pom.Dependencies._revisions)
+		
+		def _index_managed(self, dependency, replaced = None):
+			# a replaced dependency keeps its declaration position, found by its managed key
+			artifact = dependency.artifact
+			named = self.__managed_by_name.setdefault(artifact.artifactId, [])
+			key = (artifact.groupId, artifact.artifactId)
+			if replaced is None:
+				self.__managed_positions[artifact] = len(named)
+				named.append(dependency)
+				self.__managed_by_key[key] = dependency
+				return
+			named[self.__managed_positions[artifact]] = dependency
+			if self.__managed_by_key.get(key) is replaced:
+				self.__managed_by_key[key] = dependency
+		
+		def add_import(self, bom, imported):
+			self.__imports.append(bom)
+			self.__imported.append(imported)
+			self.__imported_managed = None
+			self.__managed_revision = next(Pom.Dependencies._revisions)
+		
+		def get_managed_by_key(self):
+			"""Managed dependencies by mediation key, the last declared one winning"""
+			return {dependency.get_key(): dependency for named in self.__managed_by_name.itervalues() for dependency in named}
+		
+		def find_managed(self, groupId = None, artifactId = None, version = None):
+			"""Last declared managed dependency matching the given coordinates"""
+			if version is None and groupId is not None:
+				return self.__managed_by_key.get((groupId, artifactId))
+			for dependency in reversed(self.__managed_by_name.get(artifactId, ())):
+				if dependency.artifact.match(groupId=groupId, version=version):
+					return dependency
+			return None
+		
+		@staticmethod
+		def populate(module, xroot):
+			for xdependency in Pom.Xml.get_dependencies(xroot, True):
+				try:
+					dependency = Pom.Dependency.parse(xdependency, module)
+				except Exception as e:
+					print >> sys.stderr, "[error] " + e.message
+					continue
+				if dependency.scope == 'import':
+					Pom.Dependencies._import(module, dependency)
+					continue
+				module.dependencies.add_managed(dependency)
+			for xdependency in Pom.Xml.get_dependencies(xroot, False):
+				try:
+					dependency = Pom.Dependency.parse(xdependency, module)
+				except Exception as e:
+					print >> sys.stderr, "[error] " + e.message
+					continue
+				if dependency.scope == 'import':
+					print >> sys.stderr, "[error] invalid scope (import) for dependency %s" % dependency.artifact
+					continue
+				module.dependencies.add(dependency)
+		
+		@staticmethod
+		def _import(module, bom):
+			artifact = bom.artifact
+			if bom.deptype != 'pom':
+				print >> sys.stderr, "[error] BOM %s imported with type (%s) instead of pom" % (artifact, bom.deptype)
+				return
+			managed = pom.bom_store.get(artifact.groupId, artifact.artifactId, artifact.version)
+			if managed is None:
+				cycle = pom.bom_store.get_cycle(artifact.groupId, artifact.artifactId, artifact.version)
+				if cycle is not None:
+					print >> sys.stderr, "[error] BOM %s imports itself: %s" % (artifact, ' -> '.join(':'.join(key) for key in cycle + [cycle[0]]))
+				else:
+					print >> sys.stderr, "[error] BOM %s not found" % artifact
+				return
+			module.dependencies.add_import(bom, managed)
+	
+	class ManagedDependencies(object):
+		"""Read-only dependencyManagement of a module, inherited ones included
+		
+		Lookups walk the chain of ancestors instead of copying it: the managed dependencies of the
+		module and of its ancestors, nearest first, then the BOMs they import, farthest first. The
+		flattened maps used for iteration are built for this module only, and rebuilt only when
+		one of its ancestors changes.
+		"""
+		def __init__(self, dependencies, parent = None):
+			self.__dependencies = dependencies
+			self.__parent = parent
+			self.__flat = None
+			self.__flat_revision = None
+			self.__keyed = None
+			self.__keyed_revision = None
+		
+		@property
+		def parent(self):
+			return self.__parent
+		
+		@property
+		def revision(self):
+			revision = self.__dependencies.managed_revision
+			parent = self.__parent
+			while parent is not None:
+				revision = max(revision, parent.__dependencies.managed_revision)
+				parent = parent.__parent
+			return revision
+		
+		def flatten(self):
+			revision = self.revision
+			if self.__flat_revision != revision:
+				chain = self.__chain()
+				flat = {}
+				for node in chain:
+					flat.update(node.__dependencies.imported_managed)
+				for node in reversed(chain):
+					flat.update(node.__dependencies.managed)
+				self.__flat = flat
+				self.__flat_revision = revision
+			return self.__flat
+		
+		def get_keyed(self):
+			"""Managed dependencies by mediation key, with the precedence of the lookups"""
+			revision = self.revision
+			if self.__keyed_revision != revision:
+				chain = self.__chain()
+				keyed = {}
+				for node in chain:
+					for imported in reversed(node.__dependencies.imported):
+						keyed.update(imported.get_managed_by_key())
+				for node in reversed(chain):
+					keyed.update(node.__dependencies.get_managed_by_key())
+				self.__keyed = keyed
+				self.__keyed_revision = revision
+			return self.__keyed
+		
+		def __chain(self):
+			chain = []
+			node = self
+			while node is not None:
+				chain.append(node)
+				node = node.__parent
+			return chain
+		
+		def __contains__(self, artifact):
+			chain = self.__chain()
+			return (any(artifact in node.__dependencies.managed for node in chain)
+			        or any(artifact in node.__dependencies.imported_managed for node in chain))
+		
+		def __getitem__(self, artifact):
+			chain = self.__chain()
+			for node in chain:
+				managed = node.__dependencies.managed
+				if artifact in managed:
+					return managed[artifact]
+			for node in reversed(chain):
+				imported = node.__dependencies.imported_managed
+				if artifact in imported:
+					return imported[artifact]
+			raise KeyError(artifact)
+		
+		def __len__(self):
+			return len(self.flatten())
+		
+		def __iter__(self):
+			return iter(self.flatten())
+		
+		def get(self, artifact, default = None):
+			try:
+				return self[artifact]
+			except KeyError:
+				return default
+		
+		def find(self, groupId = None, artifactId = None, version = None):
+			"""Last declared managed dependency matching the given coordinates, ancestors declaring first"""
+			dependency = self.__dependencies.find_managed(groupId, artifactId, version)
+			if dependency is None and self.__parent is not None:
+				dependency = self.__parent.find(groupId, artifactId, version)
+			for imported in self.__dependencies.imported:
+				if dependency is not None:
+					break
+				dependency = imported.find_managed(groupId, artifactId, version)
+			return dependency
+		
+		def keys(self):
+			return self.flatten().keys()
+		
+		def values(self):
+			return self.flatten().values()
+		
+		def items(self):
+			return self.flatten().items()
+	
+	class Dependency(object):
+		def __init__(self, artifact, deptype, scope, system_path, optional, exclusions = ()):
+			self.__artifact = artifact
+			self.__deptype = deptype
+			self.__scope = scope
+			self.__system_path = system_path
+			self.__optional = optional
+			self.__exclusions = frozenset(exclusions)
+		
+		@property
+		def artifact(self):
+			return self.__artifact
+		
+		@property
+		def deptype(self):
+			return self.__deptype
+		
+		@property
+		def scope(self):
+			return self.__scope
+		
+		@property
+		def system_path(self):
+			return self.__system_path
+		
+		@property
+		def optional(self):
+			return self.__optional
+		
+		@property
+		def exclusions(self):
+			"""frozenset of (groupId, artifactId), either may be '*'"""
+			return self.__exclusions
+		
+		def is_excluded(self, artifact):
+			for group_id, artifact_id in self.__exclusions:
+				if (group_id == '*' or group_id == artifact.groupId) and (artifact_id == '*' or artifact_id == artifact.artifactId):
+					return True
+			return False
+		
+		@staticmethod
+		def _get_exclusions(xnode, managed_dependencies, artifact):
+			exclusions = set()
+			for xexclusion in Pom.Xml.get_nodes(xnode, 'exclusion', 'exclusions'):
+				group_id = Pom.Xml.get_group_id(xexclusion)
+				artifact_id = Pom.Xml.get_artifact_id(xexclusion)
+				if len(artifact_id) > 0:
+					exclusions.add((group_id or '*', artifact_id))
+			if len(exclusions) == 0 and artifact in managed_dependencies:
+				return managed_dependencies[artifact].exclusions
+			return exclusions
+		
+		@staticmethod
+		def _get_property(xnode, key, managed_dependencies, artifact, default_value = ''):
+			value = Pom.Xml.get_child_node_value(xnode, key, None)
+			if value is not None:
+				return value
+			attr_conv = {'type': 'deptype', 'systemPath': 'system_path'}
+			if artifact in managed_dependencies:
+				dependency = managed_dependencies[artifact]
+				value = getattr(dependency, attr_conv.get(key, key), None)
+			if value is None:
+				value = default_value
+			if value is not None:
+				value = str(value)
+			return value
+		
+		@staticmethod
+		def parse(xnode, module = None):
+			artifact = Pom.Artifact.parse(xnode, Pom.ArtifactOrigin.DEPENDENCY, module)
+			managed_dependencies = module.all_managed_dependencies if module else Pom.ManagedDependencies(Pom.Dependencies())
+			deptype = Pom.Dependency._get_property(xnode, 'type', managed_dependencies, artifact, '')
+			scope = Pom.Dependency._get_property(xnode, 'scope', managed_dependencies, artifact, 'compile')
+			if scope not in ['compile', 'provided', 'runtime', 'test', 'system', 'import']:
+				raise Exception('invalid scope (%s) for dependency %s' % (scope, artifact)) 
+			if scope == 'system':
+				system_path = Pom.Dependency._get_property(xnode, 'systemPath', managed_dependencies, artifact, '')
+			else:
+				system_path = ''
+			optional = Pom.Dependency._get_property(xnode, 'optional', managed_dependencies, artifact, 'false')
+			optional = optional.lower() == 'true'
+			exclusions = Pom.Dependency._get_exclusions(xnode, managed_dependencies, artifact)
+			dependency = Pom.Dependency(artifact, deptype, scope, system_path, optional, exclusions)
+			return dependency
+		
+		def dump(self):
+			artifact = self.artifact
+			return (artifact.groupId, artifact.artifactId, artifact.classifier, artifact.version,
+			        self.deptype, self.scope, self.system_path, self.optional, tuple(sorted(self.exclusions)))
+		
+		@staticmethod
+		def load(data):
+			groupId, artifactId, classifier, version, deptype, scope, system_path, optional, exclusions = data
+			artifact = Pom.Artifact(Pom.ArtifactOrigin.DEPENDENCY, None, groupId, artifactId, '', classifier, version)
+			return Pom.Dependency(artifact, deptype, scope, system_path, optional, exclusions)
+		
+		def get_key(self):
+			"""Mediation key: versionless coordinates"""
+			artifact = self.artifact
+			return (artifact.groupId, artifact.artifactId, self.deptype or 'jar', artifact.classifier)
+		
+		def get_id(self):
+			artifact = self.artifact
+			parts = [artifact.groupId, artifact.artifactId, self.deptype or 'jar']
+			if len(artifact.classifier) > 0:
+				parts.append(artifact.classifier)
+			return ':'.join(parts + [artifact.version, self.scope])
+		
+		def __repr__(self):
+			rest = [self.deptype, 'optional' if self.optional else '']
+			rest = ', '.join([i for i in rest if len(i) > 0])
+			if len(rest) > 0: rest = ', ' + rest
+			return "Pom.Dependency(%s, %s%s)" % (self.scope, self.artifact, rest)
+	
+	class DependencyNode(object):
+		def __init__(self, dependency, parent = None):
+			self.__dependency = dependency
+			self.__parent = parent
+			self.__children = []
+			self.__depth = parent.depth + 1 if parent is not None else 0
+		
+		@property
+		def dependency(self):
+			return self.__dependency
+		
+		@property
+		def parent(self):
+			return self.__parent
+		
+		@property
+		def children(self):
+			return self.__children
+		
+		@property
+		def depth(self):
+			return self.__depth
+		
+		def iternodes(self):
+			stack = list(reversed(self.__children))
+			while stack:
+				node = stack.pop()
+				yield node
+				stack.extend(reversed(node.children))
+		
+		def __repr__(self):
+			return "Pom.DependencyNode(%s)" % (self.__dependency.get_id() if self.__dependency else '')
+	
+	class DependencyResolver(object):
+		"""
+		Resolves the transitive dependencies of a module from the local repository: nearest wins (first
+		declaration on a tie), scopes are narrowed along the path, optional and excluded dependencies are not
+		followed and the dependencyManagement of the module applies to every transitive dependency.
+		"""
+		TRANSITIVE_SCOPES = {
+			'compile':  {'compile': 'compile',  'runtime': 'runtime'},
+			'provided': {'compile': 'provided', 'runtime': 'provided'},
+			'runtime':  {'compile': 'runtime',  'runtime': 'runtime'},
+			'test':     {'compile': 'test',     'runtime': 'test'},
+			'system':   {},
+		}
+		
+		def __init__(self, module, repository_path, index = None):
+			self.__module = module
+			self.__repository_path = os.path.abspath(os.path.expanduser(repository_path))
+			self.__managed = module.all_managed_dependencies.get_keyed()
+			self.__descriptors = Pom.Descriptors(self.__repository_path)
+			self.__children = {}
+			self.__index = index
+			self.__scanned = set()
+		
+		@property
+		def module(self):
+			return self.__module
+		
+		@property
+		def repository_path(self):
+			return self.__repository_path
+		
+		@property
+		def index(self):
+			"""Pom.RepositoryIndex version ranges are resolved with, an in-memory one unless given"""
+			if self.__index is None:
+				self.__index = Pom.RepositoryIndex(self.__repository_path, ':memory:')
+			return self.__index
+		
+		def resolve(self):
+			root = Pom.DependencyNode(None)
+			resolved = set()
+			queue = collections.deque()
+			for dependency in self.__module.dependencies.declared:
+				queue.append((root, self._get_ranged(dependency)))
+			while queue:
+				parent, dependency = queue.popleft()
+				key = dependency.get_key()
+				if key in resolved:
+					continue
+				resolved.add(key)
+				node = Pom.DependencyNode(dependency, parent)
+				parent.children.append(node)
+				for child in self._get_children(dependency):
+					queue.append((node, child))
+			return root
+		
+		def _get_children(self, dependency):
+			key = (dependency.get_id(), dependency.exclusions)
+			children = self.__children.get(key)
+			if children is not None:
+				return children
+			children = []
+			scopes = self.TRANSITIVE_SCOPES.get(dependency.scope, {})
+			artifact = dependency.artifact
+			declared = self.__descriptors.get_dependencies(artifact.groupId, artifact.artifactId, artifact.version)
+			if declared is not None and len(scopes) > 0:
+				for child in declared:
+					if child.optional or child.scope not in scopes or dependency.is_excluded(child.artifact):
+						continue
+					child = self._get_managed(child, scopes[child.scope], dependency.exclusions)
+					children.append(child)
+			self.__children[key] = children
+			return children
+		
+		def _get_managed(self, dependency, scope, exclusions):
+			managed = self.__managed.get(dependency.get_key())
+			artifact = dependency.artifact
+			version = artifact.version
+			if managed is not None:
+				version = managed.artifact.version
+				if managed.scope != 'compile' and scope in ('compile', 'runtime'):
+					scope = managed.scope
+			artifact = self._get_artifact(artifact, version)
+			return Pom.Dependency(artifact, dependency.deptype, scope, dependency.system_path, False, exclusions | dependency.exclusions)
+		
+		def _get_ranged(self, dependency):
+			artifact = self._get_artifact(dependency.artifact, dependency.artifact.version)
+			if artifact is dependency.artifact:
+				return dependency
+			return Pom.Dependency(artifact, dependency.deptype, dependency.scope, dependency.system_path, dependency.optional, dependency.exclusions)
+		
+		def _get_artifact(self, artifact, version):
+			version = self._get_version(artifact.groupId, artifact.artifactId, version)
+			if version != artifact.version:
+				artifact = Pom.Artifact(artifact.origin, None, artifact.groupId, artifact.artifactId, artifact.packaging, artifact.classifier, version)
+			return artifact
+		
+		def _get_version(self, group_id, artifact_id, version):
+			if not version.startswith('[') and not version.startswith('('):
+				return version
+			path = '/'.join(group_id.split('.') + [artifact_id])
+			if path not in self.__scanned:
+				# only the artifact directory is (re)scanned, once per resolver
+				self.index.scan(path)
+				self.__scanned.add(path)
+			try:
+				return self.index.resolve(group_id, artifact_id, version) or version
+			except Pom.VersionException:
+				return version
+		
+		def get_pom_file(self, group_id, artifact_id, version):
+			return self.__descriptors.get_pom_file(group_id, artifact_id, version)
+		
+		def get_descriptor(self, group_id, artifact_id, version):
+			"""Returns the repository pom as a Pom.Module with its repository parents, None if it is missing"""
+			return self.__descriptors.get_descriptor(group_id, artifact_id, version)
+	
+	class Descriptors(object):
+		"""Repository poms loaded as Pom.Module, with their repository parents, by coordinates"""
+		def __init__(self, repository_path):
+			self.__repository_path = os.path.abspath(os.path.expanduser(repository_path))
+			self.__descriptors = {}
+			self.__dependencies = {}
+			self.__files = {}
+		
+		@property
+		def repository_path(self):
+			return self.__repository_path
+		
+		def get_pom_file(self, group_id, artifact_id, version):
+			return Pom.Descriptors.get_repository_pom_file(self.__repository_path, group_id, artifact_id, version)
+		
+		@staticmethod
+		def get_repository_pom_file(repository_path, group_id, artifact_id, version):
+			return os.path.join(repository_path, group_id.replace('.', os.sep), artifact_id, version, 
+			                    '{0}-{1}.pom'.format(artifact_id, version))
+		
+		def get_descriptor(self, group_id, artifact_id, version):
+			"""Returns the repository pom as a Pom.Module with its repository parents, None if it is missing"""
+			key = (group_id, artifact_id, version)
+			if key in self.__descriptors:
+				return self.__descriptors[key]
+			self.__descriptors[key] = None
+			pom_file = self.get_pom_file(group_id, artifact_id, version)
+			if not os.path.isfile(pom_file):
+				return None
+			xroot = pom.parse_cache.load(pom_file)
+			if xroot is None:
+				return None
+			parent = None
+			files = [Pom.Descriptors.get_stamp(pom_file)]
+			xparent = Pom.Xml.get_node(xroot, 'parent')
+			if xparent is not None:
+				parent_key = (Pom.Xml.get_group_id(xparent), Pom.Xml.get_artifact_id(xparent), Pom.Xml.get_version(xparent))
+				parent = self.get_descriptor(*parent_key)
+				files.extend(self.__files.get(parent_key, []))
+			# handed over to Module.create only: repository poms are not kept preloaded
+			pom.parse_cache.preload(pom_file, xroot)
+			try:
+				module = Pom.Module.create(pom_file, parent)
+			except Exception as e:
+				print >> sys.stderr, "[error] %s: %s" % (pom_file, e.message)
+				module = None
+			finally:
+				pom.parse_cache.discard([pom_file])
+			if module is not None:
+				for imported in module.dependencies.imports:
+					files.extend(pom.bom_store.get_files(imported.artifact.groupId, imported.artifact.artifactId, imported.artifact.version))
+			self.__descriptors[key] = module
+			self.__files[key] = files
+			return module
+		
+		def get_dependencies(self, group_id, artifact_id, version):
+			"""Declared dependencies of the repository pom, None if it is missing
+			
+			With the parse cache enabled they are stored on disk too, valid as long as none of the poms
+			they come from changes, so a warm resolution does not build the modules again.
+			"""
+			key = (group_id, artifact_id, version)
+			if key in self.__dependencies:
+				return self.__dependencies[key]
+			name = 'descriptor:' + ':'.join(key)
+			dependencies = self._load_entry(name)
+			if dependencies is None:
+				module = self.get_descriptor(group_id, artifact_id, version)
+				if module is not None:
+					dependencies = list(module.dependencies.declared)
+					pom.parse_cache.store_entry(name, {'dependencies': [d.dump() for d in dependencies], 'files': self.get_files(group_id, artifact_id, version)})
+			self.__dependencies[key] = dependencies
+			return dependencies
+		
+		def get_files(self, group_id, artifact_id, version):
+			"""Stamps of the poms a loaded descriptor is read from: its own, its parents' and the imported BOMs'"""
+			return self.__files.get((group_id, artifact_id, version), [])
+		
+		@staticmethod
+		def get_stamp(file_path):
+			try:
+				st = os.stat(file_path)
+			except OSError:
+				return None
+			return (file_path, st.st_mtime, st.st_size)
+		
+		@staticmethod
+		def is_current(files):
+			for stamp in files:
+				if stamp is None or Pom.Descriptors.get_stamp(stamp[0]) != stamp:
+					return False
+			return True
+		
+		def _load_entry(self, name):
+			entry = pom.parse_cache.load_entry(name)
+			if entry is None or not Pom.Descriptors.is_current(entry['files']):
+				return None
+			return [Pom.Dependency.load(d) for d in entry['dependencies']]
+	
+	class BomStore(object):
+		"""Flattened dependencyManagement of the BOMs imported with scope import, by coordinates
+		
+		A BOM is read from the local repository with its parents and flattened once per process. With
+		the parse cache enabled the flattened entries are stored on disk too, valid as long as none of
+		the poms they come from changes. A BOM is kept until one of its pom files is discarded.
+		"""
+		def __init__(self, repository_path = None):
+			self.__repository_path = repository_path
+			self.__descriptors = None
+			self.__boms = {}
+			self.__files = {}
+			self.__importing = []
 		
 		@property
-		def managed(self):
-			if self.__managed is None:
-				self.__managed = {k: v for k, v in self.items() if k in self.__is_managed}
-			return self.__managed
+		def repository_path(self):
+			if self.__repository_path is None:
+				self.__repository_path = pom.user_settings.local_repository
+			return self.__repository_path
 		
-		def add(self, dependency):
-			if dependency is None or not isinstance(dependency, Pom.Dependency):
-				return
-			self[dependency.artifact] = dependency
+		def set_repository_path(self, repository_path):
+			self.__repository_path = repository_path
+			self.__descriptors = None
+			self.__boms.clear()
+			self.__files.clear()
 		
-		def add_managed(self, dependency):
-			self.add(dependency)
-			self.__is_managed.add(dependency.artifact)
-			self.__managed = None
+		@property
+		def file_paths(self):
+			"""Pom files of the loaded BOMs, the expected ones of the missing BOMs included"""
+			return set(itertools.chain.from_iterable(self.__files.values()))
+		
+		def discard(self, file_paths):
+			"""Forgets the BOMs read from any of the pom files, returns their coordinates"""
+			file_paths = set(file_paths)
+			keys = set(key for key, paths in self.__files.items() if not file_paths.isdisjoint(paths))
+			for key in keys:
+				del self.__files[key]
+				self.__boms.pop(key, None)
+			if len(keys) > 0:
+				# the repository modules they were flattened from are stale too
+				self.__descriptors = None
+			return keys
+		
+		def get(self, group_id, artifact_id, version):
+			"""Managed dependencies of the BOM as Pom.Dependencies, None if it cannot be read"""
+			bom = self._get(group_id, artifact_id, version)
+			return bom[0] if bom is not None else None
+		
+		def get_cycle(self, group_id, artifact_id, version):
+			"""Coordinates of the BOMs being flattened since this one, None unless it is being flattened"""
+			key = (group_id, artifact_id, version)
+			if key not in self.__importing:
+				return None
+			return self.__importing[self.__importing.index(key):]
+		
+		def get_files(self, group_id, artifact_id, version):
+			"""Stamps of the poms the BOM is flattened from"""
+			bom = self._get(group_id, artifact_id, version)
+			return bom[1] if bom is not None else []
+		
+		def _get(self, group_id, artifact_id, version):
+			key = (group_id, artifact_id, version)
+			if key in self.__boms:
+				return self.__boms[key]
+			# a BOM importing itself, even indirectly, gets nothing (see get_cycle)
+			self.__boms[key] = None
+			self.__importing.append(key)
+			try:
+				name = 'bom:' + ':'.join(key)
+				bom = self._load_entry(name)
+				if bom is None:
+					bom = self._flatten(group_id, artifact_id, version)
+					if bom is not None:
+						pom.parse_cache.store_entry(name, {'dependencies': [d.dump() for d in Pom.BomStore._get_sorted(bom[0].managed.values())], 'files': bom[1]})
+			finally:
+				self.__importing.pop()
+			if bom is not None:
+				self.__files[key] = [stamp[0] for stamp in bom[1] if stamp is not None]
+			else:
+				self.__files[key] = [Pom.Descriptors.get_repository_pom_file(self.repository_path, group_id, artifact_id, version)]
+			self.__boms[key] = bom
+			return bom
+		
+		def _load_entry(self, name):
+			entry = pom.parse_cache.load_entry(name)
+			if entry is None or not Pom.Descriptors.is_current(entry['files']):
+				return None
+			return (Pom.BomStore._create(Pom.Dependency.load(d) for d in entry['dependencies']), entry['files'])
 		
 		@staticmethod
-		def populate(module, xroot):
-			for xdependency in Pom.Xml.get_dependencies(xroot, True):
-				try:
-					dependency = Pom.Dependency.parse(xdependency, module)
-				except Exception as e:
-					print "[error] " + e.message
-					continue
-				module.dependencies.add_managed(dependency)
-			for xdependency in Pom.Xml.get_dependencies(xroot, False):
-				try:
-					dependency = Pom.Dependency.parse(xdependency, module)
-				except Exception as e:
-					print "[error] " + e.message
-					continue
-				module.dependencies.add(dependency)
+		def _get_sorted(managed):
+			return sorted(managed, key=lambda dependency: dependency.get_key())
+		
+		@staticmethod
+		def _create(managed):
+			dependencies = Pom.Dependencies()
+			for dependency in managed:
+				dependencies.add_managed(dependency)
+			return dependencies
+		
+		def _flatten(self, group_id, artifact_id, version):
+			if self.__descriptors is None:
+				self.__descriptors = Pom.Descriptors(self.repository_path)
+			module = self.__descriptors.get_descriptor(group_id, artifact_id, version)
+			if module is None:
+				return None
+			# the pom files the descriptor was actually read from, a version inherited from the parent included
+			files = self.__descriptors.get_files(group_id, artifact_id, version)
+			return (Pom.BomStore._create(Pom.BomStore._get_sorted(module.all_managed_dependencies.get_keyed().values())), files)
 	
-	class Dependency(object):
-		def __init__(self, artifact, deptype, scope, system_path, optional):
+	class EffectiveModel(object):
+		"""Merged model of a module: properties, dependencyManagement, dependencies and repositories
+		
+		Each part is a Pom.PersistentMap derived from the model of the parent module, so sibling
+		modules share what they inherit instead of copying it. Profiles are not applied.
+		"""
+		__slots__ = ('__artifact', '__properties', '__managed', '__dependencies', '__repositories')
+		
+		def __init__(self, artifact, properties, managed, dependencies, repositories):
 			self.__artifact = artifact
-			self.__deptype = deptype
-			self.__scope = scope
-			self.__system_path = system_path
-			self.__optional = optional
+			self.__properties = properties
+			self.__managed = managed
+			self.__dependencies = dependencies
+			self.__repositories = repositories
 		
 		@property
 		def artifact(self):
 			return self.__artifact
 		
 		@property
-		def deptype(self):
-			return self.__deptype
+		def properties(self):
+			return self.__properties
 		
 		@property
-		def scope(self):
-			return self.__scope
+		def managed(self):
+			"""Managed dependencies by mediation key"""
+			return self.__managed
 		
 		@property
-		def system_path(self):
-			return self.__system_path
+		def dependencies(self):
+			"""Dependencies by mediation key"""
+			return self.__dependencies
 		
 		@property
-		def optional(self):
-			return self.__optional
+		def repositories(self):
+			return self.__repositories
 		
 		@staticmethod
-		def _get_property(xnode, key, managed_dependencies, artifact, default_value = ''):
-			value = Pom.Xml.get_child_node_value(xnode, key, None)
-			if value is not None:
-				return value
-			attr_conv = {'type': 'deptype', 'systemPath': 'system_path'}
-			if artifact in managed_dependencies:
-				dependency = managed_dependencies[artifact]
-				value = getattr(dependency, attr_conv.get(key, key), None)
-			if value is None:
-				value = default_value
-			if value is not None:
-				value = str(value)
-			return value
+		def create(module, base = None):
+			if base is not None:
+				properties, managed, dependencies, repositories = base.properties, base.managed, base.dependencies, base.repositories
+			else:
+				properties = managed = dependencies = repositories = Pom.PersistentMap()
+			own = module.dependencies.get_managed_by_key()
+			imported = {}
+			for bom in reversed(module.dependencies.imported):
+				imported.update(bom.get_managed_by_key())
+			# declared entries win over inherited ones, inherited ones over imported ones
+			changes = [(k, v) for k, v in imported.iteritems() if k not in managed and k not in own]
+			changes += own.items()
+			return Pom.EffectiveModel(module.artifact,
+				properties.assoc(sorted(module.properties.get_list().items())),
+				managed.assoc(sorted(changes)),
+				dependencies.assoc((d.get_key(), d) for d in module.dependencies.declared),
+				repositories.assoc((r.id, r) for r in module.repositories))
 		
 		@staticmethod
-		def parse(xnode, module = None):
-			artifact = Pom.Artifact.parse(xnode, Pom.ArtifactOrigin.DEPENDENCY, module)
-			managed_dependencies = module.all_managed_dependencies if module else Pom.Dependencies()
-			deptype = Pom.Dependency._get_property(xnode, 'type', managed_dependencies, artifact, '')
-			scope = Pom.Dependency._get_property(xnode, 'scope', managed_dependencies, artifact, 'compile')
-			if scope not in ['compile', 'provided', 'runtime', 'test', 'system']:
-				raise Exception('invalid scope (%s) for dependency %s' % (scope, artifact)) 
-			if scope == 'system':
-				system_path = Pom.Dependency._get_property(xnode, 'systemPath', managed_dependencies, artifact, '')
-			else:
-				system_path = ''
-			optional = Pom.Dependency._get_property(xnode, 'optional', managed_dependencies, artifact, 'false')
-			optional = optional.lower() == 'true'
-			dependency = Pom.Dependency(artifact, deptype, scope, system_path, optional)
-			return dependency
+		def _get_dependency_record(dependency):
+			group_id, artifact_id, deptype, classifier = dependency.get_key()
+			return {
+				'groupId': group_id,
+				'artifactId': artifact_id,
+				'type': deptype,
+				'classifier': classifier,
+				'version': dependency.artifact.version,
+				'scope': dependency.scope,
+				'optional': dependency.optional,
+			}
+		
+		def get_record(self):
+			artifact = self.__artifact
+			get_dependency_record = Pom.EffectiveModel._get_dependency_record
+			return {
+				'groupId': artifact.groupId,
+				'artifactId': artifact.artifactId,
+				'version': artifact.version,
+				'packaging': artifact.packaging,
+				'properties': dict(self.__properties.items()),
+				'dependencyManagement': [get_dependency_record(d) for d in self.__managed.values()],
+				'dependencies': [get_dependency_record(d) for d in self.__dependencies.values()],
+				'repositories': [{'id': r.id, 'url': r.url, 'layout': r.layout} for r in self.__repositories.values()],
+			}
 		
-		def __repr__(self):
-			rest = [self.deptype, 'optional' if self.optional else '']
-			rest = ', '.join([i for i in rest if len(i) > 0])
-			if len(rest) > 0: rest = ', ' + rest
-			return "Pom.Dependency(%s, %s%s)" % (self.scope, self.artifact, rest)
+		@staticmethod
+		def _add_dependency(xparent, dependency):
+			xdependency = etree.SubElement(xparent, 'dependency')
+			group_id, artifact_id, deptype, classifier = dependency.get_key()
+			for tag, value in (('groupId', group_id), ('artifactId', artifact_id), ('version', dependency.artifact.version),
+			                   ('type', deptype), ('classifier', classifier), ('scope', dependency.scope)):
+				if len(value) > 0:
+					etree.SubElement(xdependency, tag).text = value
+			if dependency.optional:
+				etree.SubElement(xdependency, 'optional').text = 'true'
+		
+		def to_xml(self):
+			artifact = self.__artifact
+			xproject = etree.Element('project')
+			for tag, value in (('groupId', artifact.groupId), ('artifactId', artifact.artifactId),
+			                   ('version', artifact.version), ('packaging', artifact.packaging)):
+				etree.SubElement(xproject, tag).text = value
+			if len(self.__properties) > 0:
+				xproperties = etree.SubElement(xproject, 'properties')
+				for key, value in self.__properties.items():
+					etree.SubElement(xproperties, key).text = value
+			if len(self.__managed) > 0:
+				xdependencies = etree.SubElement(etree.SubElement(xproject, 'dependencyManagement'), 'dependencies')
+				for dependency in self.__managed.values():
+					Pom.EffectiveModel._add_dependency(xdependencies, dependency)
+			if len(self.__dependencies) > 0:
+				xdependencies = etree.SubElement(xproject, 'dependencies')
+				for dependency in self.__dependencies.values():
+					Pom.EffectiveModel._add_dependency(xdependencies, dependency)
+			if len(self.__repositories) > 0:
+				xrepositories = etree.SubElement(xproject, 'repositories')
+				for repository in self.__repositories.values():
+					xrepository = etree.SubElement(xrepositories, 'repository')
+					etree.SubElement(xrepository, 'id').text = repository.id
+					etree.SubElement(xrepository, 'url').text = repository.url
+					etree.SubElement(xrepository, 'layout').text = repository.layout
+			return xproject
+	
+	class BuildWeights(object):
+		"""Weights of a build node subtree, evaluated over artifact bitsets
+		
+		The subtree is walked once: every module artifact and every profile gets a bit, and the bits
+		are grouped into segments guarded by the profile that brings them in. A build path is then
+		weighed by or-ing the segments of its active profiles, so modules reachable several ways
+		are counted once.
+		"""
+		def __init__(self, node):
+			self.__bits = {}
+			self.__masks = {}
+			self.__root = (None, [0], [])
+			self._add_node(self.__root, node, None)
+		
+		def _get_bit(self, key, weight):
+			index = self.__bits.get(key)
+			if index is None:
+				index = self.__bits[key] = len(self.__bits)
+				self.__masks[weight] = self.__masks.get(weight, 0) | (1 << index)
+			return 1 << index
+		
+		def _add_node(self, segment, node, owner):
+			artifact = getattr(node, 'artifact', None)
+			if artifact is not None:
+				owner = artifact
+				segment[1][0] |= self._get_bit(artifact, node.pure_weight)
+			else:
+				segment[1][0] |= self._get_bit((owner, node.name), node.pure_weight)
+			for m in node.modules.values():
+				if m is None: continue
+				self._add_node(segment, m, owner)
+			for p in getattr(node, 'profiles', {}).values():
+				if p is None: continue
+				child = (p, [0], [])
+				segment[2].append(child)
+				self._add_node(child, p, owner)
+		
+		def _get_active_bits(self, segment, bp):
+			bits = segment[1][0]
+			for child in segment[2]:
+				if bp is None or bp.is_profile_active(child[0]):
+					bits |= self._get_active_bits(child, bp)
+			return bits
+		
+		def get_weight(self, bp = None):
+			bits = self._get_active_bits(self.__root, bp)
+			weight = 0
+			for w in sorted(self.__masks):
+				weight += w * bin(bits & self.__masks[w]).count('1')
+			return weight
 	
 	class BuildNode(object):
 		def __init__(self):
 			self.__weight_cache = {}
+			self.__weights = None
 			self.__parent = None
 			self.__properties = Pom.Properties()
 			self.__repositories = Pom.ArtifactRepositories()
@@ -2158,38 +4137,16 @@ class Pom(object):
 		def _set_modules(self, modules):
 			self.__modules = modules
 		
+		def _reset_weights(self):
+			self.__weight_cache = {}
+			self.__weights = None
+		
 		def get_weight(self, bp = None, artifacts = None, level = 0):
 			if bp not in self.__weight_cache:
-				self.__weight_cache[bp] = self._get_weight(bp)
+				if self.__weights is None:
+					self.__weights = Pom.BuildWeights(self)
+				self.__weight_cache[bp] = self.__weights.get_weight(bp)
 			return self.__weight_cache[bp]
-		
-		def _get_weight(self, bp = None, artifacts = None, level = 0):
-			if artifacts is None:
-				artifacts = set()
-			subweight = 0
-			try:
-				for m in self.modules.values():
-					if m is None: continue
-					subweight += m._get_weight(bp, artifacts, level + 1)
-			except (AttributeError, TypeError):
-				pass
-			try:
-				for p in self.profiles.values():
-					if p is None: continue
-					if bp is None or bp.is_profile_active(p):
-						subweight += p._get_weight(bp, artifacts, level + 1)
-			except (AttributeError, TypeError):
-				pass
-			weight = self.pure_weight + subweight
-			try:
-				a = self.artifact
-				if a in artifacts:
-					weight = 0
-				else:
-					artifacts.add(a)
-			except (AttributeError, TypeError):
-				pass
-			return weight
 	
 	class Modules(dict):
 		def __init__(self, *args, **kwargs):
@@ -2205,14 +4162,18 @@ class Pom(object):
 				if module_name in modules: 
 					continue
 				#modules[module_name] = None
-				if os.path.isdir(os.path.join(pom_io.dir_path, module_name)):
-					pom_file = os.path.join(pom_io.dir_path, module_name, 'pom.xml')
-				else:
-					pom_file = os.path.join(pom_io.dir_path, module_name)
+				pom_file = Pom.Modules.get_pom_file(pom_io, module_name)
 				pom_module = Pom.Module.create(pom_file, parent)
 				if pom_module is not None:
 					modules[module_name] = pom_module
 			return modules
+		
+		@staticmethod
+		def get_pom_file(pom_io, module_name):
+			if os.path.isdir(os.path.join(pom_io.dir_path, module_name)):
+				return os.path.join(pom_io.dir_path, module_name, 'pom.xml')
+			else:
+				return os.path.join(pom_io.dir_path, module_name)
 	
 	class Module(BuildNode):
 		TYPE, WEIGHT = 'module', 1.0000
@@ -2222,6 +4183,9 @@ class Pom(object):
 			self.__artifact = artifact
 			self.__dependencies = Pom.Dependencies()
 			self.__profiles = Pom.Profiles()
+			self.__all_managed_dependencies = None
+			self.__effective_model = None
+			self.__effective_base = None
 		
 		@property
 		def depth(self):
@@ -2243,18 +4207,24 @@ class Pom(object):
 		def profiles(self):
 			return self.__profiles
 		
+		@property
+		def effective_model(self):
+			parent = self.get_parent(self.TYPE)
+			base = parent.effective_model if parent is not None else None
+			if self.__effective_model is None or self.__effective_base is not base:
+				self.__effective_model = Pom.EffectiveModel.create(self, base)
+				self.__effective_base = base
+			return self.__effective_model
+		
 		@property
 		def all_managed_dependencies(self):
-			dependencies = Pom.Dependencies()
-			stack = []
 			parent = self.get_parent(self.TYPE)
-			while parent is not None:
-				stack.append(parent.dependencies.managed)
-				parent = parent.get_parent(self.TYPE)
-			while stack:
-				dependencies.update(stack.pop())
-			dependencies.update(self.dependencies.managed)
-			return dependencies
+			inherited = parent.all_managed_dependencies if parent is not None else None
+			managed = self.__all_managed_dependencies
+			if managed is None or managed.parent is not inherited:
+				managed = Pom.ManagedDependencies(self.__dependencies, inherited)
+				self.__all_managed_dependencies = managed
+			return managed
 		
 		def show_graph(self, bgc = None, matched = False):
 			if bgc is None:
@@ -2268,9 +4238,8 @@ class Pom(object):
 			Pom.BuildGraph.show(conf)
 		
 		@staticmethod
-		def _parse_parent(xroot, pom_io, artifact):
+		def get_parent_path(xroot, pom_io):
 			parent_path = None
-			validate = False
 			parent_relpath = Pom.Xml.get_parent_relpath(xroot) 
 			if len(parent_relpath) > 0:
 				parent_path = os.path.abspath(os.path.join(pom_io.dir_path, parent_relpath))
@@ -2281,10 +4250,14 @@ class Pom(object):
 				if os.path.isfile(parent_filepath):
 					parent_path = parent_filepath
 			if parent_path is None:
-				validate = True
 				parent_filepath = os.path.abspath(os.path.join(pom_io.dir_path, '..', 'pom.xml'))
 				if os.path.isfile(parent_filepath):
 					parent_path = parent_filepath
+			return parent_path
+		
+		@staticmethod
+		def _parse_parent(xroot, pom_io, artifact):
+			parent_path = Pom.Module.get_parent_path(xroot, pom_io)
 			if parent_path is not None:
 				cached_module = pom.module_cache.get(parent_path, None)
 				if cached_module is not None:
@@ -2292,6 +4265,113 @@ class Pom(object):
 				return Pom.Module.create(Pom.IO(parent_path))
 			return None
 		
+		@staticmethod
+		def load(pom_file, jobs = 1):
+			if jobs > 1:
+				Pom.ReactorLoader(jobs).preload(pom_file)
+			try:
+				return Pom.Module.create(pom_file)
+			finally:
+				# preloaded trees are only valid for this load, later ones go through the checked cache
+				pom.parse_cache.clear_preloaded()
+		
+		@staticmethod
+		def reload(root, file_paths):
+			"""Reloads changed pom files of a loaded reactor in place
+			
+			Modules of the changed files and every module inheriting from them (properties,
+			repositories and managed dependencies) are recreated; untouched modules are kept and
+			relinked. Returns the root, which is new only if its own pom or one of its parents changed.
+			"""
+			changed = set(Pom.IO(file_path).file_path for file_path in file_paths)
+			pom.parse_cache.discard(changed)
+			boms = pom.bom_store.discard(changed)
+			root_path = pom.module_cache.get_file_path(root)
+			paths = {}
+			stale = []
+			for module_filepath, module in pom.module_cache.invalidate(changed):
+				paths[id(module)] = module_filepath
+				stale.append(module)
+			if len(boms) > 0:
+				for module_filepath, module in pom.module_cache.items():
+					if Pom.Module._imports(module, boms):
+						paths[id(module)] = module_filepath
+						pom.module_cache.remove(module)
+						stale.append(module)
+			if len(stale) == 0:
+				return root
+			stale_ids = set(paths)
+			# inheritance descendants, the parents of the root (not part of the tree) included
+			for module_filepath, module in pom.module_cache.items():
+				if Pom.Module._inherits_from(module, stale_ids):
+					paths[id(module)] = module_filepath
+					pom.module_cache.remove(module)
+					stale.append(module)
+			stale_ids = set(paths)
+			if id(root) in stale_ids or Pom.Module._inherits_from(root, stale_ids):
+				pom.module_cache.clear()
+				return Pom.Module.create(paths.get(id(root), root_path))
+			pending = list(stale)
+			while pending:
+				node = pending.pop()
+				children = node.modules.values()
+				for profile in getattr(node, 'profiles', {}).values():
+					children.extend(profile.modules.values())
+				for child in children:
+					if child is None or id(child) in stale_ids:
+						continue
+					paths[id(child)] = pom.module_cache.get_file_path(child)
+					pom.module_cache.remove(child)
+					stale_ids.add(id(child))
+					pending.append(child)
+			Pom.Module._relink(root, stale_ids, paths, {}, {})
+			return root
+		
+		@staticmethod
+		def _imports(node, boms):
+			for bom in node.dependencies.imports:
+				artifact = bom.artifact
+				if (artifact.groupId, artifact.artifactId, artifact.version) in boms:
+					return True
+			return False
+		
+		@staticmethod
+		def _inherits_from(node, stale_ids):
+			parent = node.parent
+			while parent is not None:
+				if id(parent) in stale_ids:
+					return True
+				parent = parent.parent
+			return False
+		
+		@staticmethod
+		def _relink(node, stale_ids, paths, replaced, seen):
+			# modules are shared between aggregators, so every node is relinked once
+			if id(node) in seen:
+				return seen[id(node)]
+			seen[id(node)] = False
+			changed = False
+			for module_name, child in node.modules.items():
+				if child is None:
+					continue
+				if id(child) in stale_ids:
+					if id(child) not in replaced:
+						replaced[id(child)] = Pom.Module.create(paths[id(child)], node)
+					if replaced[id(child)] is None:
+						del node.modules[module_name]
+					else:
+						node.modules[module_name] = replaced[id(child)]
+					changed = True
+				elif Pom.Module._relink(child, stale_ids, paths, replaced, seen):
+					changed = True
+			for profile in getattr(node, 'profiles', {}).values():
+				if Pom.Module._relink(profile, stale_ids, paths, replaced, seen):
+					changed = True
+			if changed:
+				node._reset_weights()
+			seen[id(node)] = changed
+			return changed
+		
 		@staticmethod
 		def create(pom_io, parent = None):
 			if not isinstance(pom_io, Pom.IO):
@@ -2302,9 +4382,7 @@ class Pom(object):
 			if cached_module is not None:
 				return cached_module
 			
-			parser = etree.XMLParser(recover=True)
-			xtree = etree.parse(pom_io.file_path, parser)
-			xroot = xtree.getroot()
+			xroot = pom.parse_cache.load(pom_io.file_path)
 			if xroot is None:
 				return None 
 			
@@ -2377,12 +4455,21 @@ class Pom(object):
 			self.__name = name
 			self.__activation = activation
 			self.__depth = 0
+			self.__fingerprint = None
 			self._set_properties(properties)
 		
 		@property
 		def depth(self):
 			return self.__depth
 		
+		@property
+		def fingerprint(self):
+			"""Hashable side effect of the profile on the modules it declares: properties it changes against its owner"""
+			if self.__fingerprint is None:
+				sideeffect = Pom.ProfileSideEffect.create(self, self.parent)
+				self.__fingerprint = frozenset(sideeffect.properties.items())
+			return self.__fingerprint
+		
 		@property
 		def name(self):
 			return self.__name
@@ -2667,7 +4754,7 @@ class Pom(object):
 			if jdk.startswith('[') or jdk.startswith(')'):
 				try:
 					jdk_range = Pom.VersionRange.create_from_version_spec(jdk)
-					jdk_av = Pom.ArtifactVersion(jdk_version.replace('_', '-'))
+					jdk_av = Pom.ArtifactVersion.of(jdk_version.replace('_', '-'))
 					return jdk_range.contains_version(jdk_av)
 				except VersionException as e:
 					raise VersionException('Invalid JDK version: ' + e.message)
@@ -2773,27 +4860,51 @@ class Pom(object):
 			return '{0}({1})'.format(self.__class__.__name__, props)
 	
 	class BuildPath(object):
-		def __init__(self, profiles = set(), properties = {}):
-			self.profiles = set()
-			self.properties = {}
-			for p in profiles:
-				self.profiles.add(p)
-			for k, v in properties.items():
+		__slots__ = ('__profiles', '__properties', '__key', '__hash')
+		CACHE_SIZE = 16384
+		_cache = None
+		
+		def __init__(self, profiles = None, properties = None):
+			self.__profiles = frozenset(profiles or ())
+			self.__properties = {}
+			for k, v in (properties or {}).items():
 				if v is not None and len(v.strip()) == 0:
 					v = None
-				self.properties[k] = v
+				self.__properties[k] = v
+			self.__key = (self.__profiles, frozenset(self.__properties.items()))
+			self.__hash = hash(self.__key)
+		
+		@property
+		def profiles(self):
+			return self.__profiles
+		
+		@property
+		def properties(self):
+			return dict(self.__properties)
+		
+		@staticmethod
+		def of(profiles = None, properties = None):
+			bp = Pom.BuildPath(profiles, properties)
+			cache = Pom.BuildPath._cache
+			if cache is None:
+				cache = Pom.BuildPath._cache = Pom.LruCache(Pom.BuildPath.CACHE_SIZE)
+			o = cache.get(bp.__key)
+			if o is None:
+				o = bp
+				cache.put(bp.__key, o)
+			return o
 		
 		def is_empty(self):
-			return len(self.profiles) == 0 and len(self.properties) == 0
+			return len(self.__profiles) == 0 and len(self.__properties) == 0
 		
 		def get_cmdline(self):
 			cmdline = ''
-			if len(self.profiles) > 0:
-				cmdline = '-P' + ','.join(sorted(self.profiles))
-			if len(self.properties) > 0:
-				for k in sorted(self.properties):
+			if len(self.__profiles) > 0:
+				cmdline = '-P' + ','.join(sorted(self.__profiles))
+			if len(self.__properties) > 0:
+				for k in sorted(self.__properties):
 					cmdline += ' -D'
-					v = self.properties[k]
+					v = self.__properties[k]
 					if v is None:
 						cmdline += k
 					else:
@@ -2801,64 +4912,91 @@ class Pom(object):
 			return cmdline.strip()
 		
 		def get_merged(self, other):
-			b = self.clone()
-			b.merge(other)
-			return b
+			"""Deprecated: BuildPath is immutable now, use merge, which returns the merged path too"""
+			return self.merge(other)
 		
 		def merge(self, other):
-			self.profiles = self.profiles.union(other.profiles)
-			for k, v in other.properties.items():
-				if k in self.properties:
+			properties = dict(self.__properties)
+			for k, v in other.__properties.items():
+				if k in properties:
 					if v is None or len(v) == 0:
 						continue
-					ov = self.properties[k]
+					ov = properties[k]
 					if ov is None or len(ov) == 0:
-						self.properties[k] = v
+						properties[k] = v
 					elif v == ov:
 						continue
 					else:
 						raise Exception('Cannot merge. Incompatible property %s values - %s, %s' % (k, v, ov))
 				else:
-					self.properties[k] = v
+					properties[k] = v
+			return Pom.BuildPath.of(self.__profiles.union(other.__profiles), properties)
+		
+		def with_profile(self, profile):
+			return Pom.BuildPath.of(self.__profiles.union([profile]), self.__properties)
+		
+		def with_property(self, name, value):
+			properties = dict(self.__properties)
+			properties[name] = value
+			return Pom.BuildPath.of(self.__profiles, properties)
+		
+		def conflicts_with(self, other):
+			for k, v in other.__properties.items():
+				ov = self.__properties.get(k)
+				if v and ov and v != ov:
+					return True
+			return False
+		
+		def is_implied_by(self, other):
+			"""True if every profile and property of this path is also set by other"""
+			if not self.__profiles.issubset(other.__profiles):
+				return False
+			for k, v in self.__properties.items():
+				if k not in other.__properties:
+					return False
+				if v and other.__properties[k] != v:
+					return False
+			return True
+		
+		def get_size(self):
+			return (len(self.__profiles) + len(self.__properties), sum(1 for v in self.__properties.values() if v))
 		
 		def is_profile_active(self, p):
 			if p is None:
 				return False
 			active = False
-			if p.name in self.profiles:
+			if p.name in self.__profiles:
 				active = True
 			elif p.activation is not None:
 				a = p.activation
 				if a.by_default:
 					active = True
-				elif a.match_properties(self.properties):
+				elif a.match_properties(self.__properties):
 					active = True
 			return active
 		
 		def clone(self):
-			clone = Pom.BuildPath()
-			for profile in self.profiles:
-				clone.profiles.add(profile)
-			for k, v in self.properties.items():
-				clone.properties[k] = v
-			return clone
+			return Pom.BuildPath.of(self.__profiles, self.__properties)
 		
 		def __repr__(self):
-			if len(self.profiles) > 0 and len(self.properties) > 0:
-				return "Pom.BuildPath(profiles=%r, properties=%r)" % (self.profiles, self.properties)
+			profiles = set(self.__profiles)
+			if len(profiles) > 0 and len(self.__properties) > 0:
+				return "Pom.BuildPath(profiles=%r, properties=%r)" % (profiles, self.__properties)
 			else:
-				if len(self.profiles) > 0:
-					return "Pom.BuildPath(profiles=%r)" % (self.profiles)
-				elif len(self.properties) > 0:
-					return "Pom.BuildPath(properties=%r)" % (self.properties)
+				if len(profiles) > 0:
+					return "Pom.BuildPath(profiles=%r)" % (profiles)
+				elif len(self.__properties) > 0:
+					return "Pom.BuildPath(properties=%r)" % (self.__properties)
 				else:
 					return "Pom.BuildPath()"
 		
 		def __hash__(self):
-			return hash(self.__repr__())
+			return self.__hash
 		
 		def __eq__(self, other):
-			return self.__repr__() == other.__repr__()
+			if self is other:
+				return True
+			return isinstance(other, Pom.BuildPath) and self.__key == other.__key
 		
 		def __ne__(self, other):
 			return not self.__eq__(other)
@@ -2871,11 +5009,14 @@ class Pom(object):
 		def __init__(self):
 			self.modules = {}
 			self.profiles = {}
+			self.__by_artifact_id = collections.defaultdict(list)
+			self.__by_key = collections.defaultdict(list)
+			self.__by_coordinates = collections.defaultdict(list)
 		
 		@staticmethod
 		def create(pom_module):
 			bpm = Pom.BuildPathMap()
-			bpm._process(Pom.BuildPath(), pom_module.modules, pom_module.profiles)
+			bpm._process(Pom.BuildPath.of(), pom_module.modules, pom_module.profiles)
 			return bpm
 		
 		def _get_module_key(self, module):
@@ -2884,9 +5025,26 @@ class Pom(object):
 			else:
 				return self._find_module_key(str(module))
 		
+		def _index_module_key(self, artifact):
+			self.__by_artifact_id[artifact.artifactId].append(artifact)
+			self.__by_key[(artifact.groupId, artifact.artifactId)].append(artifact)
+			for coordinates in set([artifact.get_module_id(), artifact.get_module_id(True)]):
+				self.__by_coordinates[coordinates].append(artifact)
+		
+		def _get_module_key_candidates(self, module_name):
+			if module_name in self.__by_coordinates:
+				return self.__by_coordinates[module_name]
+			parts = Pom.Artifact.get_parts(module_name)
+			group_id, artifact_id = parts.get('groupId'), parts.get('artifactId')
+			if group_id is not None and artifact_id is not None:
+				return self.__by_key.get((group_id, artifact_id), [])
+			if artifact_id is not None:
+				return self.__by_artifact_id.get(artifact_id, [])
+			return self.modules.keys()
+		
 		def _find_module_key(self, module_name):
 			found = []
-			for artifact in self.modules:
+			for artifact in self._get_module_key_candidates(module_name):
 				if artifact.match_name(module_name):
 					found.append(artifact)
 			l = len(found)
@@ -2913,6 +5071,7 @@ class Pom(object):
 			k = self._get_module_key(module)
 			if not k in self.modules:
 				self.modules[k] = Pom.BuildPathSet()
+				self._index_module_key(k)
 			self.modules[k].add(buildpath)
 		
 		def _add_profile_path(self, profile, buildpath):
@@ -2951,7 +5110,7 @@ class Pom(object):
 				bps.add(bp)
 			return bps
 		
-		def get_buildpaths(self, modules, profiles, excludes = set()):
+		def _get_target_buildpaths(self, modules, profiles, excludes):
 			initial_buildpaths = []
 			for module in modules:
 				bps = self._get_module_buildpaths(module)
@@ -2965,37 +5124,78 @@ class Pom(object):
 				bps = self._get_filtered_buildpaths(bps, excludes)
 				if len(bps) == 0: continue
 				initial_buildpaths.append(bps)
-			
-			reduced_buildpaths = Pom.BuildPathSet()
-			first = True
+			return initial_buildpaths
+		
+		def get_buildpaths(self, modules, profiles, excludes = set()):
+			initial_buildpaths = self._get_target_buildpaths(modules, profiles, excludes)
+			# Only the minimal paths covering the targets seen so far are kept: any other combination is
+			# implied by one of them and extending it can't produce a smaller path. Conflicting property
+			# values are skipped instead of merged.
+			reduced_buildpaths = None
 			for bps in initial_buildpaths:
-				if first:
-					reduced_buildpaths = bps
-					first = False
-				else:
-					common = reduced_buildpaths.intersection(bps)
-					if len(common) > 0:
-						product1 = reduced_buildpaths.difference(common)
-						product2 = bps.difference(common)
-						reduced_buildpaths = common
-					else:
-						product1 = reduced_buildpaths
-						product2 = bps
-						reduced_buildpaths = Pom.BuildPathSet()
-					for buildpath_combination in itertools.product(product1, product2):
-						merged_buildpath = Pom.BuildPath()
-						for bp in buildpath_combination:
-							merged_buildpath.merge(bp)
-						reduced_buildpaths.add(merged_buildpath)
+				if reduced_buildpaths is None:
+					reduced_buildpaths = self._get_minimal_buildpaths(bps)
+					continue
+				candidates = []
+				for reduced in reduced_buildpaths:
+					if any(bp.is_implied_by(reduced) for bp in bps):
+						candidates.append(reduced)
+						continue
+					for bp in bps:
+						if not reduced.conflicts_with(bp):
+							candidates.append(reduced.merge(bp))
+				reduced_buildpaths = self._get_minimal_buildpaths(candidates)
+			if reduced_buildpaths is None:
+				return Pom.BuildPathSet()
 			return reduced_buildpaths
 		
+		def get_best_buildpath(self, module, modules, profiles, excludes = set()):
+			"""Branch and bound search for the lowest weight path covering all targets
+			
+			Returns (buildpath, weight) or None. Weights only grow as profiles and properties are added,
+			so the weight of a partial path bounds every path extending it.
+			"""
+			targets = []
+			for bps in self._get_target_buildpaths(modules, profiles, excludes):
+				options = [(module.get_weight(bp), bp.get_cmdline(), bp) for bp in self._get_minimal_buildpaths(bps)]
+				targets.append([bp for w, c, bp in sorted(options)])
+			if len(targets) == 0:
+				return None
+			targets.sort(key=len)
+			best = [None, None]
+			self._search_best_buildpath(module, targets, 0, Pom.BuildPath.of(), best)
+			if best[0] is None:
+				return None
+			return tuple(best)
+		
+		def _search_best_buildpath(self, module, targets, i, buildpath, best):
+			weight = module.get_weight(buildpath)
+			if best[1] is not None and weight > best[1]:
+				return
+			if i == len(targets):
+				if best[0] is None or (weight, buildpath.get_cmdline()) < (best[1], best[0].get_cmdline()):
+					best[0], best[1] = buildpath, weight
+				return
+			if any(bp.is_implied_by(buildpath) for bp in targets[i]):
+				self._search_best_buildpath(module, targets, i + 1, buildpath, best)
+				return
+			for bp in targets[i]:
+				if not buildpath.conflicts_with(bp):
+					self._search_best_buildpath(module, targets, i + 1, buildpath.merge(bp), best)
+		
+		def _get_minimal_buildpaths(self, buildpaths):
+			minimal = Pom.BuildPathSet()
+			for bp in sorted(set(buildpaths), key=lambda bp: bp.get_size()):
+				if not any(m.is_implied_by(bp) for m in minimal):
+					minimal.add(bp)
+			return minimal
+		
 		def _process(self, buildpath, modules, profiles):
 			for module_name in sorted(modules):
 				module = modules[module_name]
 				if module is None: continue
-				self._add_module_path(module, buildpath.clone())
-				b = buildpath.clone()
-				self._process(b, module.modules, module.profiles)
+				self._add_module_path(module, buildpath)
+				self._process(buildpath, module.modules, module.profiles)
 			
 			for profile_name in sorted(profiles):
 				profile = profiles[profile_name]
@@ -3005,20 +5205,21 @@ class Pom(object):
 				if activation is not None:
 					if activation.by_default:
 						by_name = False
-						b = buildpath.clone()
-						self._add_profile_path(profile, b.clone())
-						self._process(b, profile.modules, [])
+						self._add_profile_path(profile, buildpath)
+						self._process(buildpath, profile.modules, [])
 					elif activation.property_name is not None:
-						b = buildpath.clone()
-						b.properties[activation.property_name] = activation.property_value
-						self._add_profile_path(profile, b.clone())
+						b = buildpath.with_property(activation.property_name, activation.property_value)
+						self._add_profile_path(profile, b)
 						self._process(b, profile.modules, [])
 				if by_name:
-					b = buildpath.clone()
-					b.profiles.add(profile_name)
-					self._add_profile_path(profile, b.clone())
+					b = buildpath.with_profile(profile_name)
+					self._add_profile_path(profile, b)
 					self._process(b, profile.modules, [])
 
+def _discover_pom(file_path):
+	# process pool entry point; nested classes cannot be pickled by reference
+	return Pom.ReactorLoader.discover(file_path)
+
 pom = Pom()
 
 class Maven(object):
@@ -3027,6 +5228,8 @@ class Maven(object):
 			raise TypeError('config not valid', cfg)
 		self.pom_file = cfg.pom_file
 		self.verbose = cfg.verbose
+		self.jobs = cfg.jobs
+		self.output_format = cfg.output_format
 	
 	def remove_plugin(self, plugin):
 		plugin_parts = plugin.split(':')
@@ -3060,22 +5263,351 @@ class Maven(object):
 				plugin_node.getparent().remove(plugin_node)
 			pomtree.write(self.pom_file, encoding='UTF-8', xml_declaration=True)
 	
-	def how_to_build(self, modules, profiles, excludes, show_weigth=False):
-		module = Pom.Module.create(self.pom_file)
+	def how_to_build(self, modules, profiles, excludes, show_weigth=False, best=False):
+		module = Pom.Module.load(self.pom_file, self.jobs)
 		bpm = Pom.BuildPathMap.create(module)
-		bps = bpm.get_buildpaths(modules, profiles, excludes)
-		
-		sorted_bps = sorted(bps, key=lambda item: module.get_weight(item))
+		if best:
+			found = bpm.get_best_buildpath(module, modules, profiles, excludes)
+			sorted_bps = [found[0]] if found is not None else []
+		else:
+			bps = bpm.get_buildpaths(modules, profiles, excludes)
+			sorted_bps = sorted(bps, key=lambda item: (module.get_weight(item), item.get_cmdline()))
+		if self.output_format != 'text':
+			writer = Pom.RecordWriter(self.output_format)
+			for bp in sorted_bps:
+				writer.write({
+					'cmdline': bp.get_cmdline(),
+					'profiles': sorted(bp.profiles),
+					'properties': bp.properties,
+					'weight': module.get_weight(bp),
+				})
+			writer.close()
+			return
 		for bp in sorted_bps:
 			if show_weigth:
 				print "%.4f\t%s" % (module.get_weight(bp), bp.get_cmdline())
 			else:
 				print "%s" % bp.get_cmdline()
 	
+	def resolve_version(self, coordinate, spec, scan=True):
+		parts = coordinate.split(':')
+		if len(parts) != 2 or len(parts[0].strip()) == 0 or len(parts[1].strip()) == 0:
+			raise ValueError('incorrect artifact definition: "%s"' % coordinate)
+		index = Pom.RepositoryIndex.create(pom.user_settings.local_repository)
+		try:
+			if scan:
+				listed = index.scan()
+				if self.verbose:
+					print >> sys.stderr, 'indexed %s (%d directories listed)' % (index.repository_path, listed)
+			version = index.resolve(parts[0].strip(), parts[1].strip(), spec)
+		finally:
+			index.close()
+		if version is None:
+			raise Pom.VersionException('No version of %s matches %s in %s' % (coordinate, spec, index.repository_path))
+		if self.output_format != 'text':
+			writer = Pom.RecordWriter(self.output_format)
+			writer.write({'groupId': parts[0].strip(), 'artifactId': parts[1].strip(), 'spec': spec, 'version': version})
+			writer.close()
+			return
+		print version
+	
+	def effective_pom(self, names, all_modules = False):
+		root = Pom.Module.load(self.pom_file, self.jobs)
+		modules = [root]
+		if all_modules or len(names) > 0:
+			modules = Maven._get_modules(root)
+		if len(names) > 0:
+			matches = lambda m, name: m.artifact.artifactId == name or m.artifact.match_name(name)
+			unknown = [name for name in names if not any(matches(m, name) for m in modules)]
+			if len(unknown) > 0:
+				for name in unknown:
+					print >> sys.stderr, "[error] unknown module: %s" % name
+				sys.exit(1)
+			modules = [m for m in modules if any(matches(m, name) for name in names)]
+		if self.output_format != 'text':
+			writer = Pom.RecordWriter(self.output_format)
+			for module in modules:
+				writer.write(module.effective_model.get_record())
+			writer.close()
+			return
+		if len(modules) == 1:
+			xroot = modules[0].effective_model.to_xml()
+		else:
+			xroot = etree.Element('projects')
+			for module in modules:
+				xroot.append(module.effective_model.to_xml())
+		sys.stdout.write(etree.tostring(xroot, pretty_print=True))
+	
+	@staticmethod
+	def _get_modules(root):
+		# every artifact once, as first met in the build graph: plain modules come before profile ones
+		modules = []
+		seen = set()
+		for record in Pom.BuildGraph.walk(Pom.BuildGraphConf({root.artifact.artifactId: root})):
+			if record.node_type != Pom.Module.TYPE or record.node is None:
+				continue
+			module_id = record.node.artifact.get_module_id(True)
+			if module_id not in seen:
+				seen.add(module_id)
+				modules.append(record.node)
+		return modules
+	
 	def show_dependencies(self, show_tree):
-		module = Pom.Module.create(self.pom_file)
-		for v in sorted(module.dependencies.values(), key=lambda d: (d.scope, d.artifact.get_module_id())):
-			print v
+		module = Pom.Module.load(self.pom_file, self.jobs)
+		index = None
+		if pom.parse_cache.enabled:
+			index = Pom.RepositoryIndex.create(pom.user_settings.local_repository, pom.parse_cache.cache_dir)
+		resolver = Pom.DependencyResolver(module, pom.user_settings.local_repository, index)
+		try:
+			root = resolver.resolve()
+		finally:
+			resolver.index.close()
+		if self.output_format != 'text':
+			self._write_dependencies(root, show_tree)
+			return
+		if show_tree:
+			print module.artifact
+			self._show_dependency_tree(root, '')
+		else:
+			for node in sorted(root.iternodes(), key=lambda n: (n.dependency.scope, n.dependency.artifact.get_module_id())):
+				print node.dependency
+	
+	def _write_dependencies(self, root, show_tree):
+		writer = Pom.RecordWriter(self.output_format)
+		if show_tree:
+			nodes = root.iternodes()
+		else:
+			nodes = sorted(root.iternodes(), key=lambda n: (n.dependency.scope, n.dependency.artifact.get_module_id()))
+		ids = {}
+		for node in nodes:
+			dependency = node.dependency
+			group_id, artifact_id, deptype, classifier = dependency.get_key()
+			record = {
+				'id': len(ids),
+				'groupId': group_id,
+				'artifactId': artifact_id,
+				'type': deptype,
+				'classifier': classifier,
+				'version': dependency.artifact.version,
+				'scope': dependency.scope,
+				'optional': dependency.optional,
+			}
+			if show_tree:
+				record['depth'] = node.depth
+				record['parent'] = ids.get(id(node.parent))
+			ids[id(node)] = record['id']
+			writer.write(record)
+		writer.close()
+	
+	def _show_dependency_tree(self, node, prefix):
+		last = len(node.children) - 1
+		for idx, child in enumerate(node.children):
+			print prefix + ('\\- ' if idx == last else '+- ') + child.dependency.get_id() + (' (optional)' if child.dependency.optional else '')
+			self._show_dependency_tree(child, prefix + ('   ' if idx == last else '|  '))
+
+class Daemon(object):
+	"""Answers CmdLine commands over a Unix domain socket, keeping the parsed reactor warm
+
+	Loaded pom files are polled for changes between requests and while idle; changed modules are
+	reloaded in place so the next command sees the edited reactor.
+	"""
+	POLL_INTERVAL = 1.0
+	CONNECT_TIMEOUT = 5.0
+	VALUE_OPTIONS = ('-j', '--jobs', '-F', '--format')
+	
+	def __init__(self, pom_file, socket_path = None, jobs = 1, verbose = False):
+		self.pom_file = pom_file
+		self.socket_path = socket_path or Daemon.get_socket_path(pom_file)
+		self.jobs = jobs
+		self.verbose = verbose
+		self.__signatures = {}
+		self.__running = False
+	
+	@staticmethod
+	def get_socket_path(pom_file):
+		name = 'serve-%s.sock' % hashlib.sha1(os.path.realpath(pom_file)).hexdigest()[:16]
+		return os.path.join(Pom.ParseCache.get_default_cache_dir(), name)
+	
+	@staticmethod
+	def get_pom_file(args):
+		"""Returns the pom file of a command line that may be forwarded, or None"""
+		positional = []
+		skip = False
+		for arg in args:
+			if skip:
+				skip = False
+			elif arg in Daemon.VALUE_OPTIONS:
+				skip = True
+			elif arg == '--help':
+				return None
+			elif not arg.startswith('-') or arg == '-':
+				positional.append(arg)
+		if len(positional) < 2 or positional[1] == 'serve':
+			return None
+		return positional[0]
+	
+	@staticmethod
+	def request(socket_path, args, cwd = None):
+		"""Runs a command in the daemon; None if it can not be reached, in which case nothing ran"""
+		client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		client.settimeout(Daemon.CONNECT_TIMEOUT)
+		try:
+			try:
+				client.connect(socket_path)
+			except socket.error:
+				return None
+			# connected: the command runs as long as it takes
+			client.settimeout(None)
+			client.sendall(json.dumps({'args': args, 'cwd': cwd or os.getcwd()}) + '\n')
+			client.shutdown(socket.SHUT_WR)
+			data = []
+			while True:
+				chunk = client.recv(65536)
+				if not chunk:
+					break
+				data.append(chunk)
+		finally:
+			client.close()
+		response = json.loads(''.join(data))
+		return response['status'], response['stdout'], response['stderr']
+	
+	@staticmethod
+	def forward(args):
+		"""Runs the command in a daemon serving its pom file; False when there is none"""
+		pom_file = Daemon.get_pom_file(args)
+		if pom_file is None or not os.path.isfile(pom_file):
+			return False
+		socket_path = Daemon.get_socket_path(pom_file)
+		if not os.path.exists(socket_path):
+			return False
+		try:
+			response = Daemon.request(socket_path, args)
+		except (socket.error, ValueError, KeyError) as e:
+			# the daemon may have run the command already, it is not run a second time here
+			print >> sys.stderr, '[error] daemon request failed: %s' % e
+			sys.exit(1)
+		if response is None:
+			return False
+		status, stdout, stderr = response
+		sys.stdout.write(stdout.encode('utf-8'))
+		sys.stderr.write(stderr.encode('utf-8'))
+		sys.stdout.flush()
+		sys.exit(status)
+	
+	def serve(self):
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		if os.path.exists(self.socket_path):
+			os.remove(self.socket_path)
+		socket_dir = os.path.dirname(self.socket_path)
+		if not os.path.isdir(socket_dir):
+			os.makedirs(socket_dir)
+		server.bind(self.socket_path)
+		server.listen(16)
+		self.__running = True
+		try:
+			# a client going away before the reply must not kill the daemon
+			sigpipe = signal.signal(signal.SIGPIPE, signal.SIG_IGN)
+		except ValueError:
+			# not the main thread: left as is
+			sigpipe = None
+		try:
+			self._reload()
+			if self.verbose:
+				print >> sys.stderr, 'serving %s on %s' % (self.pom_file, self.socket_path)
+			while self.__running:
+				try:
+					readable, _, _ = select.select([server], [], [], self.POLL_INTERVAL)
+				except select.error as e:
+					if e.args[0] == errno.EINTR:
+						continue
+					raise
+				if len(readable) == 0:
+					self._invalidate()
+					continue
+				conn, _ = server.accept()
+				try:
+					self._handle(conn)
+				except (socket.error, ValueError) as e:
+					print >> sys.stderr, '[error] request failed: %s' % e
+				finally:
+					conn.close()
+		finally:
+			if sigpipe is not None:
+				signal.signal(signal.SIGPIPE, sigpipe)
+			server.close()
+			if os.path.exists(self.socket_path):
+				os.remove(self.socket_path)
+	
+	def stop(self):
+		self.__running = False
+	
+	def _reload(self):
+		Pom.Module.load(self.pom_file, self.jobs)
+		self._update_signatures()
+	
+	def _get_signature(self, file_path):
+		try:
+			st = os.stat(file_path)
+		except OSError:
+			return None
+		return (st.st_mtime, st.st_size)
+	
+	def _update_signatures(self):
+		file_paths = set(pom.module_cache.file_paths) | pom.bom_store.file_paths
+		self.__signatures = dict((f, self._get_signature(f)) for f in file_paths)
+	
+	def _invalidate(self):
+		changed = [f for f, signature in self.__signatures.items() if self._get_signature(f) != signature]
+		if len(changed) == 0:
+			return False
+		if self.verbose:
+			print >> sys.stderr, 'reloading, changed: %s' % ', '.join(sorted(changed))
+		root = pom.module_cache.get(Pom.IO(self.pom_file).file_path, None)
+		if root is None:
+			pom.module_cache.clear()
+			pom.parse_cache.discard(changed)
+			pom.bom_store.discard(changed)
+		else:
+			Pom.Module.reload(root, changed)
+		self._update_signatures()
+		return True
+	
+	def _handle(self, conn):
+		data = []
+		while True:
+			chunk = conn.recv(65536)
+			if not chunk:
+				break
+			data.append(chunk)
+		request = json.loads(''.join(data))
+		if not isinstance(request, dict):
+			raise ValueError('invalid request')
+		self._invalidate()
+		status, stdout, stderr = self._run(request.get('args', []), request.get('cwd'))
+		self._update_signatures()
+		conn.sendall(json.dumps({'status': status, 'stdout': stdout, 'stderr': stderr}))
+	
+	def _run(self, args, cwd):
+		if Daemon.get_pom_file(args) is None:
+			return 2, '', 'command can not be served: %s\n' % ' '.join(args)
+		stdout, stderr = sys.stdout, sys.stderr
+		sys.stdout, sys.stderr = StringIO.StringIO(), StringIO.StringIO()
+		status = 0
+		cwd_before = os.getcwd()
+		try:
+			if cwd is not None:
+				os.chdir(cwd)
+			CmdLine.cli.main(args=args, prog_name='ar.mvn.py')
+		except SystemExit as e:
+			status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+		except Exception:
+			traceback.print_exc(file=sys.stderr)
+			status = 1
+		finally:
+			output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+			sys.stdout, sys.stderr = stdout, stderr
+			os.chdir(cwd_before)
+		return status, output, errors
 
 class CmdLine(object):
 	_type_dir = click.Path(exists=True, file_okay=False, dir_okay=True, readable=True, resolve_path=True)
@@ -3083,7 +5615,8 @@ class CmdLine(object):
 	_type_rwfile = click.Path(exists=False, file_okay=True, dir_okay=False, writable=True, resolve_path=True)
 	
 	def run(self):
-		self.cli()
+		if not Daemon.forward(sys.argv[1:]):
+			self.cli()
 	
 	@staticmethod
 	def get_multi_option(value):
@@ -3113,12 +5646,20 @@ class CmdLine(object):
 	
 	@click.group()
 	@click.option('--verbose', '-v', default=False, is_flag=True)
-	@click.argument('pom', metavar='<pom>', type=_type_rofile)
+	@click.option('--cache/--no-cache', default=True, help='cache parsed poms and repository descriptors in $XDG_CACHE_HOME/ar.mvn or ~/.cache/ar.mvn (on by default)')
+	@click.option('--jobs', '-j', metavar='<jobs>', default=1, type=click.IntRange(1), help='parallel pom parsing processes, models are built serially')
+	@click.option('--format', '-F', 'output_format', default='text', type=click.Choice(('text',) + Pom.RecordWriter.FORMATS), help='output format')
+	@click.argument('pom_file', metavar='<pom>', type=_type_rofile)
 	@click.pass_context
-	def cli(ctx, verbose, pom):
+	def cli(ctx, verbose, cache, jobs, output_format, pom_file):
 		cfg = ctx.ensure_object(Config)
 		cfg.verbose = verbose
-		cfg.pom_file = pom
+		cfg.cache = cache
+		cfg.jobs = jobs
+		cfg.output_format = output_format
+		cfg.pom_file = pom_file
+		if cfg.cache:
+			pom.parse_cache.set_cache_dir(Pom.ParseCache.get_default_cache_dir())
 	
 	@cli.command('remove-plugin', short_help='remove plugin')
 	@click.argument('plugin', metavar='<plugin>')
@@ -3140,18 +5681,20 @@ class CmdLine(object):
 	@click.option('--property', '-k', metavar='<property>', multiple=True, help='property name[=value] (multiple)')
 	@click.option('--show-weight', '-w', default=False, is_flag=True, help='show weight')
 	@click.option('--show-implicit', '-i', default=False, is_flag=True, help='show implicit matches')
-	def show_graph(ctx, profile, property, mark, filter, show_weight, show_implicit):
+	@click.option('--output-format', '-o', default='text', type=click.Choice(Pom.BuildGraphRenderer.FORMATS), help='text rendering, -F json/ndjson for records')
+	def show_graph(ctx, profile, property, mark, filter, show_weight, show_implicit, output_format):
 		cfg = ctx.ensure_object(Config)
 		profiles = CmdLine.get_multi_option(profile)
 		properties = CmdLine.get_key_value_option(property)
-		match_path = Pom.BuildPath(profiles, properties)
-		root = Pom.Module.create(cfg.pom_file)
+		match_path = Pom.BuildPath.of(profiles, properties)
+		root = Pom.Module.load(cfg.pom_file, cfg.jobs)
 		bgc = Pom.BuildGraphConf()
 		bgc.match_path = match_path
 		bgc.do_mark = mark
 		bgc.do_filter = filter
 		bgc.show_weight = show_weight
 		bgc.show_implicit = show_implicit
+		bgc.output_format = cfg.get_graph_format(output_format)
 		root.show_graph(bgc, True)
 	
 	@cli.command('show-modules', short_help='show modules')
@@ -3164,12 +5707,13 @@ class CmdLine(object):
 	@click.option('--show-implicit', '-i', default=False, is_flag=True, help='show implicit matches')
 	@click.option('--hide-prefix', '-x', default=False, is_flag=True, help='hide module/profile prefix')
 	@click.option('--tree/--list', '-t/-l', default=True, is_flag=True, help='show tree or list')
-	def show_modules_list(ctx, profile, property, mark, filter, show_weight, show_implicit, hide_prefix, tree):
+	@click.option('--output-format', '-o', default='text', type=click.Choice(Pom.BuildGraphRenderer.FORMATS), help='text rendering, -F json/ndjson for records')
+	def show_modules_list(ctx, profile, property, mark, filter, show_weight, show_implicit, hide_prefix, tree, output_format):
 		cfg = ctx.ensure_object(Config)
 		profiles = CmdLine.get_multi_option(profile)
 		properties = CmdLine.get_key_value_option(property)
-		match_path = Pom.BuildPath(profiles, properties)
-		root = Pom.Module.create(cfg.pom_file)
+		match_path = Pom.BuildPath.of(profiles, properties)
+		root = Pom.Module.load(cfg.pom_file, cfg.jobs)
 		bgc = Pom.BuildGraphConf()
 		bgc.match_path = match_path
 		bgc.do_mark = mark
@@ -3179,6 +5723,7 @@ class CmdLine(object):
 		bgc.output_type = 'modules'
 		bgc.show_prefix = not hide_prefix
 		bgc.output_tree = tree
+		bgc.output_format = cfg.get_graph_format(output_format)
 		root.show_graph(bgc, True)
 	
 	@cli.command('how-to-build', short_help='how to build')
@@ -3186,14 +5731,15 @@ class CmdLine(object):
 	@click.option('--profile', '-p', metavar='<profile>', multiple=True, help='profile to build (multiple)')
 	@click.option('--exclude', '-e', metavar='<exclude>', multiple=True, help='exclude build profile/property (multiple)')
 	@click.option('--show-weight', '-w', default=False, is_flag=True, help='show build path weight')
+	@click.option('--best', '-b', default=False, is_flag=True, help='show only the lowest weight build path')
 	@click.pass_context
-	def how_to_build(ctx, module, profile, exclude, show_weight):
+	def how_to_build(ctx, module, profile, exclude, show_weight, best):
 		cfg = ctx.ensure_object(Config)
 		mvn = Maven(cfg)
 		modules = CmdLine.get_multi_option(module)
 		profiles = CmdLine.get_multi_option(profile)
 		excludes = CmdLine.get_multi_option(exclude)
-		mvn.how_to_build(modules, profiles, excludes, show_weight)
+		mvn.how_to_build(modules, profiles, excludes, show_weight, best)
 	
 	@cli.command('show-dependencies', short_help='show dependencies')
 	@click.pass_context
@@ -3203,6 +5749,50 @@ class CmdLine(object):
 		mvn = Maven(cfg)
 		mvn.show_dependencies(tree)
 
+	@cli.command('effective-pom', short_help='show effective pom')
+	@click.option('--module', '-m', metavar='<module>', multiple=True, help='module artifactId or groupId:artifactId (multiple)')
+	@click.option('--all', '-a', 'all_modules', default=False, is_flag=True, help='all modules of the reactor')
+	@click.pass_context
+	def effective_pom(ctx, module, all_modules):
+		"""Show the merged model of the root module, selected modules or all modules
+		
+		Inherited properties, dependencyManagement (imported BOMs included), dependencies and
+		repositories are merged; profiles are not applied.
+		"""
+		cfg = ctx.ensure_object(Config)
+		mvn = Maven(cfg)
+		mvn.effective_pom(CmdLine.get_multi_option(module), all_modules)
+	
+	@cli.command('serve', short_help='serve commands from a warm daemon')
+	@click.option('--socket', '-s', 'socket_path', metavar='<socket>', default=None, help='unix socket path')
+	@click.pass_context
+	def serve(ctx, socket_path):
+		"""Keep the reactor loaded and answer commands for <pom> over a Unix socket
+		
+		Commands run with the same <pom> are forwarded to the daemon while it is running.
+		"""
+		cfg = ctx.ensure_object(Config)
+		daemon = Daemon(cfg.pom_file, socket_path, cfg.jobs, cfg.verbose)
+		signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+		try:
+			daemon.serve()
+		except KeyboardInterrupt:
+			pass
+	
+	@cli.command('resolve-version', short_help='resolve version from local repository')
+	@click.option('--scan/--no-scan', default=True, help='rescan local repository before resolving')
+	@click.argument('artifact', metavar='<artifact>')
+	@click.argument('spec', metavar='<spec>')
+	@click.pass_context
+	def resolve_version(ctx, scan, artifact, spec):
+		"""Resolve version, range, LATEST or RELEASE against the local repository
+		
+		<artifact>\tgroupId:artifactId
+		"""
+		cfg = ctx.ensure_object(Config)
+		mvn = Maven(cfg)
+		mvn.resolve_version(artifact, spec, scan)
+
 if __name__ == '__main__':
 	cmd = CmdLine()
 	cmd.run()
@@ -0,0 +1,482 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+   Benchmarks for ar.mvn.py
+
+   usage: python tests/bench_armvn.py [benchmark ...]
+"""
+import imp, os, sys, time, shutil, tempfile, resource, subprocess
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+with open(os.path.join(BASE_DIR, 'ar.mvn.py'), 'rb') as fp:
+	mvn = imp.load_module('ar_mvn', fp, 'ar.mvn.py', ('.py', 'rb', imp.PY_SOURCE))
+
+class Reactor(object):
+	HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<project xmlns="http://maven.apache.org/POM/4.0.0">\n\t<modelVersion>4.0.0</modelVersion>\n'
+
+	def __init__(self, modules = 2000, width = 20, profiles = 10, dependencies = 10):
+		self.modules = modules
+		self.width = width
+		self.profiles = profiles
+		self.dependencies = dependencies
+		self.root_dir = None
+
+	@property
+	def pom_file(self):
+		return os.path.join(self.root_dir, 'pom.xml')
+
+	def __enter__(self):
+		self.root_dir = tempfile.mkdtemp(prefix='armvn-bench-')
+		self.create()
+		return self
+
+	def __exit__(self, *args):
+		shutil.rmtree(self.root_dir)
+
+	def create(self):
+		groups = max(1, self.modules // self.width)
+		profiles = []
+		for p in xrange(self.profiles):
+			profiles.append(('profile-%d' % p, ['group-%d' % g for g in xrange(groups) if g % self.profiles == p]))
+		plain = ['group-%d' % g for g in xrange(groups) if self.profiles == 0]
+		self.write_pom(self.root_dir, 'root', None, plain, profiles, self.get_managed())
+		count = 1
+		for g in xrange(groups):
+			group_dir = os.path.join(self.root_dir, 'group-%d' % g)
+			names = ['module-%d-%d' % (g, m) for m in xrange(self.width - 1)]
+			self.write_pom(group_dir, 'group-%d' % g, 'root', names, [('group-%d-extra' % g, [])])
+			count += 1
+			for name in names:
+				self.write_pom(os.path.join(group_dir, name), name, 'group-%d' % g, [], [], packaging='jar')
+				count += 1
+		return count
+
+	def get_managed(self):
+		return ['lib-%d' % d for d in xrange(self.dependencies)]
+
+	def write_pom(self, pom_dir, artifact_id, parent_id, modules, profiles, managed = None, packaging = 'pom'):
+		if not os.path.isdir(pom_dir):
+			os.makedirs(pom_dir)
+		out = self.HEADER
+		if parent_id is not None:
+			out += '\t<parent><groupId>org.bench</groupId><artifactId>%s</artifactId><version>1.0-SNAPSHOT</version></parent>\n' % parent_id
+		else:
+			out += '\t<groupId>org.bench</groupId>\n\t<version>1.0-SNAPSHOT</version>\n'
+		out += '\t<artifactId>%s</artifactId>\n\t<packaging>%s</packaging>\n' % (artifact_id, packaging)
+		out += '\t<properties>\n\t\t<%s.version>${project.version}</%s.version>\n\t</properties>\n' % (artifact_id, artifact_id)
+		if len(modules) > 0:
+			out += '\t<modules>\n' + ''.join('\t\t<module>%s</module>\n' % m for m in modules) + '\t</modules>\n'
+		if managed:
+			out += '\t<dependencyManagement><dependencies>\n'
+			for name in managed:
+				out += '\t\t<dependency><groupId>org.lib</groupId><artifactId>%s</artifactId><version>1.%s</version></dependency>\n' % (name, name[4:])
+			out += '\t</dependencies></dependencyManagement>\n'
+		if parent_id is not None and self.dependencies > 0:
+			out += '\t<dependencies>\n'
+			for name in self.get_managed():
+				out += '\t\t<dependency><groupId>org.lib</groupId><artifactId>%s</artifactId></dependency>\n' % name
+			out += '\t</dependencies>\n'
+		if len(profiles) > 0:
+			out += '\t<profiles>\n'
+			for profile_id, profile_modules in profiles:
+				out += '\t\t<profile><id>%s</id><modules>%s</modules></profile>\n' % (profile_id, ''.join('<module>%s</module>' % m for m in profile_modules))
+			out += '\t</profiles>\n'
+		out += '\t<build><plugins><plugin><artifactId>maven-compiler-plugin</artifactId></plugin></plugins></build>\n'
+		out += '</project>\n'
+		with open(os.path.join(pom_dir, 'pom.xml'), 'w') as fp:
+			fp.write(out)
+
+def reset_pom(cache_dir = None):
+	mvn.pom = mvn.Pom()
+	if cache_dir is not None:
+		mvn.pom.parse_cache.set_cache_dir(cache_dir)
+
+def timed(name, f, *args, **kwargs):
+	start = time.time()
+	result = f(*args, **kwargs)
+	print '%-40s %8.3fs' % (name, time.time() - start)
+	return result
+
+def bench_load():
+	jobs = max(2, min(8, mvn.multiprocessing.cpu_count()))
+	with Reactor(2000) as reactor:
+		print 'reactor: 2000 modules'
+		reset_pom()
+		timed('Module.load (serial)', mvn.Pom.Module.load, reactor.pom_file)
+		reset_pom()
+		timed('Module.load (jobs=%d)' % jobs, mvn.Pom.Module.load, reactor.pom_file, jobs)
+		cache_dir = os.path.join(reactor.root_dir, '.cache')
+		reset_pom(cache_dir)
+		timed('Module.load (cold parse cache)', mvn.Pom.Module.load, reactor.pom_file)
+		reset_pom(cache_dir)
+		timed('Module.load (warm parse cache)', mvn.Pom.Module.load, reactor.pom_file)
+
+def bench_properties():
+	count = 500
+	xml = '<project><groupId>g</groupId><artifactId>a</artifactId><version>1</version><properties>'
+	for i in xrange(count):
+		xml += '<chain.%d>${chain.%d}</chain.%d>' % (i, i + 1, i)
+		xml += '<mixed.%d>${chain.%d}-${parent.%d}-${undefined.%d}</mixed.%d>' % (i, i, i, i, i)
+	xml += '<chain.%d>${parent.0}</chain.%d>' % (count, count)
+	xml += '</properties></project>'
+	xroot = mvn.etree.fromstring(xml)
+	parent = mvn.Pom.Properties(('parent.%d' % i, '${parent.%d}' % (i + 1)) for i in xrange(count))
+	parent['parent.%d' % count] = '1.0'
+	print 'properties: %d chained, %d mixed, %d inherited' % (count + 1, count, count + 1)
+	properties = timed('Properties.create', mvn.Pom.Properties.create, xroot, parent)
+	timed('Properties.expand_value x %d' % count, lambda: [properties.expand_value('${mixed.%d}' % i) for i in xrange(count)])
+
+def get_versions(count):
+	qualifiers = ['', '-SNAPSHOT', '-alpha-1', '-beta-2', '-rc1', '.Final', '-1']
+	versions = []
+	for i in xrange(count):
+		versions.append('%d.%d.%d%s' % (i // 1000, (i // 100) % 10, i % 100, qualifiers[i % len(qualifiers)]))
+	return versions
+
+def bench_versions():
+	count = 5000
+	versions = get_versions(count)
+	vr = mvn.Pom.VersionRange.create_from_version_spec('[1.2,2.5),(3.0,3.9]')
+	print 'versions: %d' % count
+	timed('ArtifactVersion()', lambda: [mvn.Pom.ArtifactVersion(v) for v in versions])
+	timed('ArtifactVersion.of() (cold)', lambda: [mvn.Pom.ArtifactVersion.of(v) for v in versions])
+	timed('ArtifactVersion.of() (warm)', lambda: [mvn.Pom.ArtifactVersion.of(v) for v in versions])
+	timed('VersionRange.contains_version(str)', lambda: [vr.contains_version(v) for v in versions])
+	timed('contains_version loop + sort', lambda: sorted((v for v in versions if vr.contains_version(v)), key=lambda v: mvn.Pom.ArtifactVersion.of(v).key))
+	timed('VersionRange.filter(str)', vr.filter, versions)
+	timed('VersionRange.best(str)', vr.best, versions)
+	comparers = [mvn.Pom.ArtifactVersion.of(v).comparer for v in reversed(versions)]
+	timed('sorted(VersionComparer, key=key)', sorted, comparers, key=lambda c: c.key)
+	timed('sorted(VersionComparer, cmp=compare_to)', sorted, comparers, cmp=lambda a, b: a.compare_to(b))
+	timed('sorted(VersionComparer, cmp=items)', sorted, comparers, cmp=lambda a, b: a.items.compare_to(b.items))
+
+def bench_index():
+	artifacts = 2000
+	versions = 10
+	root_dir = tempfile.mkdtemp(prefix='armvn-bench-')
+	try:
+		repository = os.path.join(root_dir, 'repository')
+		for a in xrange(artifacts):
+			for v in xrange(versions):
+				version_dir = os.path.join(repository, 'org', 'g%d' % (a % 50), 'a%d' % a, '1.%d' % v)
+				os.makedirs(version_dir)
+				open(os.path.join(version_dir, 'a%d-1.%d.pom' % (a, v)), 'w').close()
+		print 'repository: %d artifacts, %d versions each' % (artifacts, versions)
+		index = mvn.Pom.RepositoryIndex(repository, os.path.join(root_dir, 'index.sqlite'))
+		timed('RepositoryIndex.scan (cold)', index.scan)
+		timed('RepositoryIndex.scan (unchanged)', index.scan)
+		os.makedirs(os.path.join(repository, 'org', 'g0', 'a0', '2.0'))
+		timed('RepositoryIndex.scan (one new version)', index.scan)
+		timed('RepositoryIndex.resolve x %d' % artifacts, lambda: [index.resolve('org.g%d' % (a % 50), 'a%d' % a, '[1.2,1.5)') for a in xrange(artifacts)])
+		index.close()
+	finally:
+		shutil.rmtree(root_dir)
+
+def bench_dependencies():
+	artifacts = 3000
+	fanout = 5
+	root_dir = tempfile.mkdtemp(prefix='armvn-bench-')
+	try:
+		repository = os.path.join(root_dir, 'repository')
+		def write(path, body):
+			if not os.path.isdir(os.path.dirname(path)):
+				os.makedirs(os.path.dirname(path))
+			with open(path, 'w') as fp:
+				fp.write('<project>%s</project>' % body)
+		dependency = '<dependency><groupId>org.dep</groupId><artifactId>d%d</artifactId><version>%s</version></dependency>'
+		write(os.path.join(repository, 'org', 'dep', 'parent', '1', 'parent-1.pom'),
+		      '<groupId>org.dep</groupId><artifactId>parent</artifactId><version>1</version><properties><dep.version>1.0</dep.version></properties>')
+		for i in xrange(artifacts):
+			children = ''.join(dependency % (j, '${dep.version}') for j in xrange(i * fanout + 1, min(artifacts, i * fanout + fanout + 1)))
+			children += ''.join(dependency % ((i + j) % artifacts, '1.0') for j in (7, 13))
+			write(os.path.join(repository, 'org', 'dep', 'd%d' % i, '1.0', 'd%d-1.0.pom' % i),
+			      '<parent><groupId>org.dep</groupId><artifactId>parent</artifactId><version>1</version></parent>'
+			      '<artifactId>d%d</artifactId><dependencies>%s</dependencies>' % (i, children))
+		pom_file = os.path.join(root_dir, 'project', 'pom.xml')
+		write(pom_file, '<groupId>org.bench</groupId><artifactId>root</artifactId><version>1.0</version><dependencies>%s</dependencies>' % (dependency % (0, '1.0')))
+		print 'repository: %d artifacts, %d dependencies each' % (artifacts, fanout + 2)
+		cache_dir = os.path.join(root_dir, '.cache')
+		for name in ('cold parse cache', 'warm parse cache'):
+			reset_pom(cache_dir)
+			module = mvn.Pom.Module.load(pom_file)
+			resolver = mvn.Pom.DependencyResolver(module, repository)
+			root = timed('DependencyResolver.resolve (%s)' % name, resolver.resolve)
+		timed('DependencyResolver.resolve (memoized)', resolver.resolve)
+		print 'nodes: %d' % len(list(root.iternodes()))
+	finally:
+		shutil.rmtree(root_dir)
+
+def _measure(f, args, conn):
+	start = time.time()
+	f(*args)
+	conn.send((time.time() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+def measured(name, f, *args):
+	# run in a fresh process so that the peak resident set size belongs to f alone
+	parent_conn, child_conn = mvn.multiprocessing.Pipe()
+	base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	process = mvn.multiprocessing.Process(target=_measure, args=(f, args, child_conn))
+	process.start()
+	elapsed, maxrss = parent_conn.recv()
+	process.join()
+	print '%-40s %8.3fs %8d KiB peak (+%d KiB)' % (name, elapsed, maxrss, max(0, maxrss - base))
+
+def bench_xml():
+	dependencies = 5000
+	plugins = 3000
+	root_dir = tempfile.mkdtemp(prefix='armvn-bench-')
+	try:
+		pom_file = os.path.join(root_dir, 'pom.xml')
+		with open(pom_file, 'w') as fp:
+			fp.write(Reactor.HEADER + '\t<groupId>org.bench</groupId><artifactId>big</artifactId><version>1.0</version>\n\t<dependencies>\n')
+			for i in xrange(dependencies):
+				fp.write('\t\t<dependency><groupId>org.lib</groupId><artifactId>lib-%d</artifactId><version>1.%d</version><scope>test</scope></dependency>\n' % (i, i))
+			fp.write('\t</dependencies>\n\t<build><plugins>\n')
+			for i in xrange(plugins):
+				fp.write('\t\t<plugin><artifactId>plugin-%d</artifactId><configuration>%s</configuration></plugin>\n' % (i, '<item>value</item>' * 50))
+			fp.write('\t</plugins></build>\n</project>\n')
+		print 'pom: %d dependencies, %d plugins, %d KiB' % (dependencies, plugins, os.path.getsize(pom_file) // 1024)
+		measured('Xml.parse + XmlNode.create', lambda: mvn.Pom.XmlNode.create(mvn.Pom.Xml.parse(pom_file)))
+		measured('XmlNode.iterparse', mvn.Pom.XmlNode.iterparse, pom_file)
+	finally:
+		shutil.rmtree(root_dir)
+
+def bench_accessors():
+	dependencies = 2000
+	xml = '<project xmlns="http://maven.apache.org/POM/4.0.0"><groupId>g</groupId><artifactId>a</artifactId><version>1</version><dependencies>'
+	for i in xrange(dependencies):
+		xml += ('<dependency><groupId>org.lib</groupId><artifactId>lib-%d</artifactId><version>1.%d</version><type>jar</type>'
+		        '<scope>test</scope><classifier>tests</classifier><optional>true</optional></dependency>' % (i, i))
+	xml += '</dependencies></project>'
+	print 'pom: %d dependencies' % dependencies
+	trees = (('lxml', lambda: mvn.Pom.Xml.parse_string(xml)), ('XmlNode', lambda: mvn.Pom.XmlNode.iterparse(mvn.BytesIO(xml))))
+	names = ('groupId', 'artifactId', 'version', 'type', 'scope', 'classifier', 'optional')
+	for name, parse in trees:
+		xroot = parse()
+		timed('Dependency.parse x %d (%s)' % (dependencies, name), lambda: [mvn.Pom.Dependency.parse(x) for x in mvn.Pom.Xml.get_dependencies(xroot)])
+		xroot = parse()
+		timed('get_child_node_value x %d (%s)' % (dependencies * len(names), name),
+		      lambda: [mvn.Pom.Xml.get_child_node_value(x, n) for x in mvn.Pom.Xml.get_dependencies(xroot) for n in names])
+
+def bench_buildpaths():
+	with Reactor(1000, 10, profiles=100, dependencies=0) as reactor:
+		reset_pom()
+		module = mvn.Pom.Module.load(reactor.pom_file)
+		print 'reactor: 1000 modules, 200 profiles'
+		timed('BuildPathMap.create x 20', lambda: [mvn.Pom.BuildPathMap.create(module) for i in xrange(20)])
+		bpm = mvn.Pom.BuildPathMap.create(module)
+		modules = ['module-%d-0' % g for g in xrange(0, 100, 10)]
+		profiles = ['group-%d-extra' % g for g in xrange(0, 100, 10)]
+		timed('get_buildpaths x 200', lambda: [bpm.get_buildpaths(modules, profiles) for i in xrange(200)])
+	with Reactor(2000, 20, profiles=0, dependencies=0) as reactor:
+		reset_pom()
+		module = mvn.Pom.Module.load(reactor.pom_file)
+		bps = set()
+		for paths in mvn.Pom.BuildPathMap.create(module).profiles.values():
+			bps.update(paths)
+		print 'reactor: 2000 modules, %d build paths' % len(bps)
+		timed('Module.get_weight x %d' % len(bps), lambda: [module.get_weight(bp) for bp in bps])
+
+def to_devnull(f, *args):
+	stdout = sys.stdout
+	with open(os.devnull, 'w') as sys.stdout:
+		try:
+			return f(*args)
+		finally:
+			sys.stdout = stdout
+
+def bench_graph():
+	with Reactor(5000, 20, dependencies=0) as reactor:
+		reset_pom()
+		module = mvn.Pom.Module.load(reactor.pom_file)
+		for output_format in ('text', 'ndjson', 'dot'):
+			bgc = mvn.Pom.BuildGraphConf()
+			bgc.match_path = mvn.Pom.BuildPath.of(['profile-1'])
+			bgc.show_implicit = True
+			bgc.output_format = output_format
+			timed('show_graph (%s)' % output_format, to_devnull, module.show_graph, bgc, True)
+
+def bench_reload():
+	with Reactor(1000) as reactor:
+		reset_pom()
+		root = timed('Module.load (1000 modules)', mvn.Pom.Module.load, reactor.pom_file)
+		leaf = os.path.join(reactor.root_dir, 'group-7', 'module-7-3', 'pom.xml')
+		aggregator = os.path.join(reactor.root_dir, 'group-7', 'pom.xml')
+		for name, file_path in (('leaf', leaf), ('aggregator', aggregator)):
+			with open(file_path) as fp:
+				data = fp.read()
+			with open(file_path, 'w') as fp:
+				fp.write(data.replace('<properties>', '<properties><edited>%s</edited>' % name))
+			timed('Module.reload (%s)' % name, mvn.Pom.Module.reload, root, [file_path])
+
+IMPORT_TIMES = '''
+import __builtin__, imp, sys, time
+times, depth, builtin_import = [], [0], __builtin__.__import__
+def timed_import(name, *args, **kwargs):
+	depth[0] += 1
+	start = time.time()
+	try:
+		return builtin_import(name, *args, **kwargs)
+	finally:
+		depth[0] -= 1
+		if depth[0] == 0 and name not in [t[1] for t in times]:
+			times.append((time.time() - start, name))
+__builtin__.__import__ = timed_import
+start = time.time()
+with open(sys.argv[1], 'rb') as fp:
+	imp.load_module('ar_mvn', fp, 'ar.mvn.py', ('.py', 'rb', imp.PY_SOURCE))
+total = time.time() - start
+for elapsed, name in sorted(times, reverse=True)[:8]:
+	print '  import %-32s %8.1fms' % (name, elapsed * 1000)
+print '  %-39s %8.1fms' % ('ar.mvn.py total', total * 1000)
+'''
+
+def bench_startup():
+	# python 2 has no -X importtime; time the top level imports of the script instead
+	subprocess.check_call([sys.executable, '-c', IMPORT_TIMES, os.path.join(BASE_DIR, 'ar.mvn.py')])
+	runs = 10
+	with open(os.devnull, 'w') as devnull:
+		start = time.time()
+		for i in xrange(runs):
+			subprocess.check_call([sys.executable, os.path.join(BASE_DIR, 'ar.mvn.py'), '--help'], stdout=devnull)
+		print '%-40s %8.3fs' % ('ar.mvn.py --help (mean of %d)' % runs, (time.time() - start) / runs)
+
+def bench_module_cache():
+	profiles = 300
+	root_dir = tempfile.mkdtemp(prefix='armvn-bench-')
+	try:
+		reactor = Reactor(dependencies=0)
+		xprofiles = []
+		for p in xrange(profiles):
+			# half of the profiles change a property, the others only add the module again
+			properties = '<properties><flag.%d>on</flag.%d></properties>' % (p, p) if p % 2 else ''
+			xprofiles.append('<profile><id>p%d</id>%s<modules><module>shared</module></modules></profile>' % (p, properties))
+		with open(os.path.join(root_dir, 'pom.xml'), 'w') as fp:
+			fp.write('<project><groupId>org.bench</groupId><artifactId>root</artifactId><version>1.0</version>'
+			         '<packaging>pom</packaging><profiles>%s</profiles></project>' % ''.join(xprofiles))
+		shared_dir = os.path.join(root_dir, 'shared')
+		names = ['leaf-%d' % m for m in xrange(10)]
+		reactor.write_pom(shared_dir, 'shared', 'root', names, [])
+		for name in names:
+			reactor.write_pom(os.path.join(shared_dir, name), name, 'shared', [], [], packaging='jar')
+		print 'reactor: 1 module shared by %d profiles' % profiles
+		reset_pom()
+		timed('Module.load', mvn.Pom.Module.load, os.path.join(root_dir, 'pom.xml'))
+	finally:
+		shutil.rmtree(root_dir)
+
+def bench_managed():
+	levels = 5
+	reactor = Reactor(dependencies=1500)
+	root_dir = tempfile.mkdtemp(prefix='armvn-bench-')
+	try:
+		pom_dir = root_dir
+		for level in xrange(levels):
+			name, parent = 'level-%d' % level, 'level-%d' % (level - 1) if level > 0 else None
+			modules = ['level-%d' % (level + 1)] if level + 1 < levels else []
+			# the leaf manages its own copy too, so it is parsed against a changing own layer
+			managed = reactor.get_managed() if level in (0, levels - 1) else None
+			reactor.write_pom(pom_dir, name, parent, modules, [], managed)
+			pom_dir = os.path.join(pom_dir, 'level-%d' % (level + 1))
+		print 'reactor: %d levels, %d managed dependencies' % (levels, reactor.dependencies)
+		reset_pom()
+		timed('Module.load', mvn.Pom.Module.load, os.path.join(root_dir, 'pom.xml'))
+	finally:
+		shutil.rmtree(root_dir)
+
+def bench_bom():
+	modules = 400
+	managed = 2000
+	root_dir = tempfile.mkdtemp(prefix='armvn-bench-')
+	try:
+		dependency = '<dependency><groupId>org.lib</groupId><artifactId>lib-%d</artifactId>%s</dependency>'
+		bom_dir = os.path.join(root_dir, 'repository', 'org', 'bench', 'bom', '1.0')
+		os.makedirs(bom_dir)
+		with open(os.path.join(bom_dir, 'bom-1.0.pom'), 'w') as fp:
+			fp.write('<project><groupId>org.bench</groupId><artifactId>bom</artifactId><version>1.0</version><packaging>pom</packaging>'
+			         '<dependencyManagement><dependencies>%s</dependencies></dependencyManagement></project>'
+			         % ''.join(dependency % (d, '<version>1.%d</version>' % d) for d in xrange(managed)))
+		names = ['module-%d' % m for m in xrange(modules)]
+		project_dir = os.path.join(root_dir, 'project')
+		os.makedirs(project_dir)
+		with open(os.path.join(project_dir, 'pom.xml'), 'w') as fp:
+			fp.write('<project><groupId>org.bench</groupId><artifactId>root</artifactId><version>1.0</version><packaging>pom</packaging>'
+			         '<modules>%s</modules></project>' % ''.join('<module>%s</module>' % n for n in names))
+		bom = ('<dependencyManagement><dependencies><dependency><groupId>org.bench</groupId><artifactId>bom</artifactId>'
+		       '<version>1.0</version><type>pom</type><scope>import</scope></dependency></dependencies></dependencyManagement>')
+		for m, name in enumerate(names):
+			os.makedirs(os.path.join(project_dir, name))
+			with open(os.path.join(project_dir, name, 'pom.xml'), 'w') as fp:
+				fp.write('<project><parent><groupId>org.bench</groupId><artifactId>root</artifactId><version>1.0</version></parent>'
+				         '<artifactId>%s</artifactId>%s<dependencies>%s</dependencies></project>'
+				         % (name, bom, ''.join(dependency % ((m + d) % managed, '') for d in xrange(10))))
+		print 'reactor: %d modules importing a BOM of %d managed dependencies' % (modules, managed)
+		flattened = [0]
+		flatten = mvn.Pom.BomStore._flatten
+		def counted(self, *args):
+			flattened[0] += 1
+			return flatten(self, *args)
+		mvn.Pom.BomStore._flatten = counted
+		cache_dir = os.path.join(root_dir, '.cache')
+		for name in ('cold', 'warm'):
+			reset_pom(cache_dir)
+			mvn.pom.bom_store.set_repository_path(os.path.join(root_dir, 'repository'))
+			timed('Module.load (%s cache)' % name, mvn.Pom.Module.load, os.path.join(project_dir, 'pom.xml'))
+		print 'BOM flattened %d times' % flattened[0]
+	finally:
+		mvn.Pom.BomStore._flatten = flatten
+		shutil.rmtree(root_dir)
+
+def _load_effective_models(pom_file, copied):
+	reset_pom()
+	root = mvn.Pom.Module.load(pom_file)
+	models = []
+	for module in mvn.Maven._get_modules(root):
+		model = module.effective_model
+		if copied:
+			# what a per module merge would keep alive
+			model = [dict(model.properties.items()), dict(model.managed.items()), dict(model.dependencies.items())]
+		models.append(model)
+	return models
+
+class ManagedReactor(Reactor):
+	# a root managing many more dependencies than each module declares
+	managed = 1000
+
+	def write_pom(self, pom_dir, artifact_id, parent_id, modules, profiles, managed = None, packaging = 'pom'):
+		if managed:
+			managed = ['lib-%d' % d for d in xrange(self.managed)]
+		Reactor.write_pom(self, pom_dir, artifact_id, parent_id, modules, profiles, managed, packaging)
+
+def bench_effective():
+	with ManagedReactor(1000, 20, profiles=10, dependencies=10) as reactor:
+		print 'reactor: %d modules, %d managed dependencies' % (reactor.modules, reactor.managed)
+		measured('Module.load', lambda: mvn.Pom.Module.load(reactor.pom_file))
+		measured('effective models (shared)', _load_effective_models, reactor.pom_file, False)
+		measured('effective models (copied)', _load_effective_models, reactor.pom_file, True)
+
+BENCHMARKS = [
+	('load', bench_load),
+	('properties', bench_properties),
+	('versions', bench_versions),
+	('index', bench_index),
+	('dependencies', bench_dependencies),
+	('xml', bench_xml),
+	('accessors', bench_accessors),
+	('buildpaths', bench_buildpaths),
+	('graph', bench_graph),
+	('reload', bench_reload),
+	('startup', bench_startup),
+	('modulecache', bench_module_cache),
+	('managed', bench_managed),
+	('bom', bench_bom),
+	('effective', bench_effective),
+]
+
+if __name__ == '__main__':
+	names = sys.argv[1:]
+	for name, f in BENCHMARKS:
+		if len(names) > 0 and name not in names:
+			continue
+		print '== %s' % name
+		f()
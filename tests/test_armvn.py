@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import imp, pytest
+import imp, json, os, pytest, socket, StringIO, threading, time
 
 with open('ar.mvn.py', 'rb') as fp:
 	mvn = imp.load_module('ar_mvn', fp, 'ar.mvn.py', ('.py', 'rb', imp.PY_SOURCE))
@@ -137,6 +137,25 @@ class Test_ArtifactVersion(object):
 	def test_equals_type_safe(self):
 		assert (mvn.Pom.ArtifactVersion("1") is "non-an-artifact-version-instance") == False
 	
+	def test_interned(self):
+		v1 = mvn.Pom.ArtifactVersion.of("1.0-SNAPSHOT")
+		assert v1 is mvn.Pom.ArtifactVersion.of("1.0-SNAPSHOT")
+		assert v1 is mvn.Pom.ArtifactVersion.of(v1)
+		assert v1 == mvn.Pom.ArtifactVersion("1.0-SNAPSHOT")
+		assert v1.compare_to("1-SNAPSHOT") == 0
+		with pytest.raises(AttributeError):
+			v1.foo = 1
+	
+	def test_lru_cache(self):
+		cache = mvn.Pom.LruCache(2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		assert cache.get('a') == 1
+		cache.put('c', 3)
+		assert 'a' in cache and 'c' in cache
+		assert 'b' not in cache
+		assert len(cache) == 2
+	
 	def check_version_parsing(self, version, major, minor, incremental, build_number, qualifier):
 		av = mvn.Pom.ArtifactVersion(version)
 		parsed = "'{0}' parsed as ('{1}', '{2}', '{3}', '{4}', '{5}'), ".format(version, av.major, av.minor, av.incremental, av.build_number, av.qualifier)
@@ -253,6 +272,25 @@ class Test_VersionComparer(object):
 		self.check_versions_order(b, c) # now b < c, but before MNG-5568, was b > c
 		self.check_versions_order(a, c)
 	
+	def test_sort_key(self):
+		versions = ["1-alpha2snapshot", "1-alpha-123", "1-beta-2", "1-m2", "1-rc", "1-SNAPSHOT", "1", "1-sp", "1-abc",
+		            "1-1-snapshot", "1-1", "1.0.1", "1.1-rc1", "1.1", "1.1.0.1", "2.0.0.M1", "2.0.0.RC1", "2.0.0", "2.0.0.RELEASE"]
+		shuffled = list(reversed(versions))
+		assert [str(c) for c in sorted((mvn.Pom.VersionComparer(v) for v in shuffled), key=lambda c: c.key)] == versions
+	
+	def test_sort_key_compare(self):
+		versions = ["1", "1.0", "1.1", "2.0", "1-SNAPSHOT", "1.0-SNAPSHOT", "1.0.1-SNAPSHOT", "1.RELEASE", "1.0.RELEASE", "1.0.0.RELEASE",
+		            "1.0.M1", "1.0.0.M1", "1.0-M1", "1.0-1", "1.0-sp1", "1.0.sp1", "1.0-jre", "1.0-android", "1.0-incubating", "1.0.Final",
+		            "1.0.GA", "1.0-rc1", "1.0.RC1", "1.0.CR1", "1.0-alpha1", "1.0-beta-2", "1.0b1", "1.0a", "1.0-b", "1.0.x", "1.0-x-1",
+		            "1-1", "1-alpha", "1.sp", "1.0-20150101.120000-1", "1.0.0.v20150101", "1.2.3-jre", "1.9", "1.10"]
+		comparers = [mvn.Pom.VersionComparer(v) for v in versions]
+		for a in comparers:
+			for b in comparers:
+				assert (str(a), str(b), cmp(a.key, b.key)) == (str(a), str(b), a.compare_to(b))
+		# legacy cycles are kept as they are: 1-alpha > 1.sp > 1 > 1-alpha
+		a, sp, one = [mvn.Pom.VersionComparer(v) for v in ("1-alpha", "1.sp", "1")]
+		assert a.key > sp.key > one.key > a.key
+	
 	def test_reuse(self):
 		c1 = mvn.Pom.VersionComparer("1")
 		c1._parse("2")
@@ -566,6 +604,15 @@ class Test_VersionRange(object):
 		assert self.enforce_version('[2.0,2.0.5]', actual_version) == True
 		assert self.enforce_version('[2.0,2.0.5)', actual_version) == False
 	
+	def test_filter(self):
+		versions = ['2.1', '1.0-SNAPSHOT', '1.0', '1.1-SNAPSHOT', '1.1', '1.2', '1.2.1', '1.3', '2.0-alpha-1', '2.0', '3.0']
+		for spec in ['[1.0,1.2]', '(1.0,1.2)', '[1.1]', '(,1.1],[1.3,2.0)', '[2.0,)', '1.1', '(1.2.1,1.3)']:
+			vr = self.create_from_version_spec(spec)
+			expected = sorted((v for v in versions if vr.contains_version(v)), key=lambda v: mvn.Pom.ArtifactVersion.of(v).key)
+			assert vr.filter(versions) == expected, spec
+			assert vr.best(versions) == (expected[-1] if expected else None), spec
+		assert self.create_from_version_spec('[1.0,1.2]').best(mvn.Pom.ArtifactVersion(v) for v in versions) == mvn.Pom.ArtifactVersion('1.2')
+	
 	def enforce_version(self, required_version_range, actual_version):
 		vr = self.create_from_version_spec(required_version_range)
 		return vr.contains_version(actual_version)
@@ -605,6 +652,68 @@ class Test_VersionRange(object):
 	def create_from_version_spec(self, spec):
 		return mvn.Pom.VersionRange.create_from_version_spec(spec)
 
+class Test_Properties(object):
+	def test_expand_chain(self):
+		properties = self.create_properties({'a': '${b}.${c}', 'b': '${c}-1', 'c': '${d}', 'd': '2'})
+		assert properties.expand_value('${a}') == '2-1.2'
+		assert properties.expand_item('a') == '2-1.2'
+		assert properties.expand_item('undefined') == 'undefined'
+		assert properties.expand_item() == ''
+		assert properties.expand_value('plain') == 'plain'
+	
+	def test_expand_irreplaceable(self):
+		properties = self.create_properties({'a': '${b}/${missing}', 'b': '${missing}-x', 'c': '${}'})
+		assert properties.expand_value('${a}') == '${missing}-x/${missing}'
+		assert properties.expand_value('${c}') == '${}'
+	
+	def test_expand_cycle(self):
+		properties = self.create_properties({'a': '${b}', 'b': '${a}', 'c': '${c}x'})
+		assert properties.expand_value('${a}') == '${a}'
+		assert properties.expand_value('${b}') == '${b}'
+		assert properties.expand_value('${c}') == '${c}x'
+	
+	def test_expand_legacy_differences(self):
+		# the former stack walk depended on set iteration order here, these are the intended results
+		properties = self.create_properties({'c': '${c}x'})
+		assert properties.expand_value('${c}') == '${c}x'      # was ${c}xx: a self reference expanded once
+		properties = self.create_properties({'a': '${b}-${c}', 'b': '${c}', 'c': '${b}'})
+		assert properties.expand_value('${a}') == '${b}-${c}'  # was ${c}-${c}: one side of the cycle expanded
+		properties = self.create_properties({'a': '${b}.${c}', 'b': '${c}-1', 'c': '${d}', 'd': '2'})
+		assert properties.expand_value('${a}') == '2-1.2'      # was ${c}-1.2: a sibling taken for a cycle
+		properties = self.create_properties({'a': '${b}${c}', 'b': '${c}${d}', 'c': '${d}', 'd': '${e}', 'e': '1'})
+		assert properties.expand_value('${a}') == '111'        # was ${c}11
+	
+	def test_expand_set_parent(self):
+		first, second = self.create_properties({'b': '1'}), self.create_properties({'b': '2'})
+		properties = self.create_properties({'a': '${b}'}, first)
+		assert properties.expand_item('a') == '1'
+		# a parent older than the memoized values invalidates them all the same
+		properties.set_parent(second)
+		assert properties.expand_item('a') == '2'
+	
+	def test_expand_parent(self):
+		parent = self.create_properties({'a': '${b}', 'b': '1', 'c': '3'})
+		properties = self.create_properties({'b': '2'}, parent)
+		assert properties.expand_value('${a}.${c}') == '2.3'
+		assert parent.expand_value('${a}.${c}') == '1.3'
+		parent['c'] = '4'
+		assert properties.expand_value('${a}.${c}') == '2.4'
+		properties['b'] = '5'
+		assert properties.expand_value('${a}.${c}') == '5.4'
+		del properties['b']
+		assert properties.expand_value('${a}.${c}') == '1.4'
+	
+	def test_expand_self(self):
+		parent = self.create_properties({'x': 'p'})
+		properties = self.create_properties({'a': '${b}${x}', 'b': '${c}', 'c': 'c', 'd': '${missing}'}, parent)
+		properties._expand_self()
+		assert dict(properties) == {'a': 'cp', 'b': 'c', 'c': 'c', 'd': '${missing}'}
+	
+	def create_properties(self, values, parent = None):
+		properties = mvn.Pom.Properties(values)
+		properties.set_parent(parent)
+		return properties
+
 class Test_MirrorProcessor():
 	def test_external_url(self):
 		assert True == self.create_repo("foo", "http://somehost").is_external
@@ -749,5 +858,701 @@ class Test_MirrorProcessor():
 	def create_repo(self, repo_id, repo_url, repo_layout=None):
 		return mvn.Pom.ArtifactRepository(repo_id, repo_url, repo_layout)
 
+class Test_Pom(object):
+	def test_lazy_settings(self):
+		p = mvn.Pom()
+		assert p._Pom__properties is None and p._Pom__user_settings is None
+		assert p.storage is not None
+		assert p._Pom__user_settings is p.user_settings
+		assert 'user.home' in p.properties
+	
+	def test_lazy_module(self):
+		module = mvn.LazyModule('colorsys')
+		assert module.rgb_to_hsv(0, 0, 0) == (0, 0, 0)
+
+class Test_ParseCache(object):
+	POM = """<?xml version="1.0"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+	<groupId>g</groupId>
+	<artifactId>{0}</artifactId>
+	<version>1.0</version>
+	<description>ignored</description>
+	<properties><!-- comment --><a>1</a></properties>
+	<build>
+		<directory>out</directory>
+		<plugins><plugin><artifactId>p</artifactId></plugin></plugins>
+	</build>
+</project>
+"""
+	
+	def test_snapshot(self, tmpdir):
+		pom_file = self.write_pom(tmpdir, 'a')
+		xroot = mvn.Pom.ParseCache(str(tmpdir.join('cache'))).load(pom_file)
+		assert isinstance(xroot, mvn.Pom.XmlNode)
+		assert mvn.Pom.Xml.get_artifact_id(xroot) == 'a'
+		assert mvn.Pom.Xml.get_node(xroot, 'description') is None
+		assert [mvn.Pom.Xml.get_clean_tag(x) for x in mvn.Pom.Xml.get_properties(xroot)] == ['a']
+		xbuild = mvn.Pom.Xml.get_node(xroot, 'build')
+		assert mvn.Pom.Xml.get_child_node_value(xbuild, 'directory') == 'out'
+		assert mvn.Pom.Xml.get_node(xbuild, 'plugins') is None
+	
+	def test_invalidation(self, tmpdir):
+		cache = mvn.Pom.ParseCache(str(tmpdir.join('cache')))
+		pom_file = self.write_pom(tmpdir, 'a')
+		assert mvn.Pom.Xml.get_artifact_id(cache.load(pom_file)) == 'a'
+		assert mvn.Pom.Xml.get_artifact_id(cache.load(pom_file)) == 'a'
+		self.write_pom(tmpdir, 'bb')
+		assert mvn.Pom.Xml.get_artifact_id(cache.load(pom_file)) == 'bb'
+	
+	def test_disabled(self, tmpdir):
+		pom_file = self.write_pom(tmpdir, 'a')
+		xroot = mvn.Pom.ParseCache().load(pom_file)
+		assert isinstance(xroot, mvn.Pom.XmlNode)
+		assert mvn.Pom.Xml.get_artifact_id(xroot) == 'a'
+		# streamed extraction yields the same pruned tree as pruning a fully parsed document
+		assert mvn.Pom.XmlNode.dump(xroot) == mvn.Pom.XmlNode.dump(mvn.Pom.XmlNode.create(mvn.Pom.Xml.parse(pom_file)))
+	
+	def write_pom(self, tmpdir, artifact_id):
+		pom_file = tmpdir.join('pom.xml')
+		pom_file.write(self.POM.format(artifact_id))
+		return str(pom_file)
+
+class Test_ReactorLoader(object):
+	POM = """<?xml version="1.0"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+	{parent}
+	<groupId>g</groupId>
+	<artifactId>{name}</artifactId>
+	<version>1.0</version>
+	<packaging>pom</packaging>
+	<modules>{modules}</modules>
+	<profiles><profile><id>p-{name}</id><modules>{profile_modules}</modules></profile></profiles>
+</project>
+"""
+	
+	def test_parallel_tree(self, tmpdir, monkeypatch):
+		self.write_pom(tmpdir, 'root', None, ['a', 'b'], ['c'])
+		self.write_pom(tmpdir.join('a'), 'a', 'root', ['a1'], ['a2'])
+		self.write_pom(tmpdir.join('a', 'a1'), 'a1', 'a', [], [])
+		self.write_pom(tmpdir.join('a', 'a2'), 'a2', 'a', [], ['../../b'])
+		self.write_pom(tmpdir.join('b'), 'b', 'root', [], [])
+		self.write_pom(tmpdir.join('c'), 'c', 'root', [], [])
+		pom_file = str(tmpdir.join('pom.xml'))
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		serial = self.get_tree(mvn.Pom.Module.load(pom_file))
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		parallel = self.get_tree(mvn.Pom.Module.load(pom_file, 2))
+		assert len(serial) == 14
+		assert serial == parallel
+		# trees preloaded by the parallel load are not served to later loads
+		self.write_pom(tmpdir.join('b'), 'b2', 'root', [], [])
+		mvn.pom.module_cache.clear()
+		assert mvn.Pom.Module.load(pom_file).modules['b'].artifact.artifactId == 'b2'
+	
+	def test_reload(self, tmpdir, monkeypatch):
+		self.write_pom(tmpdir, 'root', None, ['a', 'b'], ['c'])
+		self.write_pom(tmpdir.join('a'), 'a', 'root', ['a1'], [])
+		self.write_pom(tmpdir.join('a', 'a1'), 'a1', 'a', [], [])
+		self.write_pom(tmpdir.join('b'), 'b', 'root', [], [])
+		self.write_pom(tmpdir.join('c'), 'c', 'root', [], [])
+		pom_file = str(tmpdir.join('pom.xml'))
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		root = mvn.Pom.Module.load(pom_file)
+		a, b = root.modules['a'], root.modules['b']
+		assert root.get_weight() == pytest.approx(5.0005)
+		self.write_pom(tmpdir.join('a'), 'a', 'root', ['a1', 'a2'], [])
+		self.write_pom(tmpdir.join('a', 'a2'), 'a2', 'a', [], [])
+		assert mvn.Pom.Module.reload(root, [str(tmpdir.join('a', 'pom.xml'))]) is root
+		assert root.modules['b'] is b
+		assert root.modules['a'] is not a
+		assert sorted(root.modules['a'].modules) == ['a1', 'a2']
+		assert root.modules['a'].modules['a1'].parent is root.modules['a']
+		assert root.get_weight() == pytest.approx(6.0006)
+		assert self.get_tree(root) == self.get_tree(mvn.Pom.Module.load(pom_file))
+		tmpdir.join('c', 'pom.xml').remove()
+		mvn.Pom.Module.reload(root, [str(tmpdir.join('c', 'pom.xml'))])
+		assert root.profiles['p-root'].modules == {}
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		assert self.get_tree(root) == self.get_tree(mvn.Pom.Module.load(pom_file))
+	
+	def test_reload_parent(self, tmpdir, monkeypatch):
+		root_pom = tmpdir.join('pom.xml')
+		write_root = lambda v: root_pom.write('<project><groupId>g</groupId><artifactId>root</artifactId><version>1.0</version>'
+			'<packaging>pom</packaging><properties><v>{0}</v></properties></project>'.format(v))
+		write_root(1)
+		tmpdir.join('sub').ensure(dir=True)
+		sub_pom = tmpdir.join('sub', 'pom.xml')
+		sub_pom.write('<project><parent><groupId>g</groupId><artifactId>root</artifactId><version>1.0</version></parent>'
+			'<artifactId>sub</artifactId><modules><module>leaf</module></modules></project>')
+		self.write_pom(tmpdir.join('sub', 'leaf'), 'leaf', 'sub', [], [])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		sub = mvn.Pom.Module.load(str(sub_pom))
+		assert sub.properties.expand_value('${v}') == '1'
+		write_root(2)
+		sub = mvn.Pom.Module.reload(sub, [str(root_pom)])
+		assert sub.properties.expand_value('${v}') == '2'
+		assert sub.modules['leaf'].properties.expand_value('${v}') == '2'
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		assert self.get_tree(sub) == self.get_tree(mvn.Pom.Module.load(str(sub_pom)))
+	
+	def test_shared_profile_module(self, tmpdir, monkeypatch):
+		self.write_pom(tmpdir, 'root', None, ['a', 'b'], [])
+		self.write_pom(tmpdir.join('a'), 'a', 'root', [], ['../c'])
+		self.write_pom(tmpdir.join('b'), 'b', 'root', [], ['../c'])
+		self.write_pom(tmpdir.join('c'), 'c', 'root', [], [])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		root = mvn.Pom.Module.load(str(tmpdir.join('pom.xml')))
+		a, b = root.modules['a'], root.modules['b']
+		assert a.profiles['p-a'].modules['../c'] is b.profiles['p-b'].modules['../c']
+	
+	def test_profile_context(self, tmpdir, monkeypatch):
+		profile = '<profile><id>{0}</id><properties><x>{1}</x></properties><modules><module>c</module></modules></profile>'
+		tmpdir.join('pom.xml').write('<project><groupId>g</groupId><artifactId>root</artifactId><version>1.0</version>'
+			'<properties><x>r</x></properties><modules><module>c</module></modules><profiles>{0}</profiles></project>'.format(
+			''.join(profile.format(*p) for p in [('p1', 'p'), ('p2', 'p'), ('p3', 'r'), ('p4', 'r')])))
+		tmpdir.join('c').ensure(dir=True)
+		tmpdir.join('c', 'pom.xml').write('<project><parent><groupId>g</groupId><artifactId>root</artifactId><version>1.0</version></parent>'
+			'<artifactId>c</artifactId><properties><y>${x}</y></properties></project>')
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		root = mvn.Pom.Module.load(str(tmpdir.join('pom.xml')))
+		c = dict((name, profile.modules['c']) for name, profile in root.profiles.items())
+		# profiles are told apart by the properties they change against their owner
+		assert root.modules['c'].properties['y'] == 'r'
+		assert c['p1'].properties['y'] == 'p' and c['p1'] is c['p2']
+		# profiles changing nothing share one module, separate from the one loaded under the owner
+		assert c['p3'].properties['y'] == 'r' and c['p3'] is c['p4']
+		assert c['p3'] is not root.modules['c'] and c['p3'] is not c['p1']
+	
+	def get_tree(self, node, level = 0):
+		tree = [(level, repr(node))]
+		for name in sorted(node.modules):
+			tree += self.get_tree(node.modules[name], level + 1)
+		for name in sorted(getattr(node, 'profiles', {})):
+			tree += self.get_tree(node.profiles[name], level + 1)
+		return tree
+	
+	def write_pom(self, pom_dir, name, parent, modules, profile_modules):
+		if parent is not None:
+			parent = '<parent><groupId>g</groupId><artifactId>{0}</artifactId><version>1.0</version></parent>'.format(parent)
+		pom_dir.ensure(dir=True)
+		pom_dir.join('pom.xml').write(self.POM.format(name=name, parent=parent or '',
+			modules=''.join('<module>{0}</module>'.format(m) for m in modules),
+			profile_modules=''.join('<module>{0}</module>'.format(m) for m in profile_modules)))
+
+class Test_BuildGraph(object):
+	def test_render(self, tmpdir, monkeypatch):
+		loader = Test_ReactorLoader()
+		loader.write_pom(tmpdir, 'root', None, ['a'], ['b'])
+		loader.write_pom(tmpdir.join('a'), 'a', 'root', [], [])
+		loader.write_pom(tmpdir.join('b'), 'b', 'root', [], [])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		root = mvn.Pom.Module.load(str(tmpdir.join('pom.xml')))
+		lines = {}
+		for output_format in mvn.Pom.BuildGraphRenderer.FORMATS + mvn.Pom.RecordWriter.FORMATS:
+			conf = mvn.Pom.BuildGraphConf({'root': root})
+			conf.match_path = mvn.Pom.BuildPath.of(['p-root'])
+			conf.parent_matched = True
+			conf.output_format = output_format
+			out = StringIO.StringIO()
+			mvn.Pom.BuildGraph.show(conf, out)
+			lines[output_format] = out.getvalue().splitlines()
+		assert lines['text'] == [
+			'[ mod * ] g:root:1.0',
+			'[ mod * ]   +-g:a:1.0',
+			'[prof   ]   | +-p-a',
+			'[prof * ]   +-p-root',
+			'[ mod * ]   | +-g:b:1.0',
+			'[prof   ]   | | +-p-b']
+		records = [json.loads(line) for line in lines['ndjson']]
+		assert [(r['name'], r['parent'], r['matched']) for r in records[:5]] == [
+			('g:root:1.0', None, True), ('g:a:1.0', 0, True), ('p-a', 1, False), ('p-root', 0, True), ('g:b:1.0', 3, True)]
+		assert json.loads(''.join(lines['json'])) == records
+		assert lines['dot'][0] == 'digraph build {'
+		assert '\tn3 -> n4;' in lines['dot']
+		with pytest.raises(NotImplementedError) as e:
+			mvn.Pom.BuildGraphRenderer(mvn.Pom.BuildGraphConf(), StringIO.StringIO()).render([])
+		assert str(e.value) == 'BuildGraphRenderer.get_lines()'
+
+class Test_RecordWriter(object):
+	def test_formats(self):
+		for output_format, expected in [('json', '[\n{"a": 1},\n{"b": [2]}\n]\n'), ('ndjson', '{"a": 1}\n{"b": [2]}\n')]:
+			out = StringIO.StringIO()
+			writer = mvn.Pom.RecordWriter(output_format, out)
+			writer.write({'a': 1})
+			writer.write({'b': [2]})
+			writer.close()
+			assert out.getvalue() == expected
+			assert len(json.loads(out.getvalue()) if output_format == 'json' else out.getvalue().splitlines()) == 2
+		out = StringIO.StringIO()
+		mvn.Pom.RecordWriter('json', out).close()
+		assert json.loads(out.getvalue()) == []
+
+class Test_Daemon(object):
+	def test_pom_file(self):
+		assert mvn.Daemon.get_pom_file(['-j', '2', '-F', 'json', 'pom.xml', 'show-modules', '-l']) == 'pom.xml'
+		assert mvn.Daemon.get_pom_file(['--no-cache', 'pom.xml', 'serve']) is None
+		assert mvn.Daemon.get_pom_file(['pom.xml']) is None
+		assert mvn.Daemon.get_pom_file(['pom.xml', 'show-graph', '--help']) is None
+	
+	def test_serve(self, tmpdir, monkeypatch):
+		loader = Test_ReactorLoader()
+		loader.write_pom(tmpdir, 'root', None, ['a'], [])
+		loader.write_pom(tmpdir.join('a'), 'a', 'root', [], [])
+		pom_file = str(tmpdir.join('pom.xml'))
+		socket_path = str(tmpdir.join('serve.sock'))
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		daemon = mvn.Daemon(pom_file, socket_path)
+		daemon.POLL_INTERVAL = 0.05
+		thread = threading.Thread(target=daemon.serve)
+		thread.start()
+		try:
+			for i in xrange(100):
+				if os.path.exists(socket_path): break
+				time.sleep(0.05)
+			args = ['--no-cache', pom_file, 'show-modules', '-l', '-x']
+			assert mvn.Daemon.request(socket_path, args) == (0, 'g:root:1.0\ng:a:1.0\n', '')
+			loader.write_pom(tmpdir.join('a'), 'b', 'root', [], [])
+			os.utime(str(tmpdir.join('a', 'pom.xml')), (0, 0))
+			assert mvn.Daemon.request(socket_path, args) == (0, 'g:root:1.0\ng:b:1.0\n', '')
+			status, stdout, stderr = mvn.Daemon.request(socket_path, ['--no-cache', pom_file, 'how-to-build', '--bogus'])
+			assert status == 2 and 'no such option' in stderr
+			for garbage in ('not json', '[1, 2]'):
+				client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+				client.connect(socket_path)
+				client.sendall(garbage)
+				client.shutdown(socket.SHUT_WR)
+				assert client.recv(65536) == ''
+				client.close()
+			assert mvn.Daemon.request(socket_path, args) == (0, 'g:root:1.0\ng:b:1.0\n', '')
+		finally:
+			daemon.stop()
+			thread.join()
+		assert not os.path.exists(socket_path)
+	
+	def test_forward(self, tmpdir, monkeypatch, capsys):
+		pom_file = tmpdir.join('pom.xml')
+		pom_file.write('<project/>')
+		socket_path = str(tmpdir.join('serve.sock'))
+		monkeypatch.setattr(mvn.Daemon, 'get_socket_path', staticmethod(lambda pom_file: socket_path))
+		args = [str(pom_file), 'show-modules']
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		server.bind(socket_path)
+		try:
+			# nobody listening: the command runs locally
+			assert mvn.Daemon.forward(args) is False
+			server.listen(1)
+			def drop():
+				conn, _ = server.accept()
+				conn.recv(65536)
+				conn.close()
+			thread = threading.Thread(target=drop)
+			thread.start()
+			# connected but no answer: the command may have run, it must not run again locally
+			with pytest.raises(SystemExit) as e:
+				mvn.Daemon.forward(args)
+			thread.join()
+			assert e.value.code == 1
+			assert capsys.readouterr()[1].startswith('[error] daemon request failed')
+		finally:
+			server.close()
+
+class Test_ManagedDependencies(object):
+	POM = """<project>{parent}<groupId>g</groupId><artifactId>{name}</artifactId><version>1.0</version><packaging>pom</packaging>
+<modules>{modules}</modules>
+<dependencyManagement><dependencies>{managed}</dependencies></dependencyManagement>
+<dependencies>{dependencies}</dependencies></project>"""
+	DEPENDENCY = '<dependency>{0}</dependency>'
+	
+	def test_replace(self):
+		dependencies = mvn.Pom.Dependencies()
+		create = lambda g, scope: mvn.Pom.Dependency(mvn.Pom.Artifact(mvn.Pom.ArtifactOrigin.DEPENDENCY, None, g, 'x', '', '', '1.0'), '', scope, '', False)
+		for g, scope in [('g', 'compile'), ('h', 'compile'), ('g', 'test'), ('h', 'runtime'), ('g', 'provided')]:
+			dependencies.add_managed(create(g, scope))
+		assert dependencies.find_managed('g', 'x', '1.0').scope == 'provided'
+		assert dependencies.find_managed(None, 'x', None).scope == 'runtime'
+		assert sorted((k[0], d.scope) for k, d in dependencies.get_managed_by_key().items()) == [('g', 'provided'), ('h', 'runtime')]
+	
+	def test_inherited(self, tmpdir, monkeypatch):
+		self.write_pom(tmpdir, 'root', None, ['child'], ['g:x:1.0'], [])
+		self.write_pom(tmpdir.join('child'), 'child', 'root', [], ['g:y:2.0'], ['g:x', 'g:y'])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		root = mvn.Pom.Module.load(str(tmpdir.join('pom.xml')))
+		child = root.modules['child']
+		managed = child.all_managed_dependencies
+		assert managed is child.all_managed_dependencies
+		assert sorted(str(d.artifact) for d in child.dependencies.declared) == ['g:x:1.0', 'g:y:2.0']
+		assert sorted(str(a) for a in managed) == ['g:x:1.0', 'g:y:2.0']
+		assert len(root.all_managed_dependencies) == 1
+		z = mvn.Pom.Artifact(mvn.Pom.ArtifactOrigin.DEPENDENCY, None, 'g', 'z', '', '', '3.0')
+		assert z not in managed
+		root.dependencies.add_managed(mvn.Pom.Dependency(z, '', 'compile', '', False))
+		assert z in managed and len(managed) == 3
+		assert managed.get(z).artifact.version == '3.0'
+	
+	def test_last_match_wins(self, tmpdir, monkeypatch):
+		self.write_pom(tmpdir, 'root', None, ['child'], ['g:a:1.0', 'h:b:1.0', 'g:c:1.0'], [])
+		self.write_pom(tmpdir.join('child'), 'child', 'root', [],
+			['g:a:2.0', 'g:a:3.0', 'g:b:1.0', 'h:b:1.0', 'g:d:1.0', 'h:d:1.0'],
+			['g:a', ':b:1.0', 'g:c', ':d:1.0'])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		root = mvn.Pom.Module.load(str(tmpdir.join('pom.xml')))
+		child = root.modules['child']
+		assert [str(d.artifact) for d in child.dependencies.declared] == ['g:a:3.0', 'h:b:1.0', 'g:c:1.0', 'h:d:1.0']
+		managed = child.all_managed_dependencies
+		assert managed.find(groupId='g', artifactId='a').artifact.version == '3.0'
+		assert managed.find(artifactId='a', version='2.0').artifact.version == '2.0'
+		assert managed.find(groupId='h', artifactId='c') is None
+		assert root.all_managed_dependencies.find(groupId='g', artifactId='a').artifact.version == '1.0'
+	
+	def write_pom(self, pom_dir, name, parent, modules, managed, dependencies):
+		if parent is not None:
+			parent = '<parent><groupId>g</groupId><artifactId>{0}</artifactId><version>1.0</version></parent>'.format(parent)
+		pom_dir.ensure(dir=True)
+		pom_dir.join('pom.xml').write(self.POM.format(name=name, parent=parent or '',
+			modules=''.join('<module>{0}</module>'.format(m) for m in modules),
+			managed=''.join(self.get_dependency(m) for m in managed),
+			dependencies=''.join(self.get_dependency(d) for d in dependencies)))
+	
+	def get_dependency(self, coordinates):
+		tags = ('groupId', 'artifactId', 'version')
+		return self.DEPENDENCY.format(''.join('<{0}>{1}</{0}>'.format(t, v) for t, v in zip(tags, coordinates.split(':')) if v))
+
+class Test_EffectiveModel(object):
+	def test_persistent_map(self):
+		base = mvn.Pom.PersistentMap(None, [('a', 1), ('b', 2)])
+		assert base.assoc([('a', 1)]) is base
+		# equal values share the base, identical or not
+		value = ''.join(['x', 'y'])
+		named = mvn.Pom.PersistentMap(None, [('n', value)])
+		assert named.assoc([('n', ''.join(['x', 'y']))]) is named
+		derived = base.assoc([('b', 3), ('c', 4)])
+		assert derived.base is base
+		assert derived.items() == [('a', 1), ('b', 3), ('c', 4)]
+		assert len(derived) == 3 and 'c' in derived and 'c' not in base
+		assert base.items() == [('a', 1), ('b', 2)]
+		with pytest.raises(KeyError):
+			derived['d']
+	
+	def test_shared(self, tmpdir, monkeypatch):
+		loader = Test_ManagedDependencies()
+		loader.write_pom(tmpdir, 'root', None, ['a', 'b'], ['g:x:1.0', 'g:y:1.0'], ['g:x'])
+		loader.write_pom(tmpdir.join('a'), 'a', 'root', [], [], ['g:y'])
+		loader.write_pom(tmpdir.join('b'), 'b', 'root', [], ['g:y:2.0'], ['g:y'])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		root = mvn.Pom.Module.load(str(tmpdir.join('pom.xml')))
+		a, b = root.modules['a'].effective_model, root.modules['b'].effective_model
+		assert a.managed is root.effective_model.managed
+		assert b.managed.base is root.effective_model.managed
+		assert a.properties is b.properties
+		assert [str(d.artifact) for d in a.dependencies.values()] == ['g:x:1.0', 'g:y:1.0']
+		assert [str(d.artifact) for d in b.dependencies.values()] == ['g:x:1.0', 'g:y:2.0']
+		record = b.get_record()
+		assert record['artifactId'] == 'b'
+		assert [(d['artifactId'], d['version']) for d in record['dependencyManagement']] == [('x', '1.0'), ('y', '2.0')]
+		xroot = b.to_xml()
+		assert [x.text for x in xroot.iter('version')] == ['1.0', '1.0', '2.0', '1.0', '2.0']
+	
+	def test_select(self, tmpdir, capsys, monkeypatch):
+		loader = Test_ManagedDependencies()
+		loader.write_pom(tmpdir, 'root', None, ['a', 'b'], [], [])
+		loader.write_pom(tmpdir.join('a'), 'a', 'root', [], [], [])
+		loader.write_pom(tmpdir.join('b'), 'b', 'root', [], [], [])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		cfg = mvn.Config()
+		cfg.pom_file = str(tmpdir.join('pom.xml'))
+		cfg.output_format = 'ndjson'
+		maven = mvn.Maven(cfg)
+		maven.effective_pom([], True)
+		assert [json.loads(line)['artifactId'] for line in capsys.readouterr()[0].splitlines()] == ['root', 'a', 'b']
+		maven.effective_pom(['b'])
+		assert [json.loads(line)['artifactId'] for line in capsys.readouterr()[0].splitlines()] == ['b']
+		with pytest.raises(SystemExit) as e:
+			maven.effective_pom(['b', 'c', 'g:d'])
+		assert e.value.code == 1
+		assert capsys.readouterr() == ('', '[error] unknown module: c\n[error] unknown module: g:d\n')
+
+class Test_DependencyResolver(object):
+	POM = '<project><groupId>{0}</groupId><artifactId>{1}</artifactId><version>{2}</version>{3}{4}</project>'
+	
+	def test_resolve(self, tmpdir, monkeypatch):
+		repository = tmpdir.join('repository')
+		self.write_pom(repository, 'p:1', properties={'e.version': '1.0'}, managed=['g:h:3.0'])
+		self.write_pom(repository, 'a:1.0', parent='p:1', dependencies=['g:c:1.0', 'g:d:1.0:optional', 'g:e:${e.version}:runtime:f', 'g:h'])
+		self.write_pom(repository, 'e:1.0', dependencies=['g:f:1.0', 'g:i:1.0:provided'])
+		self.write_pom(repository, 'b:1.0', dependencies=['g:a:2.0', 'g:c:1.0'])
+		self.write_pom(repository, 'c:2.0', dependencies=['g:j:[1.0,2.0)'])
+		self.write_pom(repository, 'j:1.5')
+		self.write_pom(repository, 'j:2.0')
+		for version in ('1.0', '1.1', '2.0'):
+			self.write_pom(repository, 'k:' + version)
+		pom_file = self.write_pom(tmpdir.join('project'), 'root:1.0', managed=['g:c:2.0'], dependencies=['g:a:1.0', 'g:b:1.0:test', 'g:k:[1.0,1.1]'])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		resolver = mvn.Pom.DependencyResolver(mvn.Pom.Module.load(pom_file), str(repository))
+		root = resolver.resolve()
+		assert self.get_tree(root) == [
+			(1, 'g:a:jar:1.0:compile'),
+			(2, 'g:c:jar:2.0:compile'),
+			(3, 'g:j:jar:1.5:compile'),
+			(2, 'g:e:jar:1.0:runtime'),
+			(2, 'g:h:jar:3.0:compile'),
+			(1, 'g:b:jar:1.0:test'),
+			(1, 'g:k:jar:1.1:compile'),
+		]
+		assert resolver.get_descriptor('g', 'b', '1.0') is resolver.get_descriptor('g', 'b', '1.0')
+		assert resolver.get_descriptor('g', 'missing', '1.0') is None
+		# ranges are resolved through the index, scanning only the artifact directories they name
+		assert resolver.index.get_versions('g', 'k') == ['1.0', '1.1', '2.0']
+		assert resolver.index.get_versions('g', 'a') == []
+	
+	def test_import(self, tmpdir, monkeypatch):
+		repository = tmpdir.join('repository')
+		self.write_pom(repository, 'base:1', managed=['g:x:1.0', 'g:y:1.0'])
+		self.write_pom(repository, 'nested:1', managed=['g:x:9.0', 'g:z:1.0'])
+		bom_file = self.write_pom(repository, 'bom:1', parent='base:1', managed=['g:y:2.0', 'g:nested:1:import'])
+		pom_file = self.write_pom(tmpdir.join('project'), 'root:1.0', managed=['g:bom:1:import', 'g:y:3.0'], dependencies=['g:x', 'g:y', 'g:z'])
+		cache_dir = str(tmpdir.join('cache'))
+		versions = []
+		for run in xrange(3):
+			monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+			mvn.pom.parse_cache.set_cache_dir(cache_dir)
+			mvn.pom.bom_store.set_repository_path(str(repository))
+			module = mvn.Pom.Module.load(pom_file)
+			versions.append([str(d.artifact) for d in module.dependencies.declared])
+			assert mvn.pom.bom_store.get('g', 'bom', '1') is mvn.pom.bom_store.get('g', 'bom', '1')
+			assert (bom_file in mvn.pom.module_cache.file_paths) == (run != 1)
+			if run == 1:
+				# a changed parent invalidates the stored BOM
+				repository.join('g', 'base', '1', 'base-1.pom').write(' ', mode='a')
+		assert versions == [['g:x:1.0', 'g:y:3.0', 'g:z:1.0']] * 3
+	
+	def test_import_precedence(self, tmpdir, monkeypatch):
+		repository = tmpdir.join('repository')
+		self.write_pom(repository, 'bom1:1', managed=['g:x:1.0', 'g:y:1.0'])
+		self.write_pom(repository, 'bom2:1', managed=['g:x:2.0', 'g:w:2.0'])
+		self.write_pom(tmpdir.join('project'), 'root:1.0', managed=['g:bom1:1:import', 'g:z:1.0'])
+		pom_file = self.write_pom(tmpdir.join('project', 'child'), 'child:1.0', parent='root:1.0', managed=['g:bom2:1:import', 'g:y:3.0'])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		mvn.pom.bom_store.set_repository_path(str(repository))
+		managed = mvn.Pom.Module.load(pom_file).all_managed_dependencies
+		assert sorted(str(a) for a in managed) == ['g:w:2.0', 'g:x:1.0', 'g:x:2.0', 'g:y:1.0', 'g:y:3.0', 'g:z:1.0']
+		assert all(managed[a] is d for a, d in managed.items())
+		# declared ones first, nearest module first, then the imported BOMs, farthest module first
+		keyed = managed.get_keyed()
+		assert sorted(str(d.artifact) for d in keyed.values()) == ['g:w:2.0', 'g:x:1.0', 'g:y:3.0', 'g:z:1.0']
+	
+	def test_import_reload(self, tmpdir, monkeypatch):
+		repository = tmpdir.join('repository')
+		base_file = self.write_pom(repository, 'base:1', managed=['g:y:1.0'])
+		bom_file = self.write_pom(repository, 'bom:1', parent='base:1', managed=['g:x:1.0'])
+		pom_file = self.write_pom(tmpdir.join('project'), 'root:1.0', managed=['g:bom:1:import'], dependencies=['g:x', 'g:y'])
+		cache_dir = str(tmpdir.join('cache'))
+		get_versions = lambda module: [str(d.artifact) for d in module.dependencies.declared]
+		for run in xrange(2):
+			monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+			mvn.pom.parse_cache.set_cache_dir(cache_dir)
+			mvn.pom.bom_store.set_repository_path(str(repository))
+			root = mvn.Pom.Module.load(pom_file)
+			# the second run reads the stored BOM, its files are tracked all the same
+			assert mvn.pom.bom_store.file_paths == set([bom_file, base_file])
+		assert get_versions(root) == ['g:x:1.0', 'g:y:1.0']
+		self.write_pom(repository, 'bom:1', parent='base:1', managed=['g:x:2.0'])
+		os.utime(bom_file, (0, 0))
+		root = mvn.Pom.Module.reload(root, [bom_file])
+		assert get_versions(root) == ['g:x:2.0', 'g:y:1.0']
+		self.write_pom(repository, 'base:1', managed=['g:y:2.0'])
+		os.utime(base_file, (0, 0))
+		mvn.pom.module_cache.clear()
+		mvn.pom.parse_cache.discard([base_file])
+		assert mvn.pom.bom_store.discard([base_file]) == set([('g', 'bom', '1')])
+		assert get_versions(mvn.Pom.Module.load(pom_file)) == ['g:x:2.0', 'g:y:2.0']
+	
+	def test_import_missing(self, tmpdir, capsys, monkeypatch):
+		pom_file = self.write_pom(tmpdir.join('project'), 'root:1.0', managed=['g:bom:1:import'], dependencies=['g:x:1.0'])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		mvn.pom.bom_store.set_repository_path(str(tmpdir.join('repository')))
+		mvn.Pom.Module.load(pom_file)
+		out, err = capsys.readouterr()
+		# diagnostics stay out of the records written on stdout
+		assert out == ''
+		assert err == '[error] BOM g:bom:1 not found\n'
+	
+	def test_import_cycle(self, tmpdir, capsys, monkeypatch):
+		repository = tmpdir.join('repository')
+		self.write_pom(repository, 'a:1', managed=['g:x:1.0', 'g:b:1:import'])
+		self.write_pom(repository, 'b:1', managed=['g:y:1.0', 'g:a:1:import'])
+		self.write_pom(repository, 's:1', managed=['g:z:1.0', 'g:s:1:import'])
+		pom_file = self.write_pom(tmpdir.join('project'), 'root:1.0', managed=['g:a:1:import', 'g:s:1:import'], dependencies=['g:x', 'g:y', 'g:z'])
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		mvn.pom.bom_store.set_repository_path(str(repository))
+		module = mvn.Pom.Module.load(pom_file)
+		assert [str(d.artifact) for d in module.dependencies.declared] == ['g:x:1.0', 'g:y:1.0', 'g:z:1.0']
+		out, err = capsys.readouterr()
+		assert err == ('[error] BOM g:a:1 imports itself: g:a:1 -> g:b:1 -> g:a:1\n'
+		               '[error] BOM g:s:1 imports itself: g:s:1 -> g:s:1\n')
+		assert mvn.pom.bom_store.get_cycle('g', 'a', '1') is None
+	
+	def test_cached(self, tmpdir, monkeypatch):
+		repository = tmpdir.join('repository')
+		parent_file = self.write_pom(repository, 'p:1', properties={'b.version': '1.0'})
+		self.write_pom(repository, 'a:1.0', parent='p:1', dependencies=['g:b:${b.version}'])
+		pom_file = self.write_pom(tmpdir.join('project'), 'root:1.0', dependencies=['g:a:1.0'])
+		cache_dir = str(tmpdir.join('cache'))
+		trees = []
+		for run in xrange(3):
+			monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+			mvn.pom.parse_cache.set_cache_dir(cache_dir)
+			resolver = mvn.Pom.DependencyResolver(mvn.Pom.Module.load(pom_file), str(repository))
+			trees.append(self.get_tree(resolver.resolve()))
+			if run == 1:
+				# a changed parent invalidates the stored dependencies of its children
+				self.write_pom(repository, 'p:1', properties={'b.version': '2.0'})
+				os.utime(parent_file, (0, 0))
+		assert trees == [[(1, 'g:a:jar:1.0:compile'), (2, 'g:b:jar:1.0:compile')]] * 2 + [[(1, 'g:a:jar:1.0:compile'), (2, 'g:b:jar:2.0:compile')]]
+	
+	def get_tree(self, root):
+		return [(node.depth, node.dependency.get_id()) for node in root.iternodes()]
+	
+	def write_pom(self, repository, coordinate, parent=None, properties={}, managed=[], dependencies=[]):
+		artifact_id, version = coordinate.split(':')
+		if repository.basename == 'repository':
+			pom_dir = repository.join('g', artifact_id, version)
+			pom_name = '{0}-{1}.pom'.format(artifact_id, version)
+		else:
+			pom_dir = repository
+			pom_name = 'pom.xml'
+		extra = ''
+		if parent is not None:
+			extra += '<parent><groupId>g</groupId><artifactId>{0}</artifactId><version>{1}</version></parent>'.format(*parent.split(':'))
+		extra += '<properties>{0}</properties>'.format(''.join('<{0}>{1}</{0}>'.format(k, v) for k, v in properties.items()))
+		extra += '<dependencyManagement><dependencies>{0}</dependencies></dependencyManagement>'.format(''.join(self.get_dependency(d) for d in managed))
+		dependencies = '<dependencies>{0}</dependencies>'.format(''.join(self.get_dependency(d) for d in dependencies))
+		pom_dir.ensure(dir=True)
+		pom_dir.join(pom_name).write(self.POM.format('g', artifact_id, version, extra, dependencies))
+		return str(pom_dir.join(pom_name))
+	
+	def get_dependency(self, coordinate):
+		parts = coordinate.split(':') + [''] * 5
+		out = '<dependency><groupId>{0}</groupId><artifactId>{1}</artifactId>'.format(parts[0], parts[1])
+		if len(parts[2]) > 0:
+			out += '<version>{0}</version>'.format(parts[2])
+		if parts[3] == 'optional':
+			out += '<optional>true</optional>'
+		elif parts[3] == 'import':
+			out += '<type>pom</type><scope>import</scope>'
+		elif len(parts[3]) > 0:
+			out += '<scope>{0}</scope>'.format(parts[3])
+		if len(parts[4]) > 0:
+			out += '<exclusions><exclusion><groupId>g</groupId><artifactId>{0}</artifactId></exclusion></exclusions>'.format(parts[4])
+		return out + '</dependency>'
+
+class Test_RepositoryIndex(object):
+	METADATA = '<metadata><groupId>org.g</groupId><artifactId>a</artifactId><versioning><latest>{0}</latest><release>{1}</release></versioning></metadata>'
+	
+	def test_resolve(self, tmpdir):
+		repository = tmpdir.join('repository')
+		for version in ['1.0', '1.1', '1.2-SNAPSHOT', '2.0-alpha-1', '2.0']:
+			self.write_version(repository, version)
+		repository.join('org', 'g', 'a', '1.1', '_remote.repositories').write('a-1.1.jar>central=\na-1.1.pom>central=\n')
+		repository.join('org', 'g', 'a', 'maven-metadata-central.xml').write(self.METADATA.format('3.0-SNAPSHOT', '2.1'))
+		index = mvn.Pom.RepositoryIndex(str(repository), str(tmpdir.join('index.sqlite')))
+		assert index.scan() == 9
+		assert index.get_versions('org.g', 'a') == ['1.0', '1.1', '1.2-SNAPSHOT', '2.0-alpha-1', '2.0']
+		assert index.get_repositories('org.g', 'a', '1.1') == ['central']
+		assert index.resolve('org.g', 'a', '[1.0,2.0)') == '2.0-alpha-1'
+		assert index.resolve('org.g', 'a', '(,1.2]') == '1.2-SNAPSHOT'
+		assert index.resolve('org.g', 'a', '1.1') == '1.1'
+		assert index.resolve('org.g', 'a', '1.5') is None
+		assert index.resolve('org.g', 'a', 'LATEST') == '3.0-SNAPSHOT'
+		assert index.resolve('org.g', 'a', 'RELEASE') == '2.1'
+		assert index.resolve('org.g', 'b', 'RELEASE') is None
+	
+	def test_rescan(self, tmpdir):
+		repository = tmpdir.join('repository')
+		for version in ['1.0', '1.1']:
+			self.write_version(repository, version)
+		index = mvn.Pom.RepositoryIndex(str(repository), str(tmpdir.join('index.sqlite')))
+		assert index.scan() == 6
+		assert index.scan() == 0
+		self.write_version(repository, '1.2')
+		repository.join('org', 'g', 'a', '1.0').remove()
+		self.touch(repository.join('org', 'g', 'a'))
+		assert index.scan() == 2
+		index.close()
+		index = mvn.Pom.RepositoryIndex(str(repository), str(tmpdir.join('index.sqlite')))
+		assert index.get_versions('org.g', 'a') == ['1.1', '1.2']
+		assert index.scan() == 0
+	
+	def write_version(self, repository, version):
+		version_dir = repository.join('org', 'g', 'a', version)
+		version_dir.ensure(dir=True)
+		version_dir.join('a-{0}.pom'.format(version)).write('<project/>')
+	
+	def touch(self, path):
+		# force a new mtime even on file systems with coarse timestamps
+		mtime = path.stat().mtime + 10
+		path.setmtime(mtime)
+
+class Test_BuildPathMap(object):
+	POM = '<project><groupId>g</groupId><artifactId>{name}</artifactId><version>1.0</version><packaging>pom</packaging><profiles>{profiles}</profiles></project>'
+	
+	def test_buildpath(self):
+		bp = mvn.Pom.BuildPath.of(['p1'], {'foo': ''})
+		assert bp is mvn.Pom.BuildPath.of(set(['p1']), {'foo': None})
+		assert bp == mvn.Pom.BuildPath(['p1'], {'foo': None})
+		assert bp.clone() is bp
+		merged = bp.merge(mvn.Pom.BuildPath.of(['p2'], {'foo': 'bar'}))
+		assert merged is mvn.Pom.BuildPath.of(['p1', 'p2'], {'foo': 'bar'})
+		assert bp.get_merged(mvn.Pom.BuildPath.of(['p2'], {'foo': 'bar'})) is merged
+		assert mvn.Pom.BuildPath.of() is mvn.Pom.BuildPath.of(set(), {}) and mvn.Pom.BuildPath.of().is_empty()
+		assert bp.get_cmdline() == '-Pp1 -Dfoo'
+		with pytest.raises(AttributeError):
+			bp.profiles = set()
+	
+	def test_reduce(self):
+		bpm = mvn.Pom.BuildPathMap()
+		bpm.profiles['a'] = self.buildpaths([], ['p1'], ['p2', 'x'])
+		bpm.profiles['b'] = self.buildpaths(['p2'], ['p3', 'foo=bar'])
+		bpm.profiles['c'] = self.buildpaths(['foo=baz'], ['p1', 'foo'])
+		assert self.cmdlines(bpm, ['a']) == ['']
+		assert self.cmdlines(bpm, ['a', 'b']) == ['-Pp2', '-Pp3 -Dfoo=bar']
+		assert self.cmdlines(bpm, ['b', 'c']) == ['-Pp1,p2 -Dfoo', '-Pp1,p3 -Dfoo=bar', '-Pp2 -Dfoo=baz']
+	
+	def test_best(self, tmpdir, monkeypatch):
+		profiles = {'heavy': ['x', 'y', 'z'], 'light': ['x'], 'other': ['w']}
+		tmpdir.join('pom.xml').write(self.POM.format(name='root', profiles=''.join(
+			'<profile><id>{0}</id><modules>{1}</modules></profile>'.format(p, ''.join('<module>{0}</module>'.format(m) for m in ms))
+			for p, ms in sorted(profiles.items()))))
+		for name in 'wxyz':
+			tmpdir.join(name).ensure(dir=True).join('pom.xml').write(self.POM.format(name=name, profiles=''))
+		monkeypatch.setattr(mvn, 'pom', mvn.Pom())
+		module = mvn.Pom.Module.load(str(tmpdir.join('pom.xml')))
+		bpm = mvn.Pom.BuildPathMap.create(module)
+		for name in ['x', 'g:x', 'g:x:1.0', 'g:x:pom:1.0']:
+			assert sorted(bp.get_cmdline() for bp in bpm.get_buildpaths([name], [])) == ['-Pheavy', '-Plight']
+		assert len(bpm.get_buildpaths(['h:x'], [])) == 0
+		with pytest.raises(Exception) as e:
+			bpm.get_buildpaths(['g:*:1.0'], [])
+		assert 'multiple modules matched' in str(e.value)
+		bp, weight = bpm.get_best_buildpath(module, ['x', 'z'], [])
+		assert bp.get_cmdline() == '-Pheavy'
+		bp, weight = bpm.get_best_buildpath(module, ['x', 'w'], [])
+		assert bp.get_cmdline() == '-Plight,other'
+		assert weight == min(module.get_weight(bp) for bp in bpm.get_buildpaths(['x', 'w'], []))
+		assert bpm.get_best_buildpath(module, ['x'], [], ['light', 'heavy']) is None
+		assert module.get_weight() == pytest.approx(5.0003)
+		assert module.get_weight(mvn.Pom.BuildPath.of(['light'])) == pytest.approx(2.0001)
+		assert module.get_weight(mvn.Pom.BuildPath.of(['heavy', 'light'])) == pytest.approx(4.0002)
+	
+	def buildpaths(self, *paths):
+		bps = mvn.Pom.BuildPathSet()
+		for path in paths:
+			profiles = [p for p in path if '=' not in p and p != 'foo']
+			properties = dict((p.split('=') + [None])[:2] for p in path if p not in profiles)
+			bps.add(mvn.Pom.BuildPath(profiles, properties))
+		return bps
+	
+	def cmdlines(self, bpm, profiles):
+		return sorted(bp.get_cmdline() for bp in bpm.get_buildpaths([], profiles))
+
 if __name__ == '__main__':
 	pass